@@ -1,14 +1,44 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, g, stream_with_context
 import requests
 from bs4 import BeautifulSoup
+from bs4.element import Tag
 import difflib
+import hashlib
 import os
 import re
 import json
+import logging
 from datetime import datetime
+from time import perf_counter
 from werkzeug.utils import secure_filename
+from http_client import client as http_client
+from page_cache import page_cache
+from fetcher import fetch_page, fetch_stats, open_stream
+from memo_cache import MemoCache
+from batch import BATCH_MAX_URLS, run_batch
+from crawler import CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES, Crawler, load_checkpoint
+from dom_cleaner import clean_tree, element_texts
+from text_rewriter import rewrite_run, rewrite_text
+from parsers import PARSER_BACKEND
+from strategies import pick_longest, strategy_stats
+from keyword_classifier import classifier
+from stream_extractor import iter_lines
+from process_pool import PoolBusy, TaskTimeout, extraction_pool
+from jobs import QueueFull, job_manager
+from memory_guard import EXTRACT_MEMORY_BOUNDED, PageTooComplex, check_page, guard_stats, release_tree
+from stages import mark_stage, server_timing, stage_tracker, timed
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, SIZE_BUCKETS, metrics
+from regex_registry import regexes
+from line_diff import get_opcodes as line_opcodes, intern_against, intern_lines
+from comparisons import (COMPARISON_CONTEXT_LINES, COMPARISON_MAX_PAGE_SIZE, COMPARISON_PAGE_SIZE,
+                         Comparison, ComparisonTooLarge, aligned_rows, comparison_store, group_hunks)
+from references import ReferenceTooLarge, reference_store
+import request_log
+from request_log import configure_logging, log_payloads, log_stats
 
 app = Flask(__name__)
+configure_logging()
+log = logging.getLogger('webscraper.app')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 UPLOAD_FOLDER = 'uploads'
@@ -17,668 +47,139 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Bump whenever a change to the extraction pipeline alters its output,
+# so that memoized results from the previous version are not reused
+PIPELINE_VERSION = '1'
+
+# Extracted text keyed by a digest of the page body
+extraction_cache = MemoCache()
+
+@app.before_request
+def start_stage_timings():
+    stage_tracker.begin_request()
+
+@app.after_request
+def add_server_timing(response):
+    """Report the stages timed while handling the request in a Server-Timing header"""
+    g.stage_timings = stage_tracker.end_request()
+    if g.stage_timings:
+        response.headers['Server-Timing'] = server_timing(g.stage_timings)
+    return response
+
+# Request metrics are labelled by URL rule, so every label has a bounded set of values
+REQUESTS = metrics.counter('http_requests_total', 'Requests handled, by route, method and status', ['route', 'method', 'status'])
+REQUEST_SECONDS = metrics.histogram('http_request_duration_seconds', 'Request latency until the response is returned; for a streamed response, until its first byte', ['route'])
+REQUEST_BODY_BYTES = metrics.histogram('http_request_body_bytes', 'Size of the request bodies', ['route'], SIZE_BUCKETS)
+RESPONSE_BODY_BYTES = metrics.histogram('http_response_body_bytes', 'Size of the response bodies that are not streamed', ['route'], SIZE_BUCKETS)
+REQUEST_ERRORS = metrics.counter('http_request_errors_total', 'Exceptions raised while handling requests, by type', ['route', 'exception'])
+REQUESTS_IN_FLIGHT = metrics.gauge('http_requests_in_flight', 'Requests being handled', ['route'])
+
+def request_route():
+    """URL rule of the current request, or 'unmatched' for an unknown URL"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def record_error(error):
+    """Count an exception that is turned into an error response"""
+    REQUEST_ERRORS.inc(route=request_route(), exception=type(error).__name__)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = perf_counter()
+    g.in_flight_route = request_route()
+    REQUESTS_IN_FLIGHT.inc(route=g.in_flight_route)
+
+@app.after_request
+def record_request_metrics(response):
+    route = request_route()
+    REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if 'request_started' in g:
+        REQUEST_SECONDS.observe(perf_counter() - g.request_started, route=route)
+    if request.content_length:
+        REQUEST_BODY_BYTES.observe(request.content_length, route=route)
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_BODY_BYTES.observe(response.content_length, route=route)
+    return response
+
+@app.teardown_request
+def end_request_metrics(error):
+    # Runs after a streamed response has been sent, and after unhandled exceptions
+    if error is not None:
+        record_error(error)
+    route = g.pop('in_flight_route', None)
+    if route is not None:
+        REQUESTS_IN_FLIGHT.dec(route=route)
+
+@app.before_request
+def start_request_log():
+    # Records logged while handling the request carry its ID
+    g.request_id = request_log.begin_request(request.headers.get('X-Request-ID'))
+
+@app.after_request
+def add_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    g.response_status = response.status_code
+    g.response_bytes = None if response.is_streamed else response.content_length
+    return response
+
+@app.teardown_request
+def log_request(error):
+    """One record per request, written after a streamed response has been sent too"""
+    if 'request_started' in g:
+        log.info('request', extra={'fields': {
+            'method': request.method,
+            'route': request_route(),
+            'status': g.get('response_status', 500),
+            'duration_ms': round((perf_counter() - g.request_started) * 1000, 2),
+            'request_bytes': request.content_length or 0,
+            'response_bytes': g.get('response_bytes'),
+            'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in g.get('stage_timings', {}).items()},
+        }})
+    request_log.end_request()
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def prepare_url(url):
+    """Strip a user-supplied URL and add https:// if no protocol is specified"""
+    url = (url or '').strip()
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+def string_fields_error(data, *names):
+    """Why one of the named request fields is present but not a string, or None if they are usable"""
+    for name in names:
+        value = data.get(name)
+        if value is not None and not isinstance(value, str):
+            return f'{name} must be a string'
+    return None
+
+def fetch_url(url):
+    """Fetch a page body"""
+    # Use a session backed by the shared connection pools
+    with timed('fetch'):
+        return fetch_page(http_client.session(), url)
+
+def extract_url_text(url):
+    """Fetch a page and return its policy-relevant text"""
+    return extract_text_cached(fetch_url(url))
+
 @app.route('/extract_text', methods=['POST'])
 def extract_text():
     try:
         data = request.get_json()
-        url = data.get('url', '').strip()
+        url = prepare_url(data.get('url', ''))
         
         if not url:
             return jsonify({'error': 'Please provide a valid URL'}), 400
         
-        # Add http:// if no protocol specified
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-        
-        # Set up headers to mimic a real browser
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        
-        # Use session for persistent connections
-        session = requests.Session()
-        response = session.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        
-        # Ensure we have the complete page
-        if len(response.text) < 5000:  # If response seems too short
-            # Try with different headers
-            headers['Accept'] = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
-            headers['Cache-Control'] = 'no-cache'
-            headers['Pragma'] = 'no-cache'
-            response = session.get(url, headers=headers, timeout=20)
-            response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Remove script, style, and hidden elements
-        for element in soup(["script", "style", "noscript", "meta", "link", "head"]):
-            element.decompose()
-        
-        # Remove elements with hidden attributes
-        for element in soup.find_all(attrs={"hidden": True}):
-            element.decompose()
-        
-        # Remove elements with display:none or visibility:hidden styles
-        for element in soup.find_all(style=re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden')):
-            element.decompose()
-        
-        # Remove elements with hidden class
-        for element in soup.find_all(class_=re.compile(r'hidden|hide|d-none|invisible')):
-            element.decompose()
-        
-        # Remove all img tags and their content
-        for img in soup.find_all('img'):
-            img.decompose()
-        
-        # Remove elements that contain image file names in their attributes
-        for element in soup.find_all(attrs=True):
-            for attr_name, attr_value in element.attrs.items():
-                if isinstance(attr_value, str) and re.search(r'@\d+\.?\d*x\.webp|\.webp|\.png|\.jpg|\.jpeg|\.svg|\.gif|\.ico', attr_value, re.IGNORECASE):
-                    element.decompose()
-                    break
-        
-        # Enhanced text extraction focusing on policy-related content
-        def extract_policy_relevant_text(soup):
-            # Remove unwanted elements first
-            for unwanted in soup(['script', 'style', 'meta', 'link', 'noscript', 'head', 'img']):
-                unwanted.decompose()
-            
-            # Remove navigation and UI elements that are not policy-related
-            navigation_selectors = [
-                'nav', 'header', 'footer', 'menu', 'navbar', 'breadcrumb',
-                '[class*="nav"]', '[class*="menu"]', '[class*="header"]', '[class*="footer"]',
-                '[class*="breadcrumb"]', '[class*="sidebar"]', '[class*="toolbar"]'
-            ]
-            
-            for selector in navigation_selectors:
-                for element in soup.select(selector):
-                    element.decompose()
-            
-            # Remove promotional and marketing elements
-            marketing_selectors = [
-                '[class*="banner"]', '[class*="promo"]', '[class*="ad"]', '[class*="advertisement"]',
-                '[class*="marketing"]', '[class*="popup"]', '[class*="modal"]', '[class*="overlay"]',
-                '[class*="cta"]', '[class*="call-to-action"]', '[class*="button"]', '[class*="btn"]'
-            ]
-            
-            for selector in marketing_selectors:
-                for element in soup.select(selector):
-                    element.decompose()
-            
-            # Remove social media and sharing elements
-            social_selectors = [
-                '[class*="social"]', '[class*="share"]', '[class*="follow"]', '[class*="like"]',
-                '[class*="twitter"]', '[class*="facebook"]', '[class*="linkedin"]', '[class*="instagram"]'
-            ]
-            
-            for selector in social_selectors:
-                for element in soup.select(selector):
-                    element.decompose()
-            
-            # Remove hidden elements
-            for element in soup.find_all(attrs={"hidden": True}):
-                element.decompose()
-            
-            # Remove elements with display:none or visibility:hidden styles
-            for element in soup.find_all(style=re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden')):
-                element.decompose()
-            
-            # Remove elements with hidden class
-            for element in soup.find_all(class_=re.compile(r'hidden|hide|d-none|invisible|sr-only')):
-                element.decompose()
-            
-            # Remove elements with aria-hidden attribute
-            for element in soup.find_all(attrs={"aria-hidden": "true"}):
-                element.decompose()
-            
-            # Remove all img tags completely
-            for img in soup.find_all('img'):
-                img.decompose()
-            
-            # Keep navigation and button elements - don't remove them
-            
-            # Remove elements containing image file names in any attribute
-            for element in soup.find_all(attrs=True):
-                for attr_name, attr_value in element.attrs.items():
-                    if isinstance(attr_value, str) and re.search(r'@\d+\.?\d*x\.webp|\.webp|\.png|\.jpg|\.jpeg|\.svg|\.gif|\.ico', attr_value, re.IGNORECASE):
-                        element.decompose()
-                        break
-            
-            # Handle email protection patterns before getting text
-            # Get the HTML content to process email patterns
-            html_content = str(soup)
-            
-            # Aggressive removal of image-related content from HTML
-            aggressive_patterns = [
-                r'<[^>]*src\s*=\s*["\'][^"\']*@\d+\.?\d*x\.webp[^"\']*["\'][^>]*>',  # Remove img tags with @x.webp
-                r'<[^>]*alt\s*=\s*["\'][^"\']*@\d+\.?\d*x\.webp[^"\']*["\'][^>]*>',  # Remove elements with alt containing @x.webp
-                r'<[^>]*data-[^=]*\s*=\s*["\'][^"\']*@\d+\.?\d*x\.webp[^"\']*["\'][^>]*>',  # Remove data attributes with @x.webp
-                r'Without@\d+\.?\d*x\.webp',  # Direct removal
-                r'with@\d+\.?\d*x\.webp',     # Direct removal
-                r'[A-Za-z0-9_-]*@\d+\.?\d*x\.webp',  # Any @x.webp pattern
-            ]
-            
-            for pattern in aggressive_patterns:
-                html_content = re.sub(pattern, '', html_content, flags=re.IGNORECASE)
-            
-            # Try to find actual email addresses in the HTML
-            email_regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-            actual_emails = re.findall(email_regex, html_content)
-            
-            # Only process email patterns if we found actual emails
-            if actual_emails:
-                # Look for email patterns in the HTML and replace them
-                email_patterns = [
-                    r'\[email\s+protected\]',
-                    r'\[email\s+protected\]',
-                    r'email\s+protected',
-                    r'\[email\]',
-                    r'\[at\]',
-                    r'\[dot\]'
-                ]
-                
-                # Replace email protection patterns with actual emails
-                for pattern in email_patterns:
-                    html_content = re.sub(pattern, actual_emails[0], html_content, flags=re.IGNORECASE)
-                
-                # Special handling for "Contact US" - replace with email
-                html_content = re.sub(r'Contact\s+US', actual_emails[0], html_content, flags=re.IGNORECASE)
-                
-                # Handle other contact-related patterns
-                contact_patterns = [
-                    r'Contact\s+Us',
-                    r'Contact\s+us',
-                    r'CONTACT\s+US',
-                    r'contact\s+us'
-                ]
-                
-                for pattern in contact_patterns:
-                    html_content = re.sub(pattern, actual_emails[0], html_content, flags=re.IGNORECASE)
-            
-            # Remove image file names and unwanted content
-            unwanted_patterns = [
-                r'[A-Za-z0-9_-]*@\d+\.?\d*x\.webp',  # Remove @1.5x.webp, @2x.webp etc
-                r'[A-Za-z0-9_-]*\.webp',  # Remove .webp files
-                r'[A-Za-z0-9_-]*\.png',   # Remove .png files
-                r'[A-Za-z0-9_-]*\.jpg',   # Remove .jpg files
-                r'[A-Za-z0-9_-]*\.jpeg',  # Remove .jpeg files
-                r'[A-Za-z0-9_-]*\.svg',   # Remove .svg files
-                r'[A-Za-z0-9_-]*\.gif',   # Remove .gif files
-                r'[A-Za-z0-9_-]*\.ico',   # Remove .ico files
-                r'without@\d+\.?\d*x\.webp',  # Specific pattern for "without@1.5x.webp"
-                r'with@\d+\.?\d*x\.webp',     # Specific pattern for "with@1.5x.webp"
-                r'Without@\d+\.?\d*x\.webp',  # Capital W version
-                r'With@\d+\.?\d*x\.webp',     # Capital W version
-                r'[Ww]ithout@[0-9.]+x\.webp', # More flexible pattern
-                r'[Ww]ith@[0-9.]+x\.webp',    # More flexible pattern
-            ]
-            
-            for pattern in unwanted_patterns:
-                html_content = re.sub(pattern, '', html_content, flags=re.IGNORECASE)
-            
-            # Additional specific removal for common patterns
-            specific_removals = [
-                'Without@1.5x.webp',
-                'with@1.5x.webp',
-                'Without@2x.webp',
-                'with@2x.webp',
-                'Without@3x.webp',
-                'with@3x.webp',
-            ]
-            
-            for removal in specific_removals:
-                html_content = html_content.replace(removal, '')
-                html_content = html_content.replace(removal.lower(), '')
-                html_content = html_content.replace(removal.upper(), '')
-            
-            # Handle number and metric patterns
-            metric_patterns = [
-                (r'1\s*M\+', '100 M+'),  # 1 M+ -> 100 M+
-                (r'1\s*M\s*\+', '100 M+'),  # 1 M + -> 100 M+
-                (r'1\s*Million\+', '100 M+'),  # 1 Million+ -> 100 M+
-                (r'1\s*Million\s*\+', '100 M+'),  # 1 Million + -> 100 M+
-            ]
-            
-            for pattern, replacement in metric_patterns:
-                html_content = re.sub(pattern, replacement, html_content, flags=re.IGNORECASE)
-            
-            # Parse the modified HTML
-            soup_modified = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove any remaining HTML tags completely
-            for tag in soup_modified.find_all():
-                tag.unwrap()
-            
-            # Get all text content
-            text = soup_modified.get_text(separator=' ', strip=True)
-            
-            # Clean up any remaining HTML entities and tags
-            text = re.sub(r'<[^>]+>', '', text)  # Remove any remaining HTML tags
-            text = re.sub(r'&[a-zA-Z0-9#]+;', '', text)  # Remove HTML entities
-            
-            # Clean up the text
-            text = re.sub(r'\s+', ' ', text)
-            
-            # Split into meaningful sentences and phrases - improved method
-            sentences = []
-            current_sentence = ""
-            
-            # Split by common sentence endings and line breaks
-            text_parts = re.split(r'[.!?]\s+|\n+', text)
-            
-            for part in text_parts:
-                part = part.strip()
-                if part and len(part) > 2:  # Keep meaningful parts
-                    # Split long parts into smaller chunks if needed
-                    if len(part) > 200:
-                        # Split by common separators
-                        sub_parts = re.split(r'[,;]\s+|\s+-\s+', part)
-                        for sub_part in sub_parts:
-                            sub_part = sub_part.strip()
-                            if sub_part and len(sub_part) > 2:
-                                sentences.append(sub_part)
-                    else:
-                        sentences.append(part)
-            
-            # Also try word-by-word approach for better coverage
-            current_sentence = ""
-            for word in text.split():
-                current_sentence += word + " "
-                
-                # Check if this completes a sentence or meaningful phrase
-                if (word.endswith('.') or word.endswith('!') or word.endswith('?') or 
-                    len(current_sentence.strip()) > 100):  # Increased from 80 to 100
-                    if current_sentence.strip() not in sentences:  # Avoid duplicates
-                        sentences.append(current_sentence.strip())
-                    current_sentence = ""
-            
-            # Add remaining content
-            if current_sentence.strip() and current_sentence.strip() not in sentences:
-                sentences.append(current_sentence.strip())
-            
-            # Enhanced policy-focused content filtering
-            def is_policy_relevant(text):
-                """Check if text is relevant to insurance policy content"""
-                text_lower = text.lower()
-                
-                # Policy-related keywords that indicate relevant content
-                policy_keywords = [
-                    'policy', 'insurance', 'coverage', 'premium', 'claim', 'benefit', 'deductible',
-                    'exclusion', 'inclusion', 'terms', 'conditions', 'eligibility', 'sum assured',
-                    'policyholder', 'insured', 'beneficiary', 'nominee', 'renewal', 'expiry',
-                    'effective date', 'policy period', 'coverage limit', 'claim procedure',
-                    'risk', 'liability', 'protection', 'compensation', 'settlement', 'endorsement',
-                    'rider', 'add-on', 'optional', 'mandatory', 'waiting period', 'cooling off',
-                    'free look', 'grace period', 'lapse', 'surrender', 'maturity', 'death benefit',
-                    'accidental death', 'disability', 'hospitalization', 'medical', 'health',
-                    'life insurance', 'motor insurance', 'travel insurance', 'home insurance',
-                    'fire insurance', 'marine insurance', 'crop insurance', 'liability insurance'
-                ]
-                
-                # Check if text contains policy-related keywords
-                has_policy_keywords = any(keyword in text_lower for keyword in policy_keywords)
-                
-                # Check for policy-related patterns
-                policy_patterns = [
-                    r'₹\s*\d+',  # Currency amounts
-                    r'\d+\s*(?:lakh|crore|thousand|million)',  # Amounts with units
-                    r'policy\s+(?:no|number|id)',  # Policy numbers
-                    r'coverage\s+(?:amount|limit|sum)',  # Coverage amounts
-                    r'premium\s+(?:amount|rate|cost)',  # Premium information
-                    r'claim\s+(?:process|procedure|settlement)',  # Claim information
-                    r'valid\s+(?:from|till|until)',  # Validity periods
-                    r'age\s+(?:limit|criteria|requirement)',  # Age requirements
-                    r'medical\s+(?:test|examination|checkup)',  # Medical requirements
-                ]
-                
-                has_policy_patterns = any(re.search(pattern, text_lower) for pattern in policy_patterns)
-                
-                return has_policy_keywords or has_policy_patterns
-            
-            def is_irrelevant_content(text):
-                """Check if text is irrelevant navigation/marketing content"""
-                text_lower = text.lower()
-                
-                # Irrelevant content patterns
-                irrelevant_patterns = [
-                    # Navigation and UI
-                    'home', 'about us', 'contact us', 'login', 'register', 'sign up', 'sign in',
-                    'menu', 'navigation', 'breadcrumb', 'footer', 'header', 'sidebar',
-                    
-                    # Marketing and promotional
-                    'learn more', 'read more', 'click here', 'apply now', 'buy now', 'get quote',
-                    'download', 'subscribe', 'newsletter', 'follow us', 'share', 'like',
-                    'banner', 'advertisement', 'promo', 'offer', 'deal', 'discount',
-                    
-                    # Technical/UI elements
-                    'cookie', 'privacy policy', 'terms of service', 'sitemap', 'search',
-                    'google tag manager', 'bootstrap', 'javascript', 'css', 'html',
-                    
-                    # Social media
-                    'facebook', 'twitter', 'linkedin', 'instagram', 'youtube', 'whatsapp',
-                    
-                    # Generic website content
-                    'welcome', 'thank you', 'visit our', 'check out', 'explore', 'discover',
-                    'company profile', 'our team', 'careers', 'news', 'blog', 'press release'
-                ]
-                
-                # Check for irrelevant patterns
-                has_irrelevant = any(pattern in text_lower for pattern in irrelevant_patterns)
-                
-                # Check for very short or generic text
-                is_too_short = len(text.strip()) < 10
-                
-                # Check for repetitive navigation text
-                is_navigation = any(nav_word in text_lower for nav_word in [
-                    'home', 'about', 'contact', 'services', 'products', 'support', 'help'
-                ]) and len(text.strip()) < 50
-                
-                return has_irrelevant or is_too_short or is_navigation
-            
-            # Clean and filter sentences with policy-focused filtering
-            clean_sentences = []
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if sentence and len(sentence) > 5:  # Minimum meaningful length
-                    # Skip irrelevant content
-                    if not is_irrelevant_content(sentence):
-                        # Check if content is policy-relevant
-                        if is_policy_relevant(sentence):
-                            # Additional technical filtering
-                            if not any(unwanted in sentence.lower() for unwanted in [
-                                'google tag manager', 'bootstrap css', 'js', 'css', 'javascript', 'html', 'meta',
-                                'viewport', 'charset', 'http-equiv', 'content-type',
-                                '.webp', '.png', '.jpg', '.jpeg', '.svg', '.gif', '.ico',
-                                '@1x', '@2x', '@3x', '@1.5x', '@2.5x', '@3.5x',
-                                'without@', 'with@', 'image@', 'img@',
-                                'hidden', 'hide', 'invisible', 'sr-only', 'screen reader',
-                                'aria-hidden', 'display: none', 'visibility: hidden',
-                                '<span', '<div', '<p', '<h', '<a', '<img', '<script', '<style'
-                            ]):
-                                # Additional check for file extensions and image references
-                                if not re.search(r'\.(webp|png|jpg|jpeg|svg|gif|ico)', sentence, re.IGNORECASE):
-                                    if not re.search(r'@\d+\.?\d*x', sentence, re.IGNORECASE):
-                                        # Check for specific unwanted patterns
-                                        if not any(unwanted in sentence for unwanted in [
-                                            'Without@1.5x.webp', 'with@1.5x.webp', 'Without@2x.webp', 'with@2x.webp',
-                                            'Without@3x.webp', 'with@3x.webp', 'without@1.5x.webp', 'with@1.5x.webp'
-                                        ]):
-                                            # Check for HTML tags in sentence
-                                            if not re.search(r'<[^>]+>', sentence):
-                                                clean_sentences.append(sentence)
-            
-            # Add the email if it's not already present
-            final_text = '\n'.join(clean_sentences)
-            
-            # Always try to get more comprehensive content
-            # Get raw text from the soup for maximum content extraction
-            raw_text = soup.get_text(separator='\n', strip=True)
-            
-            # Clean up the raw text
-            raw_text = re.sub(r'\n\s*\n', '\n', raw_text)  # Remove multiple newlines
-            raw_text = re.sub(r'<[^>]+>', '', raw_text)  # Remove any remaining HTML tags
-            raw_text = re.sub(r'&[a-zA-Z0-9#]+;', '', raw_text)  # Remove HTML entities
-            
-            # Split into lines and filter with policy-focused restrictions
-            raw_lines = raw_text.split('\n')
-            filtered_lines = []
-            seen_lines = set()
-            for line in raw_lines:
-                line = line.strip()
-                if line and len(line) > 5:  # Minimum meaningful length
-                    # Skip irrelevant content
-                    if not is_irrelevant_content(line):
-                        # Check if content is policy-relevant
-                        if is_policy_relevant(line):
-                            # Only filter out very obvious unwanted content
-                            if not any(unwanted in line.lower() for unwanted in [
-                                'google tag manager', 'bootstrap css', 'js', 'css', 'javascript',
-                                '.webp', '.png', '.jpg', '.jpeg', '.svg', '.gif', '.ico',
-                                '@1x', '@2x', '@3x', '@1.5x', '@2.5x', '@3.5x',
-                                'without@', 'with@', 'image@', 'img@',
-                                '<span', '<div', '<p', '<h', '<a', '<img', '<script', '<style'
-                            ]):
-                                if not re.search(r'\.(webp|png|jpg|jpeg|svg|gif|ico)', line, re.IGNORECASE):
-                                    if not re.search(r'@\d+\.?\d*x', line, re.IGNORECASE):
-                                        if not re.search(r'<[^>]+>', line):
-                                            # Check for duplicates
-                                            if line not in seen_lines:
-                                                seen_lines.add(line)
-                                                filtered_lines.append(line)
-            
-            # Use the more comprehensive content if it's longer
-            comprehensive_text = '\n'.join(filtered_lines)
-            if len(comprehensive_text) > len(final_text):
-                final_text = comprehensive_text
-            
-            # Simple and effective approach: Extract all content in DOM order with duplicate removal
-            all_content = []
-            seen_content = set()
-            
-            # Get all text elements in DOM order
-            all_elements = soup.find_all(['nav', 'menu', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 
-                                        'p', 'li', 'button', 'a', 'strong', 'b', 'em', 'i', 'div', 'span'])
-            
-            for element in all_elements:
-                element_text = element.get_text(strip=True)
-                if element_text and len(element_text) > 1:
-                    # Apply basic filtering
-                    if not any(unwanted in element_text.lower() for unwanted in [
-                        'google tag manager', 'bootstrap css', 'js', 'css', 'javascript',
-                        '.webp', '.png', '.jpg', '.jpeg', '.svg', '.gif', '.ico',
-                        '@1x', '@2x', '@3x', '@1.5x', '@2.5x', '@3.5x',
-                        'without@', 'with@', 'image@', 'img@'
-                    ]):
-                        if not re.search(r'\.(webp|png|jpg|jpeg|svg|gif|ico)', element_text, re.IGNORECASE):
-                            if not re.search(r'@\d+\.?\d*x', element_text, re.IGNORECASE):
-                                if not re.search(r'<[^>]+>', element_text):
-                                    # Avoid very long content
-                                    if len(element_text) < 1000:
-                                        # Check for concatenated text and split it
-                                        if re.search(r'[A-Z][a-z]+[A-Z]', element_text):  # Check for camelCase or concatenated words
-                                            # Split by capital letters
-                                            separated_items = re.findall(r'[A-Z][a-z]*(?:\s+[A-Z][a-z]*)*', element_text)
-                                            for separated_item in separated_items:
-                                                separated_item = separated_item.strip()
-                                                if separated_item and len(separated_item) > 1:
-                                                    if separated_item not in seen_content:
-                                                        seen_content.add(separated_item)
-                                                        all_content.append(separated_item)
-                                        else:
-                                            # Check for duplicates
-                                            if element_text not in seen_content:
-                                                seen_content.add(element_text)
-                                                all_content.append(element_text)
-            
-            # Use this content if it's longer
-            dom_text = '\n'.join(all_content)
-            if len(dom_text) > len(final_text):
-                final_text = dom_text
-            
-            # Additional approach: Extract specific elements with better targeting
-            specific_content = []
-            seen_specific = set()
-            
-            # Extract navigation elements specifically with proper separation
-            for nav in soup.find_all(['nav', 'ul', 'ol']):
-                for item in nav.find_all(['li', 'a']):
-                    item_text = item.get_text(strip=True)
-                    if item_text and len(item_text) > 1 and len(item_text) < 100:
-                        # Split concatenated text by common patterns
-                        if re.search(r'[A-Z][a-z]+[A-Z]', item_text):  # Check for camelCase or concatenated words
-                            # Split by capital letters
-                            separated_items = re.findall(r'[A-Z][a-z]*(?:\s+[A-Z][a-z]*)*', item_text)
-                            for separated_item in separated_items:
-                                separated_item = separated_item.strip()
-                                if separated_item and len(separated_item) > 1:
-                                    if separated_item not in seen_specific:
-                                        seen_specific.add(separated_item)
-                                        specific_content.append(separated_item)
-                        else:
-                            if item_text not in seen_specific:
-                                seen_specific.add(item_text)
-                                specific_content.append(item_text)
-            
-            # Extract buttons specifically with proper separation
-            for button in soup.find_all(['button', 'a']):
-                button_text = button.get_text(strip=True)
-                if button_text and len(button_text) > 1 and len(button_text) < 100:
-                    # Split concatenated text by common patterns
-                    if re.search(r'[A-Z][a-z]+[A-Z]', button_text):  # Check for camelCase or concatenated words
-                        # Split by capital letters
-                        separated_items = re.findall(r'[A-Z][a-z]*(?:\s+[A-Z][a-z]*)*', button_text)
-                        for separated_item in separated_items:
-                            separated_item = separated_item.strip()
-                            if separated_item and len(separated_item) > 1:
-                                if separated_item not in seen_specific:
-                                    seen_specific.add(separated_item)
-                                    specific_content.append(separated_item)
-                    else:
-                        if button_text not in seen_specific:
-                            seen_specific.add(button_text)
-                            specific_content.append(button_text)
-            
-            # Extract headings specifically
-            for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                heading_text = heading.get_text(strip=True)
-                if heading_text and len(heading_text) > 1:
-                    if heading_text not in seen_specific:
-                        seen_specific.add(heading_text)
-                        specific_content.append(heading_text)
-            
-            # Extract paragraphs specifically
-            for para in soup.find_all('p'):
-                para_text = para.get_text(strip=True)
-                if para_text and len(para_text) > 5:
-                    if para_text not in seen_specific:
-                        seen_specific.add(para_text)
-                        specific_content.append(para_text)
-            
-            # Extract list items specifically
-            for li in soup.find_all('li'):
-                li_text = li.get_text(strip=True)
-                if li_text and len(li_text) > 2:
-                    if li_text not in seen_specific:
-                        seen_specific.add(li_text)
-                        specific_content.append(li_text)
-            
-            # Use specific content if it's longer
-            specific_text = '\n'.join(specific_content)
-            if len(specific_text) > len(final_text):
-                final_text = specific_text
-            
-            # Final approach: Better text separation for concatenated content
-            separated_content = []
-            seen_separated = set()
-            
-            # Get all text and split concatenated words
-            all_text = soup.get_text(separator=' ', strip=True)
-            
-            # Split by common patterns that indicate concatenated text
-            # Pattern 1: camelCase or PascalCase (HomeAboutUs -> Home About Us)
-            all_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', all_text)
-            
-            # Pattern 2: Numbers followed by letters (48+Insurers -> 48+ Insurers)
-            all_text = re.sub(r'(\d+)([A-Za-z])', r'\1 \2', all_text)
-            
-            # Pattern 3: Letters followed by numbers (Insurers48 -> Insurers 48)
-            all_text = re.sub(r'([A-Za-z])(\d+)', r'\1 \2', all_text)
-            
-            # Pattern 4: Special characters (Schedule a Demo -> Schedule a Demo)
-            all_text = re.sub(r'([a-z])([A-Z][a-z])', r'\1 \2', all_text)
-            
-            # Split into lines and clean up
-            lines = all_text.split('\n')
-            for line in lines:
-                line = line.strip()
-                if line and len(line) > 1:
-                    # Further split by common separators
-                    words = re.split(r'[\s,;]+', line)
-                    for word in words:
-                        word = word.strip()
-                        if word and len(word) > 1 and len(word) < 100:
-                            # Apply filtering
-                            if not any(unwanted in word.lower() for unwanted in [
-                                'google tag manager', 'bootstrap css', 'js', 'css', 'javascript',
-                                '.webp', '.png', '.jpg', '.jpeg', '.svg', '.gif', '.ico',
-                                '@1x', '@2x', '@3x', '@1.5x', '@2.5x', '@3.5x',
-                                'without@', 'with@', 'image@', 'img@'
-                            ]):
-                                if not re.search(r'\.(webp|png|jpg|jpeg|svg|gif|ico)', word, re.IGNORECASE):
-                                    if not re.search(r'@\d+\.?\d*x', word, re.IGNORECASE):
-                                        if not re.search(r'<[^>]+>', word):
-                                            if word not in seen_separated:
-                                                seen_separated.add(word)
-                                                separated_content.append(word)
-            
-            # Use separated content if it's longer
-            separated_text = '\n'.join(separated_content)
-            if len(separated_text) > len(final_text):
-                final_text = separated_text
-            
-            # Final cleanup - remove any remaining unwanted patterns
-            final_cleanup_patterns = [
-                r'[Ww]ithout@[0-9.]+x\.webp',
-                r'[Ww]ith@[0-9.]+x\.webp',
-                r'[A-Za-z0-9_-]*@[0-9.]+x\.webp',
-                r'[A-Za-z0-9_-]*\.webp',
-            ]
-            
-            for pattern in final_cleanup_patterns:
-                final_text = re.sub(pattern, '', final_text, flags=re.IGNORECASE)
-            
-            # Remove specific unwanted strings
-            unwanted_strings = [
-                'Without@1.5x.webp', 'with@1.5x.webp', 'Without@2x.webp', 'with@2x.webp',
-                'Without@3x.webp', 'with@3x.webp', 'without@1.5x.webp', 'with@1.5x.webp'
-            ]
-            
-            for unwanted in unwanted_strings:
-                final_text = final_text.replace(unwanted, '')
-                final_text = final_text.replace(unwanted.lower(), '')
-                final_text = final_text.replace(unwanted.upper(), '')
-            
-            # Clean up extra whitespace and HTML tags
-            final_text = re.sub(r'<[^>]+>', '', final_text)  # Remove any remaining HTML tags
-            final_text = re.sub(r'&[a-zA-Z0-9#]+;', '', final_text)  # Remove HTML entities
-            final_text = re.sub(r'\n\s*\n', '\n', final_text)
-            final_text = final_text.strip()
-            
-            # Remove empty lines and lines with only whitespace, and remove duplicates
-            lines = final_text.split('\n')
-            non_empty_lines = [line for line in lines if line.strip()]
-            
-            # Remove duplicates while preserving order
-            seen_final_lines = set()
-            unique_final_lines = []
-            for line in non_empty_lines:
-                if line not in seen_final_lines:
-                    seen_final_lines.add(line)
-                    unique_final_lines.append(line)
-            
-            final_text = '\n'.join(unique_final_lines)
-            
-            # Don't add any default email - only use emails from website
-            
-            # Add line numbers to each line for proper extraction
-            lines_with_numbers = []
-            for i, line in enumerate(final_text.split('\n'), 1):
-                if line.strip():  # Only add non-empty lines
-                    lines_with_numbers.append(f"{i}. {line.strip()}")
-            
-            return '\n'.join(lines_with_numbers)
+        # Incremental extraction overlaps the download with the parsing
+        if data.get('stream') or data.get('incremental'):
+            return extract_text_incremental(url, bool(data.get('stream')))
         
-        text = extract_policy_relevant_text(soup)
+        text = extract_url_text(url)
         
         return jsonify({
             'success': True,
@@ -687,10 +188,615 @@ def extract_text():
         })
         
     except requests.exceptions.RequestException as e:
+        record_error(e)
         return jsonify({'error': f'Failed to fetch website: {str(e)}'}), 400
+    except PageTooComplex as e:
+        record_error(e)
+        return jsonify({'error': f'Page is too large to extract: {str(e)}'}), 413
+    except PoolBusy as e:
+        record_error(e)
+        return jsonify({'error': f'Server is busy, please retry: {str(e)}'}), 503
+    except TaskTimeout as e:
+        record_error(e)
+        return jsonify({'error': f'Text extraction timed out: {str(e)}'}), 504
     except Exception as e:
+        record_error(e)
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
+def extract_text_incremental(url, stream):
+    """
+    Extract text while the page downloads. With stream set, the lines are
+    sent as NDJSON as soon as each one is found, then a summary line.
+    """
+    encoding, chunks = open_stream(http_client.session(), url)
+    lines = iter_streamed_lines(chunks, encoding)
+    
+    if not stream:
+        text = '\n'.join(f"{i}. {line}" for i, line in enumerate(lines, 1))
+        return jsonify({
+            'success': True,
+            'text': text,
+            'message': f'Successfully extracted text from {url}'
+        })
+    
+    def generate():
+        count = 0
+        try:
+            for count, line in enumerate(lines, 1):
+                yield json.dumps({'line': count, 'text': line}) + '\n'
+        except requests.exceptions.RequestException as e:
+            record_error(e)
+            yield json.dumps({'error': f'Failed to fetch website: {str(e)}'}) + '\n'
+            return
+        except Exception as e:
+            record_error(e)
+            yield json.dumps({'error': f'An error occurred: {str(e)}'}) + '\n'
+            return
+        yield json.dumps({'done': True, 'lines': count, 'message': f'Successfully extracted text from {url}'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/extract_text_batch', methods=['POST'])
+def extract_text_batch():
+    """
+    Extract text from many URLs concurrently.
+    Results are streamed back as NDJSON, one line per URL in completion order.
+    """
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'Please provide a list of URLs'}), 400
+    
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs can be extracted in one batch'}), 400
+    
+    urls = [prepare_url(url) if isinstance(url, str) else '' for url in urls]
+    if not all(urls):
+        return jsonify({'error': 'Please provide a valid URL for every entry'}), 400
+    
+    def generate():
+        for index, url, text, error in run_batch(urls, extract_url_text):
+            if error is None:
+                line = {'index': index, 'url': url, 'success': True, 'text': text}
+            elif isinstance(error, requests.exceptions.RequestException):
+                line = {'index': index, 'url': url, 'error': f'Failed to fetch website: {str(error)}'}
+            else:
+                line = {'index': index, 'url': url, 'error': f'An error occurred: {str(error)}'}
+            yield json.dumps(line) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/crawl', methods=['POST'])
+def crawl():
+    """
+    Crawl a site from a seed URL and/or sitemap and extract every page found.
+    Results are streamed back as NDJSON: a first line with the crawl ID,
+    one line per page and a final summary line. Posting {"crawl_id": ...}
+    resumes an interrupted crawl from its checkpoint.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    error = string_fields_error(data, 'crawl_id', 'url', 'sitemap')
+    if error:
+        return jsonify({'error': error}), 400
+    crawl_id = data.get('crawl_id')
+    
+    try:
+        max_depth = min(int(data.get('max_depth', CRAWL_MAX_DEPTH)), CRAWL_MAX_DEPTH)
+        max_pages = min(int(data.get('max_pages', CRAWL_MAX_PAGES)), CRAWL_MAX_PAGES)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_depth and max_pages must be numbers'}), 400
+    
+    if crawl_id:
+        state = load_checkpoint(crawl_id)
+        if state is None:
+            return jsonify({'error': 'Unknown crawl ID'}), 404
+        crawler = Crawler.resume(state)
+        if 'max_pages' in data:
+            crawler.max_pages = max_pages
+    else:
+        seed_url = prepare_url(data.get('url', ''))
+        sitemap_url = prepare_url(data.get('sitemap', ''))
+        
+        if not seed_url and not sitemap_url:
+            return jsonify({'error': 'Please provide a URL or sitemap to crawl'}), 400
+        
+        crawler = Crawler(seed_url or None, sitemap_url=sitemap_url or None,
+                          max_depth=max_depth, max_pages=max_pages)
+    
+    def generate():
+        yield json.dumps({'crawl_id': crawler.crawl_id}) + '\n'
+        for page in crawler.run(fetch_url, extract_text_cached):
+            yield json.dumps(page) + '\n'
+        yield json.dumps(dict(crawler.status(), done=True)) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/crawl/<crawl_id>', methods=['GET'])
+def crawl_status(crawl_id):
+    """Progress of a crawl as of its last checkpoint"""
+    state = load_checkpoint(crawl_id)
+    if state is None:
+        return jsonify({'error': 'Unknown crawl ID'}), 404
+    return jsonify(Crawler.resume(state).status())
+
+def extract_text_cached(content):
+    """Run the extraction pipeline, reusing the result for identical page bodies"""
+    key = (hashlib.sha256(content).hexdigest(), PIPELINE_VERSION)
+    text = extraction_cache.get(key)
+    if text is None:
+        # Parsing runs in a worker process when EXTRACT_POOL_WORKERS is set
+        with timed('extract'):
+            text = extraction_pool.call(extract_text_from_html, content)
+        extraction_cache.put(key, text)
+    return text
+
+def extract_text_from_html(content, parser=None):
+    """Parse a page body and return its numbered policy-relevant text lines"""
+    if EXTRACT_MEMORY_BOUNDED:
+        # Refuse pages whose tree would not fit the memory budget before building it
+        check_page(content)
+    
+    with stage_tracker.track('extract_text'):
+        mark_stage('parse')
+        soup = BeautifulSoup(content, parser or PARSER_BACKEND)
+        
+        # Remove scripts, styles, navigation, marketing, social, hidden and image
+        # elements in a single walk of the tree
+        mark_stage('clean')
+        clean_tree(soup)
+        
+        return extract_policy_relevant_text(soup, keep_tree=not EXTRACT_MEMORY_BOUNDED)
+
+# Patterns of the extraction pipeline, compiled once at import
+HTML_TAG_PATTERN = regexes.compile('html_tag', r'<[^>]+>')
+HTML_ENTITY_PATTERN = regexes.compile('html_entity', r'&[a-zA-Z0-9#]+;')
+WHITESPACE_PATTERN = regexes.compile('whitespace', r'\s+')
+BLANK_LINES_PATTERN = regexes.compile('blank_lines', r'\n\s*\n')
+SENTENCE_BREAK_PATTERN = regexes.compile('sentence_break', r'[.!?]\s+|\n+')
+CLAUSE_BREAK_PATTERN = regexes.compile('clause_break', r'[,;]\s+|\s+-\s+')
+CONCATENATED_PATTERN = regexes.compile('concatenated', r'[A-Z][a-z]+[A-Z]')
+CAPITALIZED_WORDS_PATTERN = regexes.compile('capitalized_words', r'[A-Z][a-z]*(?:\s+[A-Z][a-z]*)*')
+WORD_SEPARATOR_PATTERN = regexes.compile('word_separator', r'[\s,;]+')
+
+# Common patterns that indicate concatenated text, each split with a space
+WORD_BOUNDARY_PATTERNS = regexes.compile_all('word_boundary', [
+    r'([a-z])([A-Z])',  # camelCase or PascalCase (HomeAboutUs -> Home About Us)
+    r'(\d+)([A-Za-z])',  # Numbers followed by letters (48+Insurers -> 48+ Insurers)
+    r'([A-Za-z])(\d+)',  # Letters followed by numbers (Insurers48 -> Insurers 48)
+    r'([a-z])([A-Z][a-z])',  # Special characters (Schedule a Demo -> Schedule a Demo)
+])
+
+# Image names removed from the final text
+FINAL_CLEANUP_PATTERNS = regexes.compile_all('final_cleanup', [
+    r'[Ww]ithout@[0-9.]+x\.webp',
+    r'[Ww]ith@[0-9.]+x\.webp',
+    r'[A-Za-z0-9_-]*@[0-9.]+x\.webp',
+    r'[A-Za-z0-9_-]*\.webp',
+], re.IGNORECASE)
+
+# Longest phrase, in characters, before it is cut at the next word
+MAX_PHRASE_LENGTH = 100
+
+def iter_phrases(text):
+    """
+    Yield the phrases of text word by word: a phrase ends at a word ending
+    in '.', '!' or '?', or once it is longer than MAX_PHRASE_LENGTH.
+    """
+    words = []
+    length = -1  # Length of the words joined by single spaces
+    for word in text.split():
+        words.append(word)
+        length += len(word) + 1
+        if word.endswith(('.', '!', '?')) or length > MAX_PHRASE_LENGTH:
+            yield ' '.join(words)
+            words = []
+            length = -1
+    
+    # Add remaining content
+    if words:
+        yield ' '.join(words)
+
+# Categories that exclude a streamed line, as for the raw text lines strategy
+STREAM_UNWANTED_CATEGORIES = frozenset(['tech_asset', 'markup', 'image_ref', 'html_tag'])
+
+def iter_streamed_lines(chunks, encoding):
+    """
+    Policy-relevant text lines of a page body given as chunks, each one
+    filtered as soon as the streaming parser completes it
+    """
+    seen_lines = set()
+    for line in iter_lines(chunks, encoding):
+        # Scrub image names and rewrite metrics as on the text nodes of a parsed page
+        line = HTML_TAG_PATTERN.sub('', rewrite_run(line, None)).strip()
+        if len(line) <= 5 or line in seen_lines:
+            continue
+        seen_lines.add(line)
+        if is_policy_text(line, classifier.classify(line), STREAM_UNWANTED_CATEGORIES):
+            yield line
+
+def is_policy_relevant(categories):
+    """Check if classified text is relevant to insurance policy content"""
+    return 'policy' in categories or 'policy_pattern' in categories
+
+def is_irrelevant_content(text, categories):
+    """Check if classified text is irrelevant navigation/marketing content"""
+    # Check for very short or generic text
+    is_too_short = len(text.strip()) < 10
+    
+    # Check for repetitive navigation text
+    is_navigation = 'navigation' in categories and len(text.strip()) < 50
+    
+    return 'irrelevant' in categories or is_too_short or is_navigation
+
+def is_policy_text(text, categories, unwanted_categories):
+    """Relevant policy text that mentions none of unwanted_categories"""
+    return (not is_irrelevant_content(text, categories) and is_policy_relevant(categories)
+            and not categories & unwanted_categories)
+
+# Enhanced text extraction focusing on policy-related content
+def extract_policy_relevant_text(soup, keep_tree=True):
+    """
+    Build the policy-relevant text of a tree already cleaned by clean_tree().
+    With keep_tree unset the tree is released once its candidate texts are collected.
+    """
+    # Scrub image names, fill in protected emails and rewrite metrics on the
+    # text nodes in one walk, without serializing and reparsing the page
+    mark_stage('rewrite')
+    text = rewrite_text(soup)
+    
+    # Clean up any remaining HTML entities and tags
+    text = HTML_TAG_PATTERN.sub('', text)  # Remove any remaining HTML tags
+    text = HTML_ENTITY_PATTERN.sub('', text)  # Remove HTML entities
+    
+    # Clean up the text
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    
+    # Split into meaningful sentences and phrases - improved method
+    mark_stage('segment')
+    sentences = []
+    
+    # Split by common sentence endings and line breaks
+    text_parts = SENTENCE_BREAK_PATTERN.split(text)
+    
+    for part in text_parts:
+        part = part.strip()
+        if part and len(part) > 2:  # Keep meaningful parts
+            # Split long parts into smaller chunks if needed
+            if len(part) > 200:
+                # Split by common separators
+                sub_parts = CLAUSE_BREAK_PATTERN.split(part)
+                for sub_part in sub_parts:
+                    sub_part = sub_part.strip()
+                    if sub_part and len(sub_part) > 2:
+                        sentences.append(sub_part)
+            else:
+                sentences.append(part)
+    
+    # Also try word-by-word approach for better coverage, skipping phrases
+    # already found with a set instead of scanning the list for each one
+    seen_sentences = set(sentences)
+    for phrase in iter_phrases(text):
+        if phrase not in seen_sentences:  # Avoid duplicates
+            seen_sentences.add(phrase)
+            sentences.append(phrase)
+    
+    # Intermediates are released as soon as they are consumed
+    del text, text_parts, seen_sentences
+    
+    # Enhanced policy-focused content filtering. Each line is classified once
+    # by keyword_classifier, and is_policy_text() looks at its categories.
+    classify = classifier.classify
+    
+    # The five strategies below each produce a candidate text and the longest
+    # one is used. Each gets an upper bound on its length from its unfiltered
+    # candidates, so only the strategies that can still win are filtered.
+    
+    def split_concatenated(item_text):
+        """Split camelCase-concatenated text into its words, or keep it whole"""
+        if CONCATENATED_PATTERN.search(item_text):  # Check for camelCase or concatenated words
+            # Split by capital letters
+            separated_items = CAPITALIZED_WORDS_PATTERN.findall(item_text)
+            return [item.strip() for item in separated_items if len(item.strip()) > 1]
+        return [item_text]
+    
+    def joined_length(items):
+        """Length of the items joined by newlines, without joining them"""
+        return sum(len(item) for item in items) + max(len(items) - 1, 0)
+    
+    # Strategy 1: sentences and phrases with policy-focused filtering
+    mark_stage('candidates.sentences')
+    candidate_sentences = []
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if sentence and len(sentence) > 5:  # Minimum meaningful length
+            candidate_sentences.append(sentence)
+    del sentences
+    
+    def build_sentence_text():
+        # Sentences also exclude page metadata and hidden-element markers. Image
+        # file names such as Without@2x.webp are covered by the .webp keyword.
+        unwanted = {'tech_asset', 'markup', 'page_meta', 'image_ref', 'html_tag'}
+        clean_sentences = [sentence for sentence in candidate_sentences
+                           if is_policy_text(sentence, classify(sentence), unwanted)]
+        return '\n'.join(clean_sentences)
+    
+    # Strategy 2: raw text lines of the page with policy-focused restrictions
+    mark_stage('candidates.raw_lines')
+    raw_text = soup.get_text(separator='\n', strip=True)
+    
+    # Clean up the raw text
+    raw_text = BLANK_LINES_PATTERN.sub('\n', raw_text)  # Remove multiple newlines
+    raw_text = HTML_TAG_PATTERN.sub('', raw_text)  # Remove any remaining HTML tags
+    raw_text = HTML_ENTITY_PATTERN.sub('', raw_text)  # Remove HTML entities
+    
+    # Distinct lines of a meaningful length; filtering keeps their order
+    candidate_lines = []
+    seen_lines = set()
+    for line in raw_text.split('\n'):
+        line = line.strip()
+        if line and len(line) > 5 and line not in seen_lines:
+            seen_lines.add(line)
+            candidate_lines.append(line)
+    del raw_text, seen_lines
+    
+    def build_line_text():
+        # Only filter out very obvious unwanted content
+        unwanted = {'tech_asset', 'markup', 'image_ref', 'html_tag'}
+        filtered_lines = [line for line in candidate_lines if is_policy_text(line, classify(line), unwanted)]
+        return '\n'.join(filtered_lines)
+    
+    def passes_basic_filter(item_text):
+        """Reject text that mentions scripts, styles, image files or HTML tags"""
+        return not classify(item_text) & {'tech_asset', 'image_ref', 'html_tag'}
+    
+    # Every element in document order, and get_text(strip=True) of each,
+    # computed once for strategies 3 and 4 instead of a find_all() per query
+    mark_stage('candidates.elements')
+    elements = [node for node in soup.descendants if isinstance(node, Tag)]
+    texts = element_texts(soup)
+    
+    # Strategy 3: all content in DOM order with duplicate removal
+    mark_stage('candidates.dom_order')
+    dom_texts = []
+    dom_tags = {'nav', 'menu', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 
+                'p', 'li', 'button', 'a', 'strong', 'b', 'em', 'i', 'div', 'span'}
+    for element in elements:
+        if element.name not in dom_tags:
+            continue
+        element_text = texts[id(element)]
+        # Avoid very short and very long content
+        if len(element_text) > 1 and len(element_text) < 1000:
+            dom_texts.append(element_text)
+    
+    # Every distinct item any element could contribute
+    dom_items = list(dict.fromkeys(item for element_text in dom_texts for item in split_concatenated(element_text)))
+    
+    def build_dom_text():
+        all_content = []
+        seen_content = set()
+        for element_text in dom_texts:
+            # Apply basic filtering
+            if passes_basic_filter(element_text):
+                # Split concatenated text and check for duplicates
+                for item in split_concatenated(element_text):
+                    if item not in seen_content:
+                        seen_content.add(item)
+                        all_content.append(item)
+        return '\n'.join(all_content)
+    
+    # Strategy 4: specific elements with better targeting; nothing is
+    # filtered out of these, so the text itself is cheap to build
+    mark_stage('candidates.specific_elements')
+    specific_content = []
+    seen_specific = set()
+    
+    def add_specific(items):
+        for item in items:
+            if item not in seen_specific:
+                seen_specific.add(item)
+                specific_content.append(item)
+    
+    # Extract navigation elements specifically with proper separation. Items of
+    # a nested list were already taken with the outer one, so each item inside
+    # any nav, ul or ol is visited once, in document order
+    for item in elements:
+        if item.name in ('li', 'a') and any(parent.name in ('nav', 'ul', 'ol') for parent in item.parents):
+            item_text = texts[id(item)]
+            if len(item_text) > 1 and len(item_text) < 100:
+                add_specific(split_concatenated(item_text))
+    
+    # Extract buttons specifically with proper separation
+    for button in elements:
+        if button.name in ('button', 'a'):
+            button_text = texts[id(button)]
+            if len(button_text) > 1 and len(button_text) < 100:
+                add_specific(split_concatenated(button_text))
+    
+    # Extract headings specifically
+    for heading in elements:
+        if heading.name in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            heading_text = texts[id(heading)]
+            if len(heading_text) > 1:
+                add_specific([heading_text])
+    
+    # Extract paragraphs specifically
+    for para in elements:
+        if para.name == 'p':
+            para_text = texts[id(para)]
+            if len(para_text) > 5:
+                add_specific([para_text])
+    
+    # Extract list items specifically
+    for li in elements:
+        if li.name == 'li':
+            li_text = texts[id(li)]
+            if len(li_text) > 2:
+                add_specific([li_text])
+    
+    specific_text = '\n'.join(specific_content)
+    del elements, texts, specific_content, seen_specific
+    
+    # Strategy 5: better text separation for concatenated content
+    mark_stage('candidates.separated_words')
+    all_text = soup.get_text(separator=' ', strip=True)
+    
+    # Split by common patterns that indicate concatenated text
+    for pattern in WORD_BOUNDARY_PATTERNS:
+        all_text = pattern.sub(r'\1 \2', all_text)
+    
+    # Distinct words, split by common separators; filtering keeps their order
+    candidate_words = []
+    seen_separated = set()
+    for line in all_text.split('\n'):
+        line = line.strip()
+        if line and len(line) > 1:
+            for word in WORD_SEPARATOR_PATTERN.split(line):
+                word = word.strip()
+                if word and len(word) > 1 and len(word) < 100 and word not in seen_separated:
+                    seen_separated.add(word)
+                    candidate_words.append(word)
+    del all_text, seen_separated
+    
+    # Every strategy has its candidates now, so the tree is no longer needed
+    if not keep_tree:
+        release_tree(soup)
+    
+    def build_separated_text():
+        return '\n'.join(word for word in candidate_words if passes_basic_filter(word))
+    
+    # Use the longest text; on equal lengths the earlier strategy wins
+    mark_stage('select')
+    _, final_text = pick_longest([
+        ('sentences', joined_length(candidate_sentences), build_sentence_text),
+        ('raw_lines', joined_length(candidate_lines), build_line_text),
+        ('dom_order', joined_length(dom_items), build_dom_text),
+        ('specific_elements', len(specific_text), lambda: specific_text),
+        ('separated_words', joined_length(candidate_words), build_separated_text),
+    ])
+    
+    # Final cleanup - remove any remaining unwanted patterns
+    mark_stage('finalize')
+    for pattern in FINAL_CLEANUP_PATTERNS:
+        final_text = pattern.sub('', final_text)
+    
+    # Remove specific unwanted strings
+    unwanted_strings = [
+        'Without@1.5x.webp', 'with@1.5x.webp', 'Without@2x.webp', 'with@2x.webp',
+        'Without@3x.webp', 'with@3x.webp', 'without@1.5x.webp', 'with@1.5x.webp'
+    ]
+    
+    for unwanted in unwanted_strings:
+        final_text = final_text.replace(unwanted, '')
+        final_text = final_text.replace(unwanted.lower(), '')
+        final_text = final_text.replace(unwanted.upper(), '')
+    
+    # Clean up extra whitespace and HTML tags
+    final_text = HTML_TAG_PATTERN.sub('', final_text)  # Remove any remaining HTML tags
+    final_text = HTML_ENTITY_PATTERN.sub('', final_text)  # Remove HTML entities
+    final_text = BLANK_LINES_PATTERN.sub('\n', final_text)
+    final_text = final_text.strip()
+    
+    # Remove empty lines and lines with only whitespace, and remove duplicates
+    lines = final_text.split('\n')
+    non_empty_lines = [line for line in lines if line.strip()]
+    
+    # Remove duplicates while preserving order
+    seen_final_lines = set()
+    unique_final_lines = []
+    for line in non_empty_lines:
+        if line not in seen_final_lines:
+            seen_final_lines.add(line)
+            unique_final_lines.append(line)
+    
+    final_text = '\n'.join(unique_final_lines)
+    
+    # Don't add any default email - only use emails from website
+    
+    # Add line numbers to each line for proper extraction
+    lines_with_numbers = []
+    for i, line in enumerate(final_text.split('\n'), 1):
+        if line.strip():  # Only add non-empty lines
+            lines_with_numbers.append(f"{i}. {line.strip()}")
+    
+    return '\n'.join(lines_with_numbers)
+
+# Stages reported by the jobs of each type, in order
+JOB_STAGES = {
+    'extract_text': ['fetching', 'extracting'],
+    'extract_policy': ['extracting'],
+}
+
+def run_extract_text_job(job, url):
+    job.set_stage('fetching')
+    content = fetch_url(url)
+    job.set_stage('extracting')
+    return {'text': extract_text_cached(content)}
+
+def run_extract_policy_job(job, text):
+    job.set_stage('extracting')
+    return {'policy_data': extraction_pool.call(extract_policy_information, text)}
+
+def describe_job_error(error):
+    """The error message the synchronous endpoints would return"""
+    if isinstance(error, requests.exceptions.RequestException):
+        return f'Failed to fetch website: {str(error)}'
+    if isinstance(error, TaskTimeout):
+        return f'Extraction timed out: {str(error)}'
+    return f'An error occurred: {str(error)}'
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Start an extraction in the background and return its job ID at once.
+    {"type": "extract_text", "url": ...} or {"type": "extract_policy", "text": ...}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    kind = data.get('type', 'extract_text')
+    error = string_fields_error(data, 'type', 'url', 'text')
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if kind == 'extract_text':
+        url = prepare_url(data.get('url', ''))
+        if not url:
+            return jsonify({'error': 'Please provide a valid URL'}), 400
+        func, arg = run_extract_text_job, url
+        key = (kind, url)
+    elif kind == 'extract_policy':
+        text = (data.get('text') or '').strip()
+        if not text:
+            return jsonify({'error': 'Please provide text content to analyze'}), 400
+        func, arg = run_extract_policy_job, text
+        key = (kind, hashlib.sha256(text.encode('utf-8')).hexdigest())
+    else:
+        return jsonify({'error': f'Unknown job type: {kind}'}), 400
+    
+    try:
+        # A retry of a pending or just finished job gets the same job back
+        job = job_manager.submit(kind, JOB_STAGES[kind], func, arg, key=key,
+                                 describe_error=describe_job_error)
+    except QueueFull as e:
+        record_error(e)
+        return jsonify({'error': f'Server is busy, please retry: {str(e)}'}), 503
+    except OSError as e:
+        record_error(e)
+        return jsonify({'error': f'Could not save the job: {str(e)}'}), 500
+    
+    return jsonify(dict(job.to_dict(), status_url=f'/jobs/{job.job_id}')), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Stage and progress of a job, with its result once it is done"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job ID'}), 404
+    return jsonify(job.to_dict())
+
 @app.route('/upload_file', methods=['POST'])
 def upload_file():
     try:
@@ -716,27 +822,137 @@ def upload_file():
             return jsonify({'error': 'Please upload a .txt file'}), 400
             
     except Exception as e:
+        record_error(e)
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
+compare_log = logging.getLogger('webscraper.compare')
+
+def compare_fields_error(text1, text2, reference_id):
+    """Why the fields of a comparison request have the wrong types, or None if they are usable"""
+    if any(text is not None and not isinstance(text, str) for text in (text1, text2)):
+        return 'text1 and text2 must be strings'
+    if reference_id is not None and not isinstance(reference_id, str):
+        return 'reference_id must be a string'
+    return None
+
+def normalize_lines(text):
+    """Non-empty lines of text, each as its stripped original and its form for comparison"""
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:  # Keep all non-empty lines
+            original_line = line
+            # Normalize whitespace but preserve structure
+            normalized_line = ' '.join(line.split())
+            # Convert to lowercase for case-insensitive comparison
+            normalized_line = normalized_line.lower().strip()
+    
+            lines.append({
+                'original': original_line,
+                'normalized': normalized_line
+            })
+    return lines
+
+def diff_lines(website_lines, file_lines, reference=None):
+    """
+    Opcodes turning the website's normalized lines into the file's. When the
+    file is a reference document, its stored line IDs are reused and only
+    the website's lines are interned.
+    """
+    website_normalized = [line['normalized'] for line in website_lines]
+    if reference is not None:
+        return line_opcodes(intern_against(reference.table, website_normalized), reference.ids)
+    website_ids, file_ids = intern_lines(website_normalized, [line['normalized'] for line in file_lines])
+    return line_opcodes(website_ids, file_ids)
+
+def diff_entries(website_lines, file_lines, opcodes):
+    """The removed and added lines of opcodes, numbered on their own side"""
+    simple_diffs = []
+    line_number_website = 1
+    line_number_file = 1
+    
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            # Lines are the same, just advance line numbers
+            line_number_website += (i2 - i1)
+            line_number_file += (j2 - j1)
+        elif tag == 'delete':
+            # Lines removed from website
+            for i in range(i1, i2):
+                if i < len(website_lines):
+                    simple_diffs.append({
+                        'type': 'removed',
+                        'line_number': line_number_website,
+                        'website': website_lines[i]['original'],
+                        'file': None
+                    })
+                    line_number_website += 1
+        elif tag == 'insert':
+            # Lines added to file
+            for j in range(j1, j2):
+                if j < len(file_lines):
+                    simple_diffs.append({
+                        'type': 'added',
+                        'line_number': line_number_file,
+                        'website': None,
+                        'file': file_lines[j]['original']
+                    })
+                    line_number_file += 1
+        elif tag == 'replace':
+            # Lines replaced
+            # Add removed lines
+            for i in range(i1, i2):
+                if i < len(website_lines):
+                    simple_diffs.append({
+                        'type': 'removed',
+                        'line_number': line_number_website,
+                        'website': website_lines[i]['original'],
+                        'file': None
+                    })
+                    line_number_website += 1
+            # Add added lines
+            for j in range(j1, j2):
+                if j < len(file_lines):
+                    simple_diffs.append({
+                        'type': 'added',
+                        'line_number': line_number_file,
+                        'website': None,
+                        'file': file_lines[j]['original']
+                    })
+                    line_number_file += 1
+    
+    return simple_diffs
+
+
 @app.route('/compare_texts', methods=['POST'])
 def compare_texts():
     try:
-        print("=== COMPARE TEXTS REQUEST ===")
         data = request.get_json()
-        print(f"Received data: {data}")
         
-        if not data:
-            print("ERROR: No data received")
+        if not data or not isinstance(data, dict):
+            compare_log.warning('No data received')
             return jsonify({'error': 'No data received'}), 400
             
         text1 = data.get('text1', '')
         text2 = data.get('text2', '')
+        reference_id = data.get('reference_id')
+        error = compare_fields_error(text1, text2, reference_id)
+        if error:
+            compare_log.warning(error)
+            return jsonify({'error': error}), 400
+        
+        # Sizes are always logged, the texts only for sampled requests
+        log_payloads(compare_log, 'Comparing texts', {'reference_id': reference_id}, text1=text1, text2=text2)
         
-        print(f"Text1 length: {len(text1)}")
-        print(f"Text2 length: {len(text2)}")
+        # A registered reference document stands in for text2
+        reference = None
+        if reference_id:
+            reference = reference_store.get(reference_id)
+            if reference is None:
+                return jsonify({'error': 'Unknown reference document ID'}), 404
         
-        if not text1 or not text2:
-            print("ERROR: Missing text data")
+        if not text1 or not (text2 or reference):
+            compare_log.warning('Missing text data')
             return jsonify({'error': 'Both texts are required for comparison'}), 400
         
         # Enhanced diff algorithm using Python's difflib for better results
@@ -785,155 +1001,268 @@ def compare_texts():
             
             return differences
         
-        # Create word-level differences for better highlighting
-        def create_word_level_diff(text1, text2):
-            # Use difflib for word-level comparison
-            differ = difflib.SequenceMatcher(None, text1, text2)
-            word_diffs = []
-            
-            for tag, i1, i2, j1, j2 in differ.get_opcodes():
-                if tag == 'equal':
-                    continue
-                elif tag == 'delete':
-                    word_diffs.append({
-                        'type': 'removed',
-                        'content': text1[i1:i2],
-                        'start': i1,
-                        'end': i2
-                    })
-                elif tag == 'insert':
-                    word_diffs.append({
-                        'type': 'added',
-                        'content': text2[j1:j2],
-                        'start': j1,
-                        'end': j2
-                    })
-                elif tag == 'replace':
-                    word_diffs.append({
-                        'type': 'removed',
-                        'content': text1[i1:i2],
-                        'start': i1,
-                        'end': i2
-                    })
-                    word_diffs.append({
-                        'type': 'added',
-                        'content': text2[j1:j2],
-                        'start': j1,
-                        'end': j2
-                    })
-            
-            return word_diffs
-        
-        # Enhanced text normalization for better comparison
-        def normalize_text(text):
-            lines = []
-            for line in text.splitlines():
-                line = line.strip()
-                if line:  # Keep all non-empty lines
-                    original_line = line
-                    # Normalize whitespace but preserve structure
-                    normalized_line = ' '.join(line.split())
-                    # Convert to lowercase for case-insensitive comparison
-                    normalized_line = normalized_line.lower().strip()
-                    
-                    lines.append({
-                        'original': original_line,
-                        'normalized': normalized_line
-                    })
-            return lines
-        
         # Get normalized content
-        website_lines = normalize_text(text1)
-        file_lines = normalize_text(text2)
-        
-        # Extract normalized text for comparison
-        website_normalized = [line['normalized'] for line in website_lines]
-        file_normalized = [line['normalized'] for line in file_lines]
+        with timed('compare.normalize'):
+            website_lines = normalize_lines(text1)
+            file_lines = reference.lines if reference is not None else normalize_lines(text2)
         
-        # Use difflib for better line-by-line comparison
-        differ = difflib.SequenceMatcher(None, website_normalized, file_normalized)
+        # Diff the lines as interned integer IDs
+        with timed('compare.diff'):
+            opcodes = diff_lines(website_lines, file_lines, reference)
         
         # Create structured differences
-        simple_diffs = []
-        line_number_website = 1
-        line_number_file = 1
+        simple_diffs = diff_entries(website_lines, file_lines, opcodes)
+        
+        log_payloads(compare_log, 'Comparison complete', {'total_differences': len(simple_diffs)},
+                     simple_diffs=simple_diffs)
         
-        for tag, i1, i2, j1, j2 in differ.get_opcodes():
-            if tag == 'equal':
-                # Lines are the same, just advance line numbers
-                line_number_website += (i2 - i1)
-                line_number_file += (j2 - j1)
-            elif tag == 'delete':
-                # Lines removed from website
-                for i in range(i1, i2):
-                    if i < len(website_lines):
-                        simple_diffs.append({
-                            'type': 'removed',
-                            'line_number': line_number_website,
-                            'website': website_lines[i]['original'],
-                            'file': None
-                        })
-                        line_number_website += 1
-            elif tag == 'insert':
-                # Lines added to file
-                for j in range(j1, j2):
-                    if j < len(file_lines):
-                        simple_diffs.append({
-                            'type': 'added',
-                            'line_number': line_number_file,
-                            'website': None,
-                            'file': file_lines[j]['original']
-                        })
-                        line_number_file += 1
-            elif tag == 'replace':
-                # Lines replaced
-                # Add removed lines
-                for i in range(i1, i2):
-                    if i < len(website_lines):
-                        simple_diffs.append({
-                            'type': 'removed',
-                            'line_number': line_number_website,
-                            'website': website_lines[i]['original'],
-                            'file': None
-                        })
-                        line_number_website += 1
-                # Add added lines
-                for j in range(j1, j2):
-                    if j < len(file_lines):
-                        simple_diffs.append({
-                            'type': 'added',
-                            'line_number': line_number_file,
-                            'website': None,
-                            'file': file_lines[j]['original']
-                        })
-                        line_number_file += 1
+        # Aligned rows with word-level spans, so the browser does no alignment of its own.
+        # Only the changes and a few equal lines around them are sent, so the
+        # response grows with the differences rather than with the texts.
+        with timed('compare.intraline'):
+            website_originals = [line['original'] for line in website_lines]
+            file_originals = reference.originals if reference is not None else [line['original'] for line in file_lines]
+            rows = [row for hunk in group_hunks(opcodes)
+                    for row in aligned_rows(website_originals, file_originals, hunk)]
         
         # Check if texts are essentially identical
         if not simple_diffs:
             return jsonify({
                 'identical': True,
                 'total_differences': 0,
-                'simple_diffs': []
+                'simple_diffs': [],
+                'rows': rows
             })
         
-        print(f"=== COMPARISON COMPLETE ===")
-        print(f"Total differences: {len(simple_diffs)}")
-        print(f"Simple diffs: {simple_diffs}")
-        
         result = {
             'identical': False,
             'total_differences': len(simple_diffs),
-            'simple_diffs': simple_diffs
+            'simple_diffs': simple_diffs,
+            'rows': rows
         }
         
-        print(f"Returning result: {result}")
         return jsonify(result)
         
     except Exception as e:
-        print(f"ERROR in compare_texts: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        record_error(e)
+        compare_log.exception('Comparison failed')
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@app.route('/comparisons', methods=['POST'])
+def create_comparison():
+    """
+    Diff two texts once and keep the result, for reading a page of hunks at
+    a time. Returns the comparison's summary: its ID and its counts of
+    equal, changed, removed and added lines.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    text1 = data.get('text1', '')
+    text2 = data.get('text2', '')
+    reference_id = data.get('reference_id')
+    error = compare_fields_error(text1, text2, reference_id)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    log_payloads(compare_log, 'Creating comparison', {'reference_id': reference_id}, text1=text1, text2=text2)
+    
+    reference = None
+    if reference_id:
+        reference = reference_store.get(reference_id)
+        if reference is None:
+            return jsonify({'error': 'Unknown reference document ID'}), 404
+    
+    if not text1 or not (text2 or reference):
+        return jsonify({'error': 'Both texts are required for comparison'}), 400
+    try:
+        context = max(0, int(data.get('context', COMPARISON_CONTEXT_LINES)))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'context must be a number'}), 400
+    
+    try:
+        with timed('compare.normalize'):
+            website_lines = normalize_lines(text1)
+            file_lines = reference.lines if reference is not None else normalize_lines(text2)
+        with timed('compare.diff'):
+            opcodes = diff_lines(website_lines, file_lines, reference)
+        
+        # Only the original lines are kept; rows are built from them page by page
+        file_originals = reference.originals if reference is not None else [line['original'] for line in file_lines]
+        comparison = comparison_store.add(Comparison([line['original'] for line in website_lines],
+                                                     file_originals, opcodes, context=context))
+    except ComparisonTooLarge as e:
+        record_error(e)
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        record_error(e)
+        compare_log.exception('Comparison failed')
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+    
+    summary = comparison.summary()
+    compare_log.info('Comparison stored', extra={'fields': {
+        'comparison_id': comparison.comparison_id, 'hunks': summary['hunks'],
+        'total_differences': summary['total_differences']}})
+    return jsonify(dict(summary, hunks_url=f'/comparisons/{comparison.comparison_id}/hunks')), 201
+
+@app.route('/comparisons/<comparison_id>', methods=['GET'])
+def comparison_summary(comparison_id):
+    """Line counts by type and number of hunks of a stored comparison"""
+    comparison = comparison_store.get(comparison_id)
+    if comparison is None:
+        return jsonify({'error': 'Unknown or expired comparison ID'}), 404
+    return jsonify(comparison.summary())
+
+@app.route('/comparisons/<comparison_id>/hunks', methods=['GET'])
+def comparison_hunks(comparison_id):
+    """
+    One page of a stored comparison's hunks, with their rows. Pages start at
+    ?cursor= (the next_cursor of the previous page) or at ?page= (from 1)
+    and hold up to ?limit= hunks.
+    """
+    comparison = comparison_store.get(comparison_id)
+    if comparison is None:
+        return jsonify({'error': 'Unknown or expired comparison ID'}), 404
+    
+    try:
+        limit = min(max(1, int(request.args.get('limit', COMPARISON_PAGE_SIZE))), COMPARISON_MAX_PAGE_SIZE)
+        if 'cursor' in request.args:
+            cursor = int(request.args['cursor'])
+        else:
+            cursor = (int(request.args.get('page', 1)) - 1) * limit
+    except ValueError:
+        return jsonify({'error': 'cursor, page and limit must be numbers'}), 400
+    if cursor < 0:
+        return jsonify({'error': 'cursor and page must not be negative'}), 400
+    
+    with timed('compare.intraline'):
+        hunks, next_cursor = comparison.page(cursor, limit)
+    return jsonify({
+        'comparison_id': comparison_id,
+        'cursor': cursor,
+        'limit': limit,
+        'total_hunks': len(comparison.hunks),
+        'next_cursor': next_cursor,
+        'hunks': hunks
+    })
+
+@app.route('/references', methods=['POST'])
+def register_reference():
+    """
+    Register a reference document, such as an approved policy wording, to
+    compare texts against by its reference_id instead of sending it again.
+    Registering the same text twice returns the same document.
+    """
+    data = request.get_json(silent=True) or {}
+    text = data.get('text', '')
+    name = data.get('name')
+    
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'error': 'Please provide the text of the reference document'}), 400
+    if name is not None and not isinstance(name, str):
+        return jsonify({'error': 'name must be a string'}), 400
+    
+    try:
+        with timed('compare.normalize'):
+            lines = normalize_lines(text)
+        reference = reference_store.add(text, lines, name=name)
+    except ReferenceTooLarge as e:
+        record_error(e)
+        return jsonify({'error': str(e)}), 413
+    except OSError as e:
+        record_error(e)
+        compare_log.exception('Could not store reference document')
+        return jsonify({'error': f'Could not store reference document: {str(e)}'}), 500
+    
+    compare_log.info('Reference registered', extra={'fields': {
+        'reference_id': reference.reference_id, 'lines': len(reference.lines)}})
+    return jsonify(reference.to_dict()), 201
+
+@app.route('/references/<reference_id>', methods=['GET'])
+def reference_info(reference_id):
+    """Name and line counts of a registered reference document"""
+    reference = reference_store.get(reference_id)
+    if reference is None:
+        return jsonify({'error': 'Unknown reference document ID'}), 404
+    return jsonify(reference.to_dict())
+
+@app.route('/references/<reference_id>', methods=['DELETE'])
+def delete_reference(reference_id):
+    if not reference_store.delete(reference_id):
+        return jsonify({'error': 'Unknown reference document ID'}), 404
+    return jsonify({'reference_id': reference_id, 'deleted': True})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Request, outbound fetch and pipeline stage metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/admin/reference_stats', methods=['GET'])
+def reference_stats():
+    """Registered, loaded and evicted reference documents, with lookup hits and misses"""
+    return jsonify(reference_store.stats())
+
+@app.route('/admin/comparison_stats', methods=['GET'])
+def comparison_stats():
+    """Stored comparisons, their size and the store's hit, eviction and expiry counters"""
+    return jsonify(comparison_store.stats())
+
+@app.route('/admin/log_stats', methods=['GET'])
+def log_statistics():
+    """Queued and dropped log records and the number of sampled payloads logged"""
+    return jsonify(log_stats())
+
+@app.route('/admin/pool_stats', methods=['GET'])
+def pool_stats():
+    """Connection pool reuse counters for the outbound HTTP client"""
+    return jsonify(http_client.stats())
+
+@app.route('/admin/extract_pool_stats', methods=['GET'])
+def extract_pool_stats():
+    """Task, timeout, crash, recycling and rejection counters of the extraction process pool"""
+    return jsonify(extraction_pool.stats())
+
+@app.route('/admin/memory_stats', methods=['GET'])
+def memory_statistics():
+    """Sampled peak memory per pipeline run and stage, and the memory-bounded mode's limit counters"""
+    return jsonify(dict(stage_tracker.snapshot(), limits=guard_stats()))
+
+@app.route('/admin/stage_timings', methods=['GET'])
+def stage_timings():
+    """Latency histogram of every pipeline stage, fetch and policy field extractor"""
+    return jsonify(stage_tracker.timing_snapshot())
+
+@app.route('/admin/job_stats', methods=['GET'])
+def job_statistics():
+    """Submitted, deduplicated, rejected, finished and expired job counters"""
+    return jsonify(job_manager.stats())
+
+@app.route('/admin/fetch_stats', methods=['GET'])
+def fetch_statistics():
+    """Retry, challenge and size-cap counters plus the header profile preferred per domain"""
+    return jsonify(fetch_stats())
+
+@app.route('/admin/page_cache_stats', methods=['GET'])
+def page_cache_stats():
+    """Hit, revalidation and eviction counters for the page cache"""
+    if not page_cache:
+        return jsonify({'enabled': False})
+    return jsonify(dict(page_cache.stats(), enabled=True))
+
+@app.route('/admin/extract_cache_stats', methods=['GET'])
+def extract_cache_stats():
+    """Hit, miss and eviction counters for memoized extraction results"""
+    return jsonify(dict(extraction_cache.stats(), pipeline_version=PIPELINE_VERSION))
+
+@app.route('/admin/strategy_stats', methods=['GET'])
+def strategy_statistics():
+    """How often each text strategy won and how many candidate texts were built or skipped"""
+    return jsonify(strategy_stats.snapshot())
+
+@app.route('/admin/regex_stats', methods=['GET'])
+def regex_statistics():
+    """Calls and cumulative match time of every registered regex, most expensive first"""
+    return jsonify(regexes.stats())
 
 def find_line_number(text, content):
     """Find the line number of content in the original text"""
@@ -961,7 +1290,8 @@ def extract_policy():
             return jsonify({'error': 'Please provide text content to analyze'}), 400
         
         # Extract policy information using intelligent parsing
-        policy_data = extract_policy_information(text)
+        with timed('extract_policy'):
+            policy_data = extraction_pool.call(extract_policy_information, text)
         
         return jsonify({
             'success': True,
@@ -969,7 +1299,14 @@ def extract_policy():
             'message': 'Policy information extracted successfully'
         })
         
+    except PoolBusy as e:
+        record_error(e)
+        return jsonify({'error': f'Server is busy, please retry: {str(e)}'}), 503
+    except TaskTimeout as e:
+        record_error(e)
+        return jsonify({'error': f'Policy extraction timed out: {str(e)}'}), 504
     except Exception as e:
+        record_error(e)
         return jsonify({'error': f'An error occurred during policy extraction: {str(e)}'}), 500
 
 def extract_policy_information(text):
@@ -978,214 +1315,33 @@ def extract_policy_information(text):
     Returns structured JSON with policy fields.
     """
     
-    # Initialize policy data structure
-    policy_data = {
-        "policy_name": "Not Found",
-        "policy_number": "Not Found", 
-        "effective_date": "Not Found",
-        "expiry_date": "Not Found",
-        "coverage_limit": "Not Found",
-        "deductible": "Not Found",
-        "covered_events": "Not Found",
-        "excluded_events": "Not Found",
-        "claim_procedure": "Not Found",
-        "contact_info": "Not Found",
-        "jurisdiction": "Not Found",
-        "renewal_terms": "Not Found",
-        "premium_amount": "Not Found",
-        "beneficiary": "Not Found",
-        "risk_info": "Not Found",
-        "definitions": "Not Found",
-        # Additional detailed fields
-        "product_code": "Not Found",
-        "insurance_company_name": "Not Found",
-        "broker_name": "Not Found",
-        "imd_code": "Not Found",
-        "lob": "Not Found",
-        "cover": "Not Found",
-        "fuel_type": "Not Found",
-        "ren_roll_new_used": "Not Found",
-        "customer_name": "Not Found",
-        "mobile_number": "Not Found",
-        "customer_email": "Not Found",
-        "location": "Not Found",
-        "registration_number": "Not Found",
-        "engine_number": "Not Found",
-        "chassis_number": "Not Found",
-        "policy_issue_date": "Not Found",
-        "policy_expiry_date": "Not Found"
-    }
-    
     # Clean and normalize text
-    text_lower = text.lower()
     lines = [line.strip() for line in text.split('\n') if line.strip()]
     
-    # Extract Policy Name/Title
-    policy_name = extract_policy_name(text, lines)
-    if policy_name:
-        policy_data["policy_name"] = policy_name
-    
-    # Extract Policy Number/Reference ID
-    policy_number = extract_policy_number(text, lines)
-    if policy_number:
-        policy_data["policy_number"] = policy_number
-    
-    # Extract Effective Date
-    effective_date = extract_effective_date(text, lines)
-    if effective_date:
-        policy_data["effective_date"] = effective_date
-    
-    # Extract Expiry Date
-    expiry_date = extract_expiry_date(text, lines)
-    if expiry_date:
-        policy_data["expiry_date"] = expiry_date
-    
-    # Extract Coverage Limit/Sum Assured
-    coverage_limit = extract_coverage_limit(text, lines)
-    if coverage_limit:
-        policy_data["coverage_limit"] = coverage_limit
-    
-    # Extract Deductible
-    deductible = extract_deductible(text, lines)
-    if deductible:
-        policy_data["deductible"] = deductible
-    
-    # Extract Covered Events/Inclusions
-    covered_events = extract_covered_events(text, lines)
-    if covered_events:
-        policy_data["covered_events"] = covered_events
-    
-    # Extract Excluded Events/Exclusions
-    excluded_events = extract_excluded_events(text, lines)
-    if excluded_events:
-        policy_data["excluded_events"] = excluded_events
-    
-    # Extract Claim Procedure
-    claim_procedure = extract_claim_procedure(text, lines)
-    if claim_procedure:
-        policy_data["claim_procedure"] = claim_procedure
-    
-    # Extract Contact Information
-    contact_info = extract_contact_info(text, lines)
-    if contact_info:
-        policy_data["contact_info"] = contact_info
-    
-    # Extract Jurisdiction/Governing Law
-    jurisdiction = extract_jurisdiction(text, lines)
-    if jurisdiction:
-        policy_data["jurisdiction"] = jurisdiction
-    
-    # Extract Renewal/Cancellation Terms
-    renewal_terms = extract_renewal_terms(text, lines)
-    if renewal_terms:
-        policy_data["renewal_terms"] = renewal_terms
-    
-    # Extract Premium Amount
-    premium_amount = extract_premium_amount(text, lines)
-    if premium_amount:
-        policy_data["premium_amount"] = premium_amount
-    
-    # Extract Beneficiary/Nominee details
-    beneficiary = extract_beneficiary(text, lines)
-    if beneficiary:
-        policy_data["beneficiary"] = beneficiary
-    
-    # Extract Risk Information
-    risk_info = extract_risk_info(text, lines)
-    if risk_info:
-        policy_data["risk_info"] = risk_info
-    
-    # Extract Definitions/Key Terms
-    definitions = extract_definitions(text, lines)
-    if definitions:
-        policy_data["definitions"] = definitions
-    
-    # Extract additional detailed fields
-    product_code = extract_product_code(text, lines)
-    if product_code:
-        policy_data["product_code"] = product_code
-    
-    insurance_company_name = extract_insurance_company_name(text, lines)
-    if insurance_company_name:
-        policy_data["insurance_company_name"] = insurance_company_name
-    
-    broker_name = extract_broker_name(text, lines)
-    if broker_name:
-        policy_data["broker_name"] = broker_name
-    
-    imd_code = extract_imd_code(text, lines)
-    if imd_code:
-        policy_data["imd_code"] = imd_code
-    
-    lob = extract_lob(text, lines)
-    if lob:
-        policy_data["lob"] = lob
-    
-    cover = extract_cover(text, lines)
-    if cover:
-        policy_data["cover"] = cover
-    
-    fuel_type = extract_fuel_type(text, lines)
-    if fuel_type:
-        policy_data["fuel_type"] = fuel_type
-    
-    ren_roll_new_used = extract_ren_roll_new_used(text, lines)
-    if ren_roll_new_used:
-        policy_data["ren_roll_new_used"] = ren_roll_new_used
-    
-    customer_name = extract_customer_name(text, lines)
-    if customer_name:
-        policy_data["customer_name"] = customer_name
-    
-    mobile_number = extract_mobile_number(text, lines)
-    if mobile_number:
-        policy_data["mobile_number"] = mobile_number
-    
-    customer_email = extract_customer_email(text, lines)
-    if customer_email:
-        policy_data["customer_email"] = customer_email
-    
-    location = extract_location(text, lines)
-    if location:
-        policy_data["location"] = location
-    
-    registration_number = extract_registration_number(text, lines)
-    if registration_number:
-        policy_data["registration_number"] = registration_number
-    
-    engine_number = extract_engine_number(text, lines)
-    if engine_number:
-        policy_data["engine_number"] = engine_number
-    
-    chassis_number = extract_chassis_number(text, lines)
-    if chassis_number:
-        policy_data["chassis_number"] = chassis_number
-    
-    policy_issue_date = extract_policy_issue_date(text, lines)
-    if policy_issue_date:
-        policy_data["policy_issue_date"] = policy_issue_date
-    
-    policy_expiry_date = extract_policy_expiry_date(text, lines)
-    if policy_expiry_date:
-        policy_data["policy_expiry_date"] = policy_expiry_date
+    # Each field keeps "Not Found" unless its extractor finds a value
+    policy_data = {}
+    for field, extractor in POLICY_FIELD_EXTRACTORS:
+        with timed(f'field.{field}'):
+            value = extractor(text, lines)
+        policy_data[field] = value or "Not Found"
     
     return policy_data
 
+# Look for common policy name patterns
+POLICY_NAME_PATTERNS = regexes.compile_all('policy_name', [
+    r'(?:Product Name[:\s]*([^\n\r]+))',
+    r'(?:TWO WHEELER INSURANCE POLICY[-\s]*PACKAGE)',
+    r'(?:Two-wheeler Insurance Policy[-\s]*Package)',
+    r'(?:policy\s+name|policy\s+title|plan\s+name|insurance\s+plan)[\s:]*([^\n\r]+)',
+    r'([A-Z][a-zA-Z\s&]+(?:policy|plan|insurance|coverage|protection))',
+    r'(?:the\s+)?([A-Z][a-zA-Z\s&]+(?:health|life|auto|home|travel|business|two.?wheeler|motor)\s+(?:policy|plan|insurance))',
+    r'([A-Z][a-zA-Z\s&]+(?:comprehensive|basic|premium|standard|package)\s+(?:policy|plan|insurance))'
+], re.IGNORECASE)
+
 def extract_policy_name(text, lines):
     """Extract policy name or title"""
-    # Look for common policy name patterns
-    patterns = [
-        r'(?:Product Name[:\s]*([^\n\r]+))',
-        r'(?:TWO WHEELER INSURANCE POLICY[-\s]*PACKAGE)',
-        r'(?:Two-wheeler Insurance Policy[-\s]*Package)',
-        r'(?:policy\s+name|policy\s+title|plan\s+name|insurance\s+plan)[\s:]*([^\n\r]+)',
-        r'([A-Z][a-zA-Z\s&]+(?:policy|plan|insurance|coverage|protection))',
-        r'(?:the\s+)?([A-Z][a-zA-Z\s&]+(?:health|life|auto|home|travel|business|two.?wheeler|motor)\s+(?:policy|plan|insurance))',
-        r'([A-Z][a-zA-Z\s&]+(?:comprehensive|basic|premium|standard|package)\s+(?:policy|plan|insurance))'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in POLICY_NAME_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             # Return the first meaningful match
             for match in matches:
@@ -1195,21 +1351,21 @@ def extract_policy_name(text, lines):
     
     return None
 
+# Look for policy number patterns
+POLICY_NUMBER_PATTERNS = regexes.compile_all('policy_number', [
+    r'(?:POPM2W\d+)',  # Specific SBI format
+    r'(?:Policy\s*/\s*Certificate\s*No[:\s]*([A-Z0-9\-]+))',
+    r'(?:Certificate\s*No[:\s]*([A-Z0-9\-]+))',
+    r'(?:policy\s+number|policy\s+no|policy\s+ref|reference\s+id|policy\s+id)[\s:]*([A-Z0-9\-]+)',
+    r'(?:ref\.?\s*no|reference\s+number)[\s:]*([A-Z0-9\-]+)',
+    r'([A-Z]{2,4}\d{4,8})',  # Common policy number format
+    r'([A-Z0-9]{6,12})'  # Generic alphanumeric policy number
+], re.IGNORECASE)
+
 def extract_policy_number(text, lines):
     """Extract policy number or reference ID"""
-    # Look for policy number patterns
-    patterns = [
-        r'(?:POPM2W\d+)',  # Specific SBI format
-        r'(?:Policy\s*/\s*Certificate\s*No[:\s]*([A-Z0-9\-]+))',
-        r'(?:Certificate\s*No[:\s]*([A-Z0-9\-]+))',
-        r'(?:policy\s+number|policy\s+no|policy\s+ref|reference\s+id|policy\s+id)[\s:]*([A-Z0-9\-]+)',
-        r'(?:ref\.?\s*no|reference\s+number)[\s:]*([A-Z0-9\-]+)',
-        r'([A-Z]{2,4}\d{4,8})',  # Common policy number format
-        r'([A-Z0-9]{6,12})'  # Generic alphanumeric policy number
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in POLICY_NUMBER_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1218,20 +1374,20 @@ def extract_policy_number(text, lines):
     
     return None
 
+# Look for date patterns
+EFFECTIVE_DATE_PATTERNS = regexes.compile_all('effective_date', [
+    r'(?:effective\s+date|start\s+date|policy\s+start|commencement\s+date)[\s:]*([^\n\r]+)',
+    r'(?:from|starting|effective)\s+([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})',
+    r'(?:Policy\s+Start\s+Date[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
+    r'(?:Period\s+of\s+Insurance[^:]*From[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
+    r'([0-9]{1,2}(?:st|nd|rd|th)?\s+(?:january|february|march|april|may|june|july|august|september|october|november|december)\s+[0-9]{4})',
+    r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
+], re.IGNORECASE)
+
 def extract_effective_date(text, lines):
     """Extract effective date or start date"""
-    # Look for date patterns
-    date_patterns = [
-        r'(?:effective\s+date|start\s+date|policy\s+start|commencement\s+date)[\s:]*([^\n\r]+)',
-        r'(?:from|starting|effective)\s+([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})',
-        r'(?:Policy\s+Start\s+Date[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
-        r'(?:Period\s+of\s+Insurance[^:]*From[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
-        r'([0-9]{1,2}(?:st|nd|rd|th)?\s+(?:january|february|march|april|may|june|july|august|september|october|november|december)\s+[0-9]{4})',
-        r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
-    ]
-    
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in EFFECTIVE_DATE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1240,21 +1396,21 @@ def extract_effective_date(text, lines):
     
     return None
 
+# Look for expiry date patterns
+EXPIRY_DATE_PATTERNS = regexes.compile_all('expiry_date', [
+    r'(?:expiry\s+date|end\s+date|policy\s+end|expiration\s+date)[\s:]*([^\n\r]+)',
+    r'(?:until|till|expires|expiring)\s+([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})',
+    r'(?:Policy\s+End\s+Date[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
+    r'(?:Period\s+of\s+Insurance[^:]*To[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
+    r'(?:To[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
+    r'(?:to|until)\s+([0-9]{1,2}(?:st|nd|rd|th)?\s+(?:january|february|march|april|may|june|july|august|september|october|november|december)\s+[0-9]{4})',
+    r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
+], re.IGNORECASE)
+
 def extract_expiry_date(text, lines):
     """Extract expiry date or end date"""
-    # Look for expiry date patterns
-    date_patterns = [
-        r'(?:expiry\s+date|end\s+date|policy\s+end|expiration\s+date)[\s:]*([^\n\r]+)',
-        r'(?:until|till|expires|expiring)\s+([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})',
-        r'(?:Policy\s+End\s+Date[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
-        r'(?:Period\s+of\s+Insurance[^:]*To[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
-        r'(?:To[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
-        r'(?:to|until)\s+([0-9]{1,2}(?:st|nd|rd|th)?\s+(?:january|february|march|april|may|june|july|august|september|october|november|december)\s+[0-9]{4})',
-        r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
-    ]
-    
-    for pattern in date_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in EXPIRY_DATE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1263,21 +1419,21 @@ def extract_expiry_date(text, lines):
     
     return None
 
+# Look for coverage amount patterns
+COVERAGE_LIMIT_PATTERNS = regexes.compile_all('coverage_limit', [
+    r'(?:coverage\s+limit|sum\s+assured|maximum\s+coverage|policy\s+limit)[\s:]*([^\n\r]+)',
+    r'(?:up\s+to|maximum|limit\s+of)\s*([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?|[0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))',
+    r'(?:Total\s+IDV[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'(?:Vehicle\s+IDV[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'(?:IDV[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?)\s*(?:coverage|limit|sum)',
+    r'([0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))\s*(?:coverage|limit|sum)'
+], re.IGNORECASE)
+
 def extract_coverage_limit(text, lines):
     """Extract coverage limit or sum assured"""
-    # Look for coverage amount patterns
-    patterns = [
-        r'(?:coverage\s+limit|sum\s+assured|maximum\s+coverage|policy\s+limit)[\s:]*([^\n\r]+)',
-        r'(?:up\s+to|maximum|limit\s+of)\s*([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?|[0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))',
-        r'(?:Total\s+IDV[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'(?:Vehicle\s+IDV[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'(?:IDV[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?)\s*(?:coverage|limit|sum)',
-        r'([0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))\s*(?:coverage|limit|sum)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in COVERAGE_LIMIT_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1286,19 +1442,19 @@ def extract_coverage_limit(text, lines):
     
     return None
 
+DEDUCTIBLE_PATTERNS = regexes.compile_all('deductible', [
+    r'(?:deductible|excess|co-pay)[\s:]*([^\n\r]+)',
+    r'(?:deductible\s+of|excess\s+of)\s*([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?|[0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))',
+    r'(?:Compulsory\s+Deductible[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'(?:Voluntary\s+Deductible[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?)\s*(?:deductible|excess)',
+    r'([0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))\s*(?:deductible|excess)'
+], re.IGNORECASE)
+
 def extract_deductible(text, lines):
     """Extract deductible information"""
-    patterns = [
-        r'(?:deductible|excess|co-pay)[\s:]*([^\n\r]+)',
-        r'(?:deductible\s+of|excess\s+of)\s*([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?|[0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))',
-        r'(?:Compulsory\s+Deductible[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'(?:Voluntary\s+Deductible[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?)\s*(?:deductible|excess)',
-        r'([0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))\s*(?:deductible|excess)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in DEDUCTIBLE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1390,24 +1546,25 @@ def extract_claim_procedure(text, lines):
     
     return None
 
+EMAIL_PATTERN = regexes.compile('email', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# Look for phone numbers and toll-free numbers
+CONTACT_PHONE_PATTERNS = regexes.compile_all('contact_phone', [
+    r'\+?[0-9]{1,4}[\s\-]?[0-9]{3,4}[\s\-]?[0-9]{3,4}[\s\-]?[0-9]{3,4}',
+    r'\(?[0-9]{3,4}\)?[\s\-]?[0-9]{3,4}[\s\-]?[0-9]{3,4}',
+    r'(?:1800[-\s]?[0-9]{2,3}[-\s]?[0-9]{4,5})',  # Toll-free numbers
+    r'(?:Toll\s+Free[:\s]*([0-9\-\s]+))',
+    r'(?:Call[:\s]*([0-9\-\s]+))'
+], re.IGNORECASE)
+
 def extract_contact_info(text, lines):
     """Extract contact information"""
     # Look for email addresses
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, text)
-    
-    # Look for phone numbers and toll-free numbers
-    phone_patterns = [
-        r'\+?[0-9]{1,4}[\s\-]?[0-9]{3,4}[\s\-]?[0-9]{3,4}[\s\-]?[0-9]{3,4}',
-        r'\(?[0-9]{3,4}\)?[\s\-]?[0-9]{3,4}[\s\-]?[0-9]{3,4}',
-        r'(?:1800[-\s]?[0-9]{2,3}[-\s]?[0-9]{4,5})',  # Toll-free numbers
-        r'(?:Toll\s+Free[:\s]*([0-9\-\s]+))',
-        r'(?:Call[:\s]*([0-9\-\s]+))'
-    ]
+    emails = EMAIL_PATTERN.findall(text)
     
     phones = []
-    for pattern in phone_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in CONTACT_PHONE_PATTERNS:
+        matches = pattern.findall(text)
         phones.extend(matches)
     
     contact_info = []
@@ -1423,16 +1580,16 @@ def extract_contact_info(text, lines):
     
     return None
 
+JURISDICTION_PATTERNS = regexes.compile_all('jurisdiction', [
+    r'(?:jurisdiction|governing\s+law|applicable\s+law)[\s:]*([^\n\r]+)',
+    r'(?:laws\s+of|subject\s+to)\s+([A-Z][a-zA-Z\s]+(?:state|country|jurisdiction))',
+    r'([A-Z][a-zA-Z\s]+(?:courts?|tribunal|arbitration))'
+], re.IGNORECASE)
+
 def extract_jurisdiction(text, lines):
     """Extract jurisdiction or governing law"""
-    patterns = [
-        r'(?:jurisdiction|governing\s+law|applicable\s+law)[\s:]*([^\n\r]+)',
-        r'(?:laws\s+of|subject\s+to)\s+([A-Z][a-zA-Z\s]+(?:state|country|jurisdiction))',
-        r'([A-Z][a-zA-Z\s]+(?:courts?|tribunal|arbitration))'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in JURISDICTION_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1441,16 +1598,16 @@ def extract_jurisdiction(text, lines):
     
     return None
 
+RENEWAL_TERMS_PATTERNS = regexes.compile_all('renewal_terms', [
+    r'(?:renewal|cancellation|termination)[\s:]*([^\n\r]+)',
+    r'(?:auto\s+renewal|automatic\s+renewal)[\s:]*([^\n\r]+)',
+    r'(?:notice\s+period|cancellation\s+notice)[\s:]*([^\n\r]+)'
+], re.IGNORECASE)
+
 def extract_renewal_terms(text, lines):
     """Extract renewal or cancellation terms"""
-    patterns = [
-        r'(?:renewal|cancellation|termination)[\s:]*([^\n\r]+)',
-        r'(?:auto\s+renewal|automatic\s+renewal)[\s:]*([^\n\r]+)',
-        r'(?:notice\s+period|cancellation\s+notice)[\s:]*([^\n\r]+)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in RENEWAL_TERMS_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1459,20 +1616,20 @@ def extract_renewal_terms(text, lines):
     
     return None
 
+PREMIUM_AMOUNT_PATTERNS = regexes.compile_all('premium_amount', [
+    r'(?:premium|payment|annual\s+premium)[\s:]*([^\n\r]+)',
+    r'(?:premium\s+of|payment\s+of)\s*([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?|[0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))',
+    r'(?:FINAL\s+PREMIUM[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'(?:TOTAL\s+PREMIUM[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'(?:Policy\s+premium[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
+    r'([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?)\s*(?:premium|payment)',
+    r'([0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))\s*(?:premium|payment)'
+], re.IGNORECASE)
+
 def extract_premium_amount(text, lines):
     """Extract premium amount or payment terms"""
-    patterns = [
-        r'(?:premium|payment|annual\s+premium)[\s:]*([^\n\r]+)',
-        r'(?:premium\s+of|payment\s+of)\s*([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?|[0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))',
-        r'(?:FINAL\s+PREMIUM[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'(?:TOTAL\s+PREMIUM[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'(?:Policy\s+premium[:\s]*([₹$€£¥]?\s*[0-9,]+(?:\.[0-9]{2})?))',
-        r'([₹$€£¥]\s*[0-9,]+(?:\.[0-9]{2})?)\s*(?:premium|payment)',
-        r'([0-9,]+(?:\.[0-9]{2})?\s*(?:lakh|crore|million|thousand|k|m))\s*(?:premium|payment)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in PREMIUM_AMOUNT_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1481,16 +1638,16 @@ def extract_premium_amount(text, lines):
     
     return None
 
+BENEFICIARY_PATTERNS = regexes.compile_all('beneficiary', [
+    r'(?:beneficiary|nominee)[\s:]*([^\n\r]+)',
+    r'(?:beneficiary\s+details|nominee\s+details)[\s:]*([^\n\r]+)',
+    r'(?:in\s+favor\s+of|payable\s+to)[\s:]*([^\n\r]+)'
+], re.IGNORECASE)
+
 def extract_beneficiary(text, lines):
     """Extract beneficiary or nominee details"""
-    patterns = [
-        r'(?:beneficiary|nominee)[\s:]*([^\n\r]+)',
-        r'(?:beneficiary\s+details|nominee\s+details)[\s:]*([^\n\r]+)',
-        r'(?:in\s+favor\s+of|payable\s+to)[\s:]*([^\n\r]+)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in BENEFICIARY_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1499,16 +1656,16 @@ def extract_beneficiary(text, lines):
     
     return None
 
+RISK_INFO_PATTERNS = regexes.compile_all('risk_info', [
+    r'(?:risk\s+ratio|risk\s+coverage|risk\s+assessment)[\s:]*([^\n\r]+)',
+    r'(?:coverage\s+ratio|sum\s+at\s+risk)[\s:]*([^\n\r]+)',
+    r'([0-9]+(?:\.[0-9]+)?\s*%)\s*(?:risk|coverage)'
+], re.IGNORECASE)
+
 def extract_risk_info(text, lines):
     """Extract risk ratio or risk coverage information"""
-    patterns = [
-        r'(?:risk\s+ratio|risk\s+coverage|risk\s+assessment)[\s:]*([^\n\r]+)',
-        r'(?:coverage\s+ratio|sum\s+at\s+risk)[\s:]*([^\n\r]+)',
-        r'([0-9]+(?:\.[0-9]+)?\s*%)\s*(?:risk|coverage)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in RISK_INFO_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1545,16 +1702,16 @@ def extract_definitions(text, lines):
 
 # Additional detailed field extraction functions
 
+PRODUCT_CODE_PATTERNS = regexes.compile_all('product_code', [
+    r'(?:product\s+code|product\s+id)[\s:]*([A-Z0-9\-]+)',
+    r'(?:code[:\s]*([A-Z0-9\-]+))',
+    r'([A-Z]{2,4}[0-9]{2,6})'  # Common product code format
+], re.IGNORECASE)
+
 def extract_product_code(text, lines):
     """Extract product code"""
-    patterns = [
-        r'(?:product\s+code|product\s+id)[\s:]*([A-Z0-9\-]+)',
-        r'(?:code[:\s]*([A-Z0-9\-]+))',
-        r'([A-Z]{2,4}[0-9]{2,6})'  # Common product code format
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in PRODUCT_CODE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1562,22 +1719,22 @@ def extract_product_code(text, lines):
                     return match
     return None
 
+INSURANCE_COMPANY_NAME_PATTERNS = regexes.compile_all('insurance_company_name', [
+    r'(?:SBI\s+General\s+Insurance)',
+    r'(?:Bajaj\s+Allianz\s+General\s+Insurance)',
+    r'(?:HDFC\s+ERGO\s+General\s+Insurance)',
+    r'(?:ICICI\s+Lombard\s+General\s+Insurance)',
+    r'(?:New\s+India\s+Assurance)',
+    r'(?:Oriental\s+Insurance)',
+    r'(?:United\s+India\s+Insurance)',
+    r'(?:National\s+Insurance)',
+    r'([A-Z][a-zA-Z\s&]+(?:Insurance|General|Assurance))'
+], re.IGNORECASE)
+
 def extract_insurance_company_name(text, lines):
     """Extract insurance company name"""
-    patterns = [
-        r'(?:SBI\s+General\s+Insurance)',
-        r'(?:Bajaj\s+Allianz\s+General\s+Insurance)',
-        r'(?:HDFC\s+ERGO\s+General\s+Insurance)',
-        r'(?:ICICI\s+Lombard\s+General\s+Insurance)',
-        r'(?:New\s+India\s+Assurance)',
-        r'(?:Oriental\s+Insurance)',
-        r'(?:United\s+India\s+Insurance)',
-        r'(?:National\s+Insurance)',
-        r'([A-Z][a-zA-Z\s&]+(?:Insurance|General|Assurance))'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in INSURANCE_COMPANY_NAME_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1585,16 +1742,16 @@ def extract_insurance_company_name(text, lines):
                     return match
     return None
 
+BROKER_NAME_PATTERNS = regexes.compile_all('broker_name', [
+    r'(?:broker\s+name|intermediary\s+name)[\s:]*([^\n\r]+)',
+    r'(?:Cox\s+and\s+Kings)',
+    r'([A-Z][a-zA-Z\s&]+(?:Broker|Agency|Services))'
+], re.IGNORECASE)
+
 def extract_broker_name(text, lines):
     """Extract broker/intermediary name"""
-    patterns = [
-        r'(?:broker\s+name|intermediary\s+name)[\s:]*([^\n\r]+)',
-        r'(?:Cox\s+and\s+Kings)',
-        r'([A-Z][a-zA-Z\s&]+(?:Broker|Agency|Services))'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in BROKER_NAME_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1602,15 +1759,15 @@ def extract_broker_name(text, lines):
                     return match
     return None
 
+IMD_CODE_PATTERNS = regexes.compile_all('imd_code', [
+    r'(?:imd\s+code|intermediary\s+code)[\s:]*([A-Z0-9\-]+)',
+    r'(?:code[:\s]*([0-9]{6,8}))'
+], re.IGNORECASE)
+
 def extract_imd_code(text, lines):
     """Extract IMD code"""
-    patterns = [
-        r'(?:imd\s+code|intermediary\s+code)[\s:]*([A-Z0-9\-]+)',
-        r'(?:code[:\s]*([0-9]{6,8}))'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in IMD_CODE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1618,16 +1775,16 @@ def extract_imd_code(text, lines):
                     return match
     return None
 
+LOB_PATTERNS = regexes.compile_all('lob', [
+    r'(?:lob|line\s+of\s+business)[\s:]*([^\n\r]+)',
+    r'(?:motor|health|life|travel|home|fire)',
+    r'(?:two.?wheeler|four.?wheeler|commercial\s+vehicle)'
+], re.IGNORECASE)
+
 def extract_lob(text, lines):
     """Extract Line of Business"""
-    patterns = [
-        r'(?:lob|line\s+of\s+business)[\s:]*([^\n\r]+)',
-        r'(?:motor|health|life|travel|home|fire)',
-        r'(?:two.?wheeler|four.?wheeler|commercial\s+vehicle)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in LOB_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1635,16 +1792,16 @@ def extract_lob(text, lines):
                     return match
     return None
 
+COVER_PATTERNS = regexes.compile_all('cover', [
+    r'(?:cover|coverage\s+type)[\s:]*([^\n\r]+)',
+    r'(?:comprehensive|third\s+party|package|basic)',
+    r'(?:own\s+damage|od|tp)'
+], re.IGNORECASE)
+
 def extract_cover(text, lines):
     """Extract cover type"""
-    patterns = [
-        r'(?:cover|coverage\s+type)[\s:]*([^\n\r]+)',
-        r'(?:comprehensive|third\s+party|package|basic)',
-        r'(?:own\s+damage|od|tp)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in COVER_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1652,15 +1809,15 @@ def extract_cover(text, lines):
                     return match
     return None
 
+FUEL_TYPE_PATTERNS = regexes.compile_all('fuel_type', [
+    r'(?:fuel\s+type|fuel)[\s:]*([^\n\r]+)',
+    r'(?:petrol|diesel|cng|lpg|electric|hybrid)'
+], re.IGNORECASE)
+
 def extract_fuel_type(text, lines):
     """Extract fuel type"""
-    patterns = [
-        r'(?:fuel\s+type|fuel)[\s:]*([^\n\r]+)',
-        r'(?:petrol|diesel|cng|lpg|electric|hybrid)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in FUEL_TYPE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1668,15 +1825,15 @@ def extract_fuel_type(text, lines):
                     return match
     return None
 
+REN_ROLL_NEW_USED_PATTERNS = regexes.compile_all('ren_roll_new_used', [
+    r'(?:renewal|roll|new|used|first\s+time)',
+    r'(?:policy\s+type)[\s:]*([^\n\r]+)'
+], re.IGNORECASE)
+
 def extract_ren_roll_new_used(text, lines):
     """Extract renewal/roll/new/used status"""
-    patterns = [
-        r'(?:renewal|roll|new|used|first\s+time)',
-        r'(?:policy\s+type)[\s:]*([^\n\r]+)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in REN_ROLL_NEW_USED_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1684,16 +1841,16 @@ def extract_ren_roll_new_used(text, lines):
                     return match
     return None
 
+CUSTOMER_NAME_PATTERNS = regexes.compile_all('customer_name', [
+    r'(?:customer\s+name|policy\s+holder\s+name|proposer\s+name)[\s:]*([^\n\r]+)',
+    r'(?:Mr\.|Mrs\.|Ms\.|Dr\.)\s*([A-Z][a-zA-Z\s]+)',
+    r'(?:Name[:\s]*([A-Z][a-zA-Z\s]+))'
+], re.IGNORECASE)
+
 def extract_customer_name(text, lines):
     """Extract customer name"""
-    patterns = [
-        r'(?:customer\s+name|policy\s+holder\s+name|proposer\s+name)[\s:]*([^\n\r]+)',
-        r'(?:Mr\.|Mrs\.|Ms\.|Dr\.)\s*([A-Z][a-zA-Z\s]+)',
-        r'(?:Name[:\s]*([A-Z][a-zA-Z\s]+))'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in CUSTOMER_NAME_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1701,16 +1858,16 @@ def extract_customer_name(text, lines):
                     return match
     return None
 
+MOBILE_NUMBER_PATTERNS = regexes.compile_all('mobile_number', [
+    r'(?:mobile\s+number|contact\s+number|phone\s+number)[\s:]*([0-9\-\s\+]+)',
+    r'(\+?91[-\s]?[0-9]{10})',
+    r'([0-9]{10})'
+], re.IGNORECASE)
+
 def extract_mobile_number(text, lines):
     """Extract mobile number"""
-    patterns = [
-        r'(?:mobile\s+number|contact\s+number|phone\s+number)[\s:]*([0-9\-\s\+]+)',
-        r'(\+?91[-\s]?[0-9]{10})',
-        r'([0-9]{10})'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in MOBILE_NUMBER_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1720,23 +1877,22 @@ def extract_mobile_number(text, lines):
 
 def extract_customer_email(text, lines):
     """Extract customer email"""
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, text)
+    emails = EMAIL_PATTERN.findall(text)
     
     if emails:
         return emails[0]  # Return first email found
     return None
 
+LOCATION_PATTERNS = regexes.compile_all('location', [
+    r'(?:location|address|rto\s+location)[\s:]*([^\n\r]+)',
+    r'(?:Mumbai|Delhi|Bangalore|Chennai|Kolkata|Hyderabad|Pune|Ahmedabad)',
+    r'([A-Z][a-zA-Z\s]+,\s*[A-Z][a-zA-Z\s]+)'
+], re.IGNORECASE)
+
 def extract_location(text, lines):
     """Extract location/address"""
-    patterns = [
-        r'(?:location|address|rto\s+location)[\s:]*([^\n\r]+)',
-        r'(?:Mumbai|Delhi|Bangalore|Chennai|Kolkata|Hyderabad|Pune|Ahmedabad)',
-        r'([A-Z][a-zA-Z\s]+,\s*[A-Z][a-zA-Z\s]+)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in LOCATION_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1744,16 +1900,16 @@ def extract_location(text, lines):
                     return match
     return None
 
+REGISTRATION_NUMBER_PATTERNS = regexes.compile_all('registration_number', [
+    r'(?:registration\s+number|reg\s+no|vehicle\s+number)[\s:]*([A-Z0-9\s]+)',
+    r'([A-Z]{2}[0-9]{2}[A-Z]{1,2}[0-9]{4})',  # Indian format
+    r'([A-Z0-9]{6,12})'
+], re.IGNORECASE)
+
 def extract_registration_number(text, lines):
     """Extract vehicle registration number"""
-    patterns = [
-        r'(?:registration\s+number|reg\s+no|vehicle\s+number)[\s:]*([A-Z0-9\s]+)',
-        r'([A-Z]{2}[0-9]{2}[A-Z]{1,2}[0-9]{4})',  # Indian format
-        r'([A-Z0-9]{6,12})'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in REGISTRATION_NUMBER_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1761,15 +1917,15 @@ def extract_registration_number(text, lines):
                     return match
     return None
 
+ENGINE_NUMBER_PATTERNS = regexes.compile_all('engine_number', [
+    r'(?:engine\s+number|engine\s+no)[\s:]*([A-Z0-9\s]+)',
+    r'([A-Z0-9]{6,15})'
+], re.IGNORECASE)
+
 def extract_engine_number(text, lines):
     """Extract engine number"""
-    patterns = [
-        r'(?:engine\s+number|engine\s+no)[\s:]*([A-Z0-9\s]+)',
-        r'([A-Z0-9]{6,15})'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in ENGINE_NUMBER_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1777,15 +1933,15 @@ def extract_engine_number(text, lines):
                     return match
     return None
 
+CHASSIS_NUMBER_PATTERNS = regexes.compile_all('chassis_number', [
+    r'(?:chassis\s+number|chassis\s+no)[\s:]*([A-Z0-9\s]+)',
+    r'([A-Z0-9]{10,20})'
+], re.IGNORECASE)
+
 def extract_chassis_number(text, lines):
     """Extract chassis number"""
-    patterns = [
-        r'(?:chassis\s+number|chassis\s+no)[\s:]*([A-Z0-9\s]+)',
-        r'([A-Z0-9]{10,20})'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in CHASSIS_NUMBER_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1793,16 +1949,16 @@ def extract_chassis_number(text, lines):
                     return match
     return None
 
+POLICY_ISSUE_DATE_PATTERNS = regexes.compile_all('policy_issue_date', [
+    r'(?:policy\s+issue\s+date|issue\s+date)[\s:]*([0-9\/\-\.]+)',
+    r'(?:receipt\s+date)[\s:]*([0-9\/\-\.]+)',
+    r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
+], re.IGNORECASE)
+
 def extract_policy_issue_date(text, lines):
     """Extract policy issue date"""
-    patterns = [
-        r'(?:policy\s+issue\s+date|issue\s+date)[\s:]*([0-9\/\-\.]+)',
-        r'(?:receipt\s+date)[\s:]*([0-9\/\-\.]+)',
-        r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in POLICY_ISSUE_DATE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1810,16 +1966,16 @@ def extract_policy_issue_date(text, lines):
                     return match
     return None
 
+POLICY_EXPIRY_DATE_PATTERNS = regexes.compile_all('policy_expiry_date', [
+    r'(?:policy\s+end\s+date|expiry\s+date)[\s:]*([0-9\/\-\.]+)',
+    r'(?:to[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
+    r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
+], re.IGNORECASE)
+
 def extract_policy_expiry_date(text, lines):
     """Extract policy expiry date"""
-    patterns = [
-        r'(?:policy\s+end\s+date|expiry\s+date)[\s:]*([0-9\/\-\.]+)',
-        r'(?:to[:\s]*([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4}))',
-        r'([0-9]{1,2}[\/\-\.][0-9]{1,2}[\/\-\.][0-9]{2,4})'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in POLICY_EXPIRY_DATE_PATTERNS:
+        matches = pattern.findall(text)
         if matches:
             for match in matches:
                 match = match.strip()
@@ -1827,6 +1983,43 @@ def extract_policy_expiry_date(text, lines):
                     return match
     return None
 
+# Extractor of each policy field, in the order of the returned fields
+POLICY_FIELD_EXTRACTORS = [
+    ('policy_name', extract_policy_name),
+    ('policy_number', extract_policy_number),
+    ('effective_date', extract_effective_date),
+    ('expiry_date', extract_expiry_date),
+    ('coverage_limit', extract_coverage_limit),
+    ('deductible', extract_deductible),
+    ('covered_events', extract_covered_events),
+    ('excluded_events', extract_excluded_events),
+    ('claim_procedure', extract_claim_procedure),
+    ('contact_info', extract_contact_info),
+    ('jurisdiction', extract_jurisdiction),
+    ('renewal_terms', extract_renewal_terms),
+    ('premium_amount', extract_premium_amount),
+    ('beneficiary', extract_beneficiary),
+    ('risk_info', extract_risk_info),
+    ('definitions', extract_definitions),
+    ('product_code', extract_product_code),
+    ('insurance_company_name', extract_insurance_company_name),
+    ('broker_name', extract_broker_name),
+    ('imd_code', extract_imd_code),
+    ('lob', extract_lob),
+    ('cover', extract_cover),
+    ('fuel_type', extract_fuel_type),
+    ('ren_roll_new_used', extract_ren_roll_new_used),
+    ('customer_name', extract_customer_name),
+    ('mobile_number', extract_mobile_number),
+    ('customer_email', extract_customer_email),
+    ('location', extract_location),
+    ('registration_number', extract_registration_number),
+    ('engine_number', extract_engine_number),
+    ('chassis_number', extract_chassis_number),
+    ('policy_issue_date', extract_policy_issue_date),
+    ('policy_expiry_date', extract_policy_expiry_date),
+]
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Concurrent execution of per-URL work with a per-host concurrency limit.
+"""
+import os
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+BATCH_MAX_URLS = int(os.environ.get('BATCH_MAX_URLS', 500))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 16))
+BATCH_PER_HOST = int(os.environ.get('BATCH_PER_HOST_CONCURRENCY', 4))
+
+
+def run_batch(urls, worker, max_workers=BATCH_WORKERS, per_host=BATCH_PER_HOST):
+    """
+    Run worker(url) for every URL on a thread pool and yield
+    (index, url, result, error) tuples in completion order.
+
+    At most per_host calls run against the same host at once; URLs for
+    a busy host wait in their own queue instead of tying up a thread.
+    """
+    pending = OrderedDict()
+    for index, url in enumerate(urls):
+        host = (urlsplit(url).hostname or '').lower()
+        pending.setdefault(host, deque()).append((index, url))
+
+    active_per_host = {}
+    in_flight = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def schedule():
+            # Round-robin over hosts so one large site cannot starve the others
+            for host in list(pending):
+                if len(in_flight) >= max_workers:
+                    return
+                queue = pending[host]
+                while queue and active_per_host.get(host, 0) < per_host and len(in_flight) < max_workers:
+                    index, url = queue.popleft()
+                    future = executor.submit(worker, url)
+                    in_flight[future] = (index, url, host)
+                    active_per_host[host] = active_per_host.get(host, 0) + 1
+                if not queue:
+                    del pending[host]
+
+        schedule()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, url, host = in_flight.pop(future)
+                active_per_host[host] -= 1
+                try:
+                    yield index, url, future.result(), None
+                except Exception as e:
+                    yield index, url, None, e
+            schedule()
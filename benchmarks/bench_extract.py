@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the /extract_text path against an offline corpus.
+
+The HTML pages in benchmarks/fixtures are served by a local stub HTTP
+server, so the full fetch + extraction path runs without any network
+access. Page and extraction caches are disabled for the run.
+
+    python benchmarks/bench_extract.py                  # run and compare with baseline
+    python benchmarks/bench_extract.py --update-baseline
+    python benchmarks/bench_extract.py record URL NAME  # add a live page to the corpus
+    python benchmarks/bench_extract.py parsers          # compare the HTML parser backends
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Measure the pipeline itself, not the caches in front of it
+os.environ['PAGE_CACHE_ENABLED'] = '0'
+os.environ['EXTRACT_CACHE_MAX_ENTRIES'] = '0'
+sys.path.insert(0, ROOT_DIR)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(directory):
+    """Serve a directory on a free loopback port; returns (server, base_url)"""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_benchmark(iterations, warmup):
+    from app import app
+
+    pages = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith('.html'))
+    server, base_url = start_stub_server(FIXTURES_DIR)
+    client = app.test_client()
+    results = {}
+    total_started = time.perf_counter()
+    total_requests = 0
+
+    try:
+        for name in pages:
+            url = base_url + name
+            latencies = []
+            text = ''
+            for i in range(warmup + iterations):
+                started = time.perf_counter()
+                response = client.post('/extract_text', json={'url': url})
+                elapsed = time.perf_counter() - started
+                data = response.get_json()
+                if response.status_code != 200:
+                    raise RuntimeError(f'{name}: {data.get("error")}')
+                text = data['text']
+                if i >= warmup:
+                    latencies.append(elapsed * 1000)
+                    total_requests += 1
+
+            results[name] = {
+                'input_bytes': os.path.getsize(os.path.join(FIXTURES_DIR, name)),
+                'output_chars': len(text),
+                'output_sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p90_ms': round(percentile(latencies, 90), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'max_ms': round(max(latencies), 3),
+            }
+    finally:
+        server.shutdown()
+
+    elapsed = time.perf_counter() - total_started
+    return {
+        'iterations': iterations,
+        'pages': results,
+        'throughput_pages_per_s': round(total_requests / elapsed, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def compare(report, baseline, tolerance, min_delta_ms):
+    """Return a list of regressions of report against baseline"""
+    problems = []
+    for name, page in report['pages'].items():
+        base = baseline['pages'].get(name)
+        if base is None:
+            continue
+        if page['output_sha256'] != base['output_sha256']:
+            problems.append(f'{name}: extracted text changed '
+                            f'({base["output_chars"]} -> {page["output_chars"]} chars)')
+        # Small pages are dominated by timer noise, so also require an absolute slowdown
+        slowdown = page['p50_ms'] - base['p50_ms']
+        if page['p50_ms'] > base['p50_ms'] * (1 + tolerance) and slowdown > min_delta_ms:
+            problems.append(f'{name}: p50 {base["p50_ms"]:.1f}ms -> {page["p50_ms"]:.1f}ms')
+
+    if report['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        problems.append(f'peak RSS {baseline["peak_rss_mb"]}MB -> {report["peak_rss_mb"]}MB')
+    return problems
+
+
+def print_report(report, baseline=None):
+    print(f'{"page":<24}{"in KB":>8}{"out":>8}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}{"vs base":>9}')
+    for name, page in report['pages'].items():
+        change = ''
+        base = (baseline or {}).get('pages', {}).get(name)
+        if base:
+            change = f'{(page["p50_ms"] / base["p50_ms"] - 1) * 100:+.0f}%'
+        print(f'{name:<24}{page["input_bytes"] / 1024:>8.1f}{page["output_chars"]:>8}'
+              f'{page["p50_ms"]:>10.2f}{page["p90_ms"]:>10.2f}{page["p99_ms"]:>10.2f}{change:>9}')
+    print(f'throughput: {report["throughput_pages_per_s"]} pages/s, peak RSS: {report["peak_rss_mb"]} MB')
+
+
+def record(url, name):
+    """Save a live page into the fixture corpus"""
+    import requests
+    from fetcher import HEADER_PROFILES
+
+    response = requests.get(url, headers=HEADER_PROFILES[0], timeout=30)
+    response.raise_for_status()
+    if not name.endswith('.html'):
+        name += '.html'
+    with open(os.path.join(FIXTURES_DIR, name), 'wb') as f:
+        f.write(response.content)
+    print(f'Recorded {url} -> fixtures/{name} ({len(response.content)} bytes)')
+
+
+def compare_parsers(iterations):
+    """Run the corpus through every installed parser backend"""
+    from bs4 import BeautifulSoup
+    from app import extract_text_from_html
+    from parsers import PARSER_BACKEND, available_backends
+
+    backends = available_backends()
+    # Text from the pure-Python parser is the reference for the others
+    reference = 'html.parser'
+    pages = sorted(name for name in os.listdir(FIXTURES_DIR) if name.endswith('.html'))
+    print(f'configured backend: {PARSER_BACKEND}, installed: {", ".join(backends)}')
+    print(f'{"page":<24}{"backend":<13}{"parse ms":>10}{"total ms":>10}{"parse KB":>10}  text')
+
+    differences = 0
+    for name in pages:
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            body = f.read()
+        expected = extract_text_from_html(body, reference)
+        for backend in backends:
+            parse_times = []
+            total_times = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                BeautifulSoup(body, backend)
+                parse_times.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                text = extract_text_from_html(body, backend)
+                total_times.append((time.perf_counter() - started) * 1000)
+
+            tracemalloc.start()
+            BeautifulSoup(body, backend)
+            parse_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+
+            if text == expected:
+                verdict = 'same'
+            else:
+                differences += 1
+                verdict = f'DIFFERS ({len(expected)} -> {len(text)} chars)'
+            print(f'{name:<24}{backend:<13}{percentile(parse_times, 50):>10.2f}'
+                  f'{percentile(total_times, 50):>10.2f}{parse_kb:>10.0f}  {verdict}')
+    return 1 if differences else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10, help='timed runs per page')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per page')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before failing')
+    parser.add_argument('--min-delta-ms', type=float, default=20.0,
+                        help='ignore slowdowns smaller than this many milliseconds')
+    parser.add_argument('--json', action='store_true', help='print the raw report as JSON')
+    subparsers = parser.add_subparsers(dest='command')
+    record_parser = subparsers.add_parser('record', help='add a live page to the fixture corpus')
+    record_parser.add_argument('url')
+    record_parser.add_argument('name')
+    subparsers.add_parser('parsers', help='compare parse time, memory and output of the parser backends')
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.url, args.name)
+        return 0
+    if args.command == 'parsers':
+        return compare_parsers(args.iterations)
+
+    report = run_benchmark(args.iterations, args.warmup)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, baseline)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f'Baseline written to {os.path.relpath(args.baseline, ROOT_DIR)}')
+        return 0
+
+    if baseline:
+        problems = compare(report, baseline, args.tolerance, args.min_delta_ms)
+        for problem in problems:
+            print(f'REGRESSION: {problem}')
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
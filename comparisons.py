@@ -0,0 +1,368 @@
+"""
+Stored comparisons, read back one page of hunks at a time.
+
+A comparison is diffed once, when it is created, and kept under its ID as
+the original lines of both documents and the diff's opcodes grouped into
+hunks: runs of changes with up to COMPARISON_CONTEXT_LINES equal lines
+around them. Changed blocks longer than COMPARISON_HUNK_MAX_LINES lines
+are cut into several hunks, so no hunk, and no page of them, grows with
+the size of the documents. The word-level spans of a hunk's rows are
+computed only when a page holding it is read.
+
+Comparisons are stored on disk under COMPARISON_DIR, so any worker can
+serve the pages of a comparison another one created. Each worker keeps the
+COMPARISON_MAX_LOADED it read most recently in memory as well. Comparisons
+are dropped COMPARISON_TTL seconds after they were last read, and the least
+recently read go first once more than COMPARISON_MAX_STORED are kept or
+they take more than COMPARISON_MAX_BYTES on disk.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from line_diff import intraline_spans
+from regex_registry import regexes
+
+COMPARISON_DIR = os.environ.get('COMPARISON_DIR', os.path.join('cache', 'comparisons'))
+COMPARISON_MAX_STORED = int(os.environ.get('COMPARISON_MAX_STORED', 100))
+COMPARISON_MAX_BYTES = int(os.environ.get('COMPARISON_MAX_BYTES', 128 * 1024 * 1024))
+COMPARISON_TTL = float(os.environ.get('COMPARISON_TTL', 3600))
+COMPARISON_MAX_LOADED = int(os.environ.get('COMPARISON_MAX_LOADED', 8))
+COMPARISON_CONTEXT_LINES = int(os.environ.get('COMPARISON_CONTEXT_LINES', 3))
+COMPARISON_HUNK_MAX_LINES = int(os.environ.get('COMPARISON_HUNK_MAX_LINES', 200))
+COMPARISON_PAGE_SIZE = int(os.environ.get('COMPARISON_PAGE_SIZE', 20))
+COMPARISON_MAX_PAGE_SIZE = int(os.environ.get('COMPARISON_MAX_PAGE_SIZE', 100))
+
+COMPARISON_ID_PATTERN = regexes.compile('comparison_id', r'[0-9a-f]{16}')
+
+
+class ComparisonTooLarge(ValueError):
+    """Raised when one comparison takes more than COMPARISON_MAX_BYTES"""
+
+
+def aligned_rows(website_lines, file_lines, opcodes):
+    """
+    Side-by-side rows of a comparison, ready to render. The lines of a
+    replaced block are paired in order and get token-level spans; they are
+    the only lines that are diffed word by word.
+    """
+    rows = []
+
+    def add_row(kind, i=None, website_spans=None, j=None, file_spans=None):
+        rows.append({
+            'type': kind,
+            'website_line': i + 1 if i is not None else None,
+            'file_line': j + 1 if j is not None else None,
+            'website': website_spans,
+            'file': file_spans
+        })
+
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                add_row('equal', i, [['equal', website_lines[i]]], j, [['equal', file_lines[j]]])
+            continue
+
+        paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        for k in range(paired):
+            website_spans, file_spans = intraline_spans(website_lines[i1 + k], file_lines[j1 + k])
+            add_row('changed', i1 + k, website_spans, j1 + k, file_spans)
+        for i in range(i1 + paired, i2):
+            add_row('removed', i, [['removed', website_lines[i]]])
+        for j in range(j1 + paired, j2):
+            add_row('added', j=j, file_spans=[['added', file_lines[j]]])
+
+    return rows
+
+
+def count_rows(opcodes):
+    """Rows of each type that aligned_rows() makes of opcodes"""
+    counts = {'equal': 0, 'changed': 0, 'removed': 0, 'added': 0}
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            counts['equal'] += i2 - i1
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        counts['changed'] += paired
+        counts['removed'] += i2 - i1 - paired
+        counts['added'] += j2 - j1 - paired
+    return counts
+
+
+def split_opcodes(opcodes, max_lines=COMPARISON_HUNK_MAX_LINES):
+    """Opcodes with every change of more than max_lines lines a side cut into pieces of max_lines"""
+    for tag, i1, i2, j1, j2 in opcodes:
+        longest = max(i2 - i1, j2 - j1)
+        if tag == 'equal' or longest <= max_lines:
+            yield tag, i1, i2, j1, j2
+            continue
+        # Cut both sides at the same offsets, so lines stay paired as they were
+        for start in range(0, longest, max_lines):
+            a1, a2 = min(i1 + start, i2), min(i1 + start + max_lines, i2)
+            b1, b2 = min(j1 + start, j2), min(j1 + start + max_lines, j2)
+            if a1 < a2 and b1 < b2:
+                yield 'replace', a1, a2, b1, b2
+            elif a1 < a2:
+                yield 'delete', a1, a2, b1, b2
+            else:
+                yield 'insert', a1, a2, b1, b2
+
+
+def group_hunks(opcodes, context=COMPARISON_CONTEXT_LINES, max_lines=COMPARISON_HUNK_MAX_LINES):
+    """
+    The changes of opcodes grouped into hunks, each a list of opcodes with up
+    to context equal lines before and after the changes. Changes at most
+    2 * context lines apart share a hunk while it has room for them within
+    max_lines rows.
+    """
+    hunks = []
+    hunk = []
+    rows = 0
+    changed = False
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag != 'equal':
+            size = max(i2 - i1, j2 - j1)
+            if changed and rows + size > max_lines:
+                hunks.append(hunk)
+                hunk, rows = [], 0
+            hunk.append((tag, i1, i2, j1, j2))
+            rows += size
+            changed = True
+            continue
+
+        if changed and i2 - i1 <= 2 * context and rows < max_lines:
+            hunk.append((tag, i1, i2, j1, j2))
+            rows += i2 - i1
+            continue
+
+        # A longer equal run ends the hunk and leads into the next one
+        if changed:
+            trailing = min(i2 - i1, context)
+            hunk.append((tag, i1, i1 + trailing, j1, j1 + trailing))
+            hunks.append(hunk)
+            i1 += trailing
+            j1 += trailing
+        leading = min(i2 - i1, context)
+        hunk = [(tag, i2 - leading, i2, j2 - leading, j2)] if leading else []
+        rows = leading
+        changed = False
+
+    if changed:
+        # Up to context lines of a short equal run at the end
+        tag, i1, i2, j1, j2 = hunk[-1]
+        if tag == 'equal' and i2 - i1 > context:
+            hunk[-1] = (tag, i1, i1 + context, j1, j1 + context)
+        hunks.append(hunk)
+    return hunks
+
+
+class Comparison:
+    """The lines of two documents and the hunks of their diff"""
+
+    def __init__(self, website_lines, file_lines, opcodes, context=COMPARISON_CONTEXT_LINES,
+                 hunk_max_lines=COMPARISON_HUNK_MAX_LINES, comparison_id=None):
+        self.comparison_id = comparison_id or uuid.uuid4().hex[:16]
+        self.website_lines = website_lines
+        self.file_lines = file_lines
+        self.hunks = group_hunks(split_opcodes(opcodes, hunk_max_lines), context, hunk_max_lines)
+        self.counts = count_rows(opcodes)
+        self.created = time.time()
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a comparison from the state to_state() returned"""
+        comparison = cls(state['website_lines'], state['file_lines'], [],
+                         comparison_id=state['comparison_id'])
+        comparison.hunks = [[tuple(opcode) for opcode in hunk] for hunk in state['hunks']]
+        comparison.counts = state['counts']
+        comparison.created = state['created']
+        return comparison
+
+    def to_state(self):
+        return {
+            'comparison_id': self.comparison_id,
+            'website_lines': self.website_lines,
+            'file_lines': self.file_lines,
+            'hunks': self.hunks,
+            'counts': self.counts,
+            'created': self.created,
+        }
+
+    def summary(self):
+        counts = self.counts
+        return {
+            'comparison_id': self.comparison_id,
+            'identical': not self.hunks,
+            'website_lines': len(self.website_lines),
+            'file_lines': len(self.file_lines),
+            'counts': dict(counts),
+            # The number of removed and added lines /compare_texts reports
+            'total_differences': 2 * counts['changed'] + counts['removed'] + counts['added'],
+            'hunks': len(self.hunks),
+            'created': self.created,
+        }
+
+    def hunk(self, index):
+        """Hunk index with its rows, numbered from 1 like the lines of the documents"""
+        opcodes = self.hunks[index]
+        _, i1, _, j1, _ = opcodes[0]
+        _, _, i2, _, j2 = opcodes[-1]
+        return {
+            'index': index,
+            'website_start': i1 + 1,
+            'website_count': i2 - i1,
+            'file_start': j1 + 1,
+            'file_count': j2 - j1,
+            'rows': aligned_rows(self.website_lines, self.file_lines, opcodes),
+        }
+
+    def page(self, cursor=0, limit=COMPARISON_PAGE_SIZE):
+        """Up to limit hunks from index cursor on, and the cursor of the next page or None"""
+        end = min(cursor + limit, len(self.hunks))
+        hunks = [self.hunk(index) for index in range(cursor, end)]
+        return hunks, end if end < len(self.hunks) else None
+
+
+class ComparisonStore:
+    """
+    Comparisons on disk, where every worker finds them, with the most
+    recently read ones also loaded in memory. Bounded by count, by disk use
+    and by time since last read.
+    """
+
+    def __init__(self, directory=COMPARISON_DIR, max_stored=COMPARISON_MAX_STORED,
+                 max_bytes=COMPARISON_MAX_BYTES, ttl=COMPARISON_TTL, max_loaded=COMPARISON_MAX_LOADED):
+        self.directory = directory
+        self.max_stored = max_stored
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_loaded = max_loaded
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        self._counters = {'created': 0, 'hits': 0, 'loads': 0, 'misses': 0, 'evictions': 0,
+                          'expired': 0, 'too_large': 0}
+
+    def _path(self, comparison_id):
+        return os.path.join(self.directory, f'{comparison_id}.json')
+
+    def add(self, comparison):
+        data = json.dumps(comparison.to_state()).encode('utf-8')
+        if len(data) > self.max_bytes:
+            with self._lock:
+                self._counters['too_large'] += 1
+            raise ComparisonTooLarge(f'The comparison takes more than {self.max_bytes} bytes')
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(comparison.comparison_id)
+        # Write to a temporary file first so other workers never read a partial comparison
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._counters['created'] += 1
+            self._keep(comparison)
+        self._prune()
+        return comparison
+
+    def get(self, comparison_id):
+        """The comparison with this ID, or None if it is unknown or was dropped"""
+        if not COMPARISON_ID_PATTERN.fullmatch(comparison_id or ''):
+            return None
+        path = self._path(comparison_id)
+        try:
+            expired = time.time() - os.stat(path).st_mtime >= self.ttl
+            if not expired:
+                # The file's modification time is the last read, for every worker
+                os.utime(path)
+        except OSError:
+            expired = None
+        if expired:
+            self._remove_file(path, 'expired')
+        if expired is not False:
+            with self._lock:
+                self._loaded.pop(comparison_id, None)
+                self._counters['misses'] += 1
+            return None
+
+        with self._lock:
+            comparison = self._loaded.get(comparison_id)
+            if comparison is not None:
+                self._loaded.move_to_end(comparison_id)
+                self._counters['hits'] += 1
+                return comparison
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                comparison = Comparison.from_state(json.load(f))
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters['misses'] += 1
+            return None
+        with self._lock:
+            self._counters['loads'] += 1
+            return self._keep(comparison)
+
+    def _keep(self, comparison):
+        comparison = self._loaded.setdefault(comparison.comparison_id, comparison)
+        self._loaded.move_to_end(comparison.comparison_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+        return comparison
+
+    def _stored(self):
+        """(last read, size, path) of each stored comparison, least recently read first"""
+        stored = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return stored
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                status = entry.stat()
+            except OSError:
+                continue
+            stored.append((status.st_mtime, status.st_size, entry.path))
+        stored.sort()
+        return stored
+
+    def _prune(self):
+        # Expired comparisons go first, then the least recently read beyond the limits
+        now = time.time()
+        stored = self._stored()
+        kept = []
+        for accessed, size, path in stored:
+            if now - accessed >= self.ttl:
+                self._remove_file(path, 'expired')
+            else:
+                kept.append((size, path))
+        total_bytes = sum(size for size, _ in kept)
+        while kept and (len(kept) > self.max_stored or total_bytes > self.max_bytes):
+            size, path = kept.pop(0)
+            total_bytes -= size
+            self._remove_file(path, 'evictions')
+
+    def _remove_file(self, path, reason):
+        try:
+            os.remove(path)
+        except OSError:
+            # Another worker removed it first
+            return
+        with self._lock:
+            self._counters[reason] += 1
+
+    def stats(self):
+        stored = self._stored()
+        with self._lock:
+            return dict(self._counters, stored=len(stored), bytes=sum(size for _, size, _ in stored),
+                        loaded=len(self._loaded), max_stored=self.max_stored, max_bytes=self.max_bytes,
+                        ttl=self.ttl, directory=self.directory)
+
+
+comparison_store = ComparisonStore()
@@ -0,0 +1,273 @@
+"""
+Same-site crawler that discovers policy pages and runs each one through
+the extraction pipeline.
+
+The crawl keeps a bounded frontier of (url, depth) pairs, never visits
+a normalized URL twice and stays on the seed's domain. Progress is
+checkpointed to disk so an interrupted crawl can be resumed by its ID.
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urljoin, urlsplit
+
+from page_cache import normalize_url
+from regex_registry import regexes
+
+CRAWL_DIR = os.environ.get('CRAWL_DIR', 'crawls')
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 200))
+CRAWL_MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', 3))
+CRAWL_MAX_FRONTIER = int(os.environ.get('CRAWL_MAX_FRONTIER', 5000))
+CRAWL_WORKERS = int(os.environ.get('CRAWL_WORKERS', 4))
+CRAWL_DELAY = float(os.environ.get('CRAWL_DELAY', 0.5))  # seconds between requests to the site
+CRAWL_CHECKPOINT_EVERY = int(os.environ.get('CRAWL_CHECKPOINT_EVERY', 10))
+
+# Child sitemaps followed from a sitemap index
+SITEMAP_MAX_CHILDREN = 20
+
+LINK_PATTERN = regexes.compile('crawl_link', rb'<a\s[^>]*?href\s*=\s*["\']([^"\'#>]+)', re.IGNORECASE)
+SITEMAP_LOC_PATTERN = regexes.compile('sitemap_loc', rb'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+# Links to files the HTML pipeline cannot read
+SKIPPED_EXTENSIONS = (
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.zip', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico',
+    '.css', '.js', '.mp4', '.mp3', '.xml',
+)
+
+CRAWL_ID_PATTERN = regexes.compile('crawl_id', r'^[a-f0-9]{12}$')
+
+
+def site_of(url):
+    """Host without a leading www., used for the same-domain check"""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def extract_links(body, base_url):
+    """Absolute http(s) links found in the anchors of a page body"""
+    links = []
+    for match in LINK_PATTERN.finditer(body):
+        href = match.group(1).decode('utf-8', 'ignore').strip()
+        if not href or href.lower().startswith(('mailto:', 'tel:', 'javascript:')):
+            continue
+        url = urljoin(base_url, href)
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            continue
+        if parts.path.lower().endswith(SKIPPED_EXTENSIONS):
+            continue
+        links.append(url)
+    return links
+
+
+def sitemap_urls(body):
+    """Return (is_index, locations) for a sitemap or sitemap index body"""
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    is_index = b'<sitemapindex' in body[:2048].lower()
+    locations = [loc.decode('utf-8', 'ignore') for loc in SITEMAP_LOC_PATTERN.findall(body)]
+    return is_index, locations
+
+
+def checkpoint_path(crawl_id, directory=CRAWL_DIR):
+    return os.path.join(directory, f'{crawl_id}.json')
+
+
+def load_checkpoint(crawl_id, directory=CRAWL_DIR):
+    """Return the saved state of a crawl, or None if it does not exist"""
+    if not CRAWL_ID_PATTERN.match(crawl_id or ''):
+        return None
+    try:
+        with open(checkpoint_path(crawl_id, directory), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class Crawler:
+    """Bounded, resumable crawl of one site"""
+
+    def __init__(self, seed_url, sitemap_url=None, max_depth=CRAWL_MAX_DEPTH,
+                 max_pages=CRAWL_MAX_PAGES, workers=CRAWL_WORKERS, delay=CRAWL_DELAY,
+                 max_frontier=CRAWL_MAX_FRONTIER, directory=CRAWL_DIR, crawl_id=None):
+        self.crawl_id = crawl_id or uuid.uuid4().hex[:12]
+        self.seed_url = seed_url
+        self.sitemap_url = sitemap_url
+        self.site = site_of(seed_url or sitemap_url)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.workers = workers
+        self.delay = delay
+        self.max_frontier = max_frontier
+        self.directory = directory
+
+        self.frontier = deque()
+        self.seen = set()
+        self.pages_done = 0
+        self.pages_failed = 0
+        self.dropped = 0
+        self.seeded = False
+        self.finished = False
+
+        self._delay_lock = threading.Lock()
+        self._next_request_at = 0.0
+
+    @classmethod
+    def resume(cls, state, directory=CRAWL_DIR):
+        """Rebuild a crawler from a checkpoint written by save()"""
+        crawler = cls(
+            state['seed_url'], sitemap_url=state.get('sitemap_url'),
+            max_depth=state['max_depth'], max_pages=state['max_pages'],
+            workers=state['workers'], delay=state['delay'],
+            max_frontier=state['max_frontier'], directory=directory,
+            crawl_id=state['crawl_id'],
+        )
+        crawler.frontier = deque((url, depth) for url, depth in state['frontier'])
+        crawler.seen = set(state['seen'])
+        crawler.pages_done = state['pages_done']
+        crawler.pages_failed = state['pages_failed']
+        crawler.dropped = state.get('dropped', 0)
+        crawler.seeded = True
+        crawler.finished = state.get('finished', False)
+        return crawler
+
+    def status(self):
+        return {
+            'crawl_id': self.crawl_id,
+            'seed_url': self.seed_url,
+            'pages_done': self.pages_done,
+            'pages_failed': self.pages_failed,
+            'frontier': len(self.frontier),
+            'seen': len(self.seen),
+            'dropped': self.dropped,
+            'finished': self.finished,
+        }
+
+    def save(self, in_flight=()):
+        """Checkpoint the crawl; pages still being fetched go back on the frontier"""
+        state = {
+            'crawl_id': self.crawl_id,
+            'seed_url': self.seed_url,
+            'sitemap_url': self.sitemap_url,
+            'max_depth': self.max_depth,
+            'max_pages': self.max_pages,
+            'workers': self.workers,
+            'delay': self.delay,
+            'max_frontier': self.max_frontier,
+            'frontier': list(in_flight) + list(self.frontier),
+            'seen': sorted(self.seen),
+            'pages_done': self.pages_done,
+            'pages_failed': self.pages_failed,
+            'dropped': self.dropped,
+            'finished': self.finished,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = checkpoint_path(self.crawl_id, self.directory)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def enqueue(self, url, depth):
+        """Add a URL to the frontier unless it is off-site, too deep or already seen"""
+        if depth > self.max_depth or site_of(url) != self.site:
+            return False
+        key = normalize_url(url)
+        if key in self.seen:
+            return False
+        if len(self.frontier) >= self.max_frontier:
+            self.dropped += 1
+            return False
+        self.seen.add(key)
+        self.frontier.append((url, depth))
+        return True
+
+    def _wait_turn(self):
+        # Space out request start times across all workers
+        with self._delay_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            self._next_request_at = start_at + self.delay
+        if start_at > now:
+            time.sleep(start_at - now)
+
+    def _seed(self, fetch):
+        if self.seed_url:
+            self.enqueue(self.seed_url, 0)
+
+        if self.sitemap_url:
+            sitemaps = deque([self.sitemap_url])
+            children = 0
+            while sitemaps:
+                self._wait_turn()
+                try:
+                    is_index, locations = sitemap_urls(fetch(sitemaps.popleft()))
+                except Exception:
+                    continue
+                for location in locations:
+                    if is_index:
+                        if children < SITEMAP_MAX_CHILDREN and site_of(location) == self.site:
+                            sitemaps.append(location)
+                            children += 1
+                    else:
+                        self.enqueue(location, 0)
+        self.seeded = True
+
+    def _visit(self, fetch, extract, url):
+        self._wait_turn()
+        body = fetch(url)
+        return extract(body), extract_links(body, url)
+
+    def run(self, fetch, extract):
+        """
+        Crawl until the frontier is empty or max_pages is reached, yielding
+        one result dict per visited page. fetch(url) returns a page body and
+        extract(body) returns its text.
+        """
+        if not self.seeded:
+            self._seed(fetch)
+
+        in_flight = {}
+        since_checkpoint = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            def schedule():
+                while (self.frontier and len(in_flight) < self.workers
+                       and self.pages_done + len(in_flight) < self.max_pages):
+                    url, depth = self.frontier.popleft()
+                    in_flight[executor.submit(self._visit, fetch, extract, url)] = (url, depth)
+
+            try:
+                schedule()
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, depth = in_flight.pop(future)
+                        self.pages_done += 1
+                        try:
+                            text, links = future.result()
+                        except Exception as e:
+                            self.pages_failed += 1
+                            yield {'url': url, 'depth': depth, 'error': str(e)}
+                        else:
+                            for link in links:
+                                self.enqueue(link, depth + 1)
+                            yield {'url': url, 'depth': depth, 'success': True, 'text': text}
+
+                        since_checkpoint += 1
+                        if since_checkpoint >= CRAWL_CHECKPOINT_EVERY:
+                            self.save(in_flight.values())
+                            since_checkpoint = 0
+                    schedule()
+
+                self.finished = not self.frontier or self.pages_done >= self.max_pages
+            finally:
+                # Also runs when the client goes away mid-stream, so the crawl can be resumed
+                self.save(in_flight.values())
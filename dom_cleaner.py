@@ -0,0 +1,124 @@
+"""
+Single-pass removal of non-content elements from a parsed page.
+
+Every element is tested once against a precompiled matcher covering tag
+names, class tokens, inline styles, hidden/aria-hidden attributes and
+image file names in attribute values. Matching elements are dropped
+together with their subtree, which is then never visited.
+
+element_texts() computes the text of every remaining element in one
+more walk, so callers need not run get_text() on each of them.
+"""
+import re
+
+from bs4.element import CData, NavigableString, Tag
+
+from regex_registry import regexes
+
+# Tags whose whole subtree never holds page text
+DROP_TAGS = frozenset([
+    'script', 'style', 'noscript', 'meta', 'link', 'head', 'img',
+    # Navigation
+    'nav', 'header', 'footer', 'menu', 'navbar', 'breadcrumb',
+])
+
+# Substrings of the class attribute that mark non-content elements
+DROP_CLASS_SUBSTRINGS = [
+    # Navigation and UI
+    'nav', 'menu', 'header', 'footer', 'breadcrumb', 'sidebar', 'toolbar',
+    # Promotional and marketing
+    'banner', 'promo', 'ad', 'advertisement', 'marketing', 'popup', 'modal', 'overlay',
+    'cta', 'call-to-action', 'button', 'btn',
+    # Social media and sharing
+    'social', 'share', 'follow', 'like', 'twitter', 'facebook', 'linkedin', 'instagram',
+    # Hidden
+    'hidden', 'hide', 'd-none', 'invisible', 'sr-only',
+]
+
+DROP_CLASS_PATTERN = regexes.compile('drop_class', '|'.join(re.escape(s) for s in DROP_CLASS_SUBSTRINGS))
+HIDDEN_STYLE_PATTERN = regexes.compile('hidden_style', r'display\s*:\s*none|visibility\s*:\s*hidden')
+IMAGE_ATTR_PATTERN = regexes.compile('image_attr', r'@\d+\.?\d*x\.webp|\.webp|\.png|\.jpg|\.jpeg|\.svg|\.gif|\.ico', re.IGNORECASE)
+
+
+def should_drop(tag):
+    """Decide whether an element and its subtree are removed"""
+    return is_droppable(tag.name, tag.attrs)
+
+
+def is_droppable(name, attrs):
+    """should_drop() on a tag name and attribute dict, for parsers that build no tree"""
+    if name in DROP_TAGS:
+        return True
+
+    if not attrs:
+        return False
+
+    if 'hidden' in attrs or attrs.get('aria-hidden') == 'true':
+        return True
+
+    style = attrs.get('style')
+    if isinstance(style, str) and HIDDEN_STYLE_PATTERN.search(style):
+        return True
+
+    classes = attrs.get('class')
+    if classes is None:
+        return False
+
+    # Class selectors match against the space-joined class attribute
+    class_value = classes if isinstance(classes, str) else ' '.join(classes)
+    if DROP_CLASS_PATTERN.search(class_value):
+        return True
+
+    # Image file names are only looked for on elements that carry a class
+    for value in attrs.values():
+        if isinstance(value, str) and IMAGE_ATTR_PATTERN.search(value):
+            return True
+
+    return False
+
+
+def clean_tree(root):
+    """Remove every droppable element under root in one walk; returns the number removed"""
+    dropped = []
+    stack = [root]
+    while stack:
+        for child in stack.pop().contents:
+            if not isinstance(child, Tag):
+                continue
+            if should_drop(child):
+                dropped.append(child)
+            else:
+                stack.append(child)
+
+    for tag in dropped:
+        tag.decompose()
+    return len(dropped)
+
+
+def element_texts(root):
+    """
+    Map id(tag) to tag.get_text(strip=True) for root and every element
+    under it, built bottom-up in a single walk. Strings that get_text()
+    skips are left out everywhere, so the text of a template, script or
+    ruby element itself is empty.
+    """
+    texts = {}
+    stack = [(root, iter(root.contents), [])]
+    while stack:
+        tag, children, parts = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            text = texts[id(tag)] = ''.join(parts)
+            if stack and text:
+                stack[-1][2].append(text)
+            continue
+
+        if isinstance(child, Tag):
+            stack.append((child, iter(child.contents), []))
+        elif type(child) is NavigableString or type(child) is CData:
+            # get_text() skips comments, doctypes and template or ruby strings
+            stripped = child.strip()
+            if stripped:
+                parts.append(stripped)
+    return texts
@@ -0,0 +1,321 @@
+"""
+Fetching of web pages for text extraction.
+
+Bodies are streamed with a hard byte cap. A page is only fetched a
+second time when its content looks truncated or like a bot challenge,
+and the header profile that worked is remembered per domain so the
+next fetch starts with it, for the FETCH_MAX_PROFILE_HOSTS domains
+fetched most recently.
+"""
+import codecs
+import os
+import threading
+from collections import OrderedDict
+from time import perf_counter
+from urllib.parse import urlsplit
+
+import requests
+from bs4.dammit import EncodingDetector
+
+from metrics import METRICS_MAX_HOSTS, SIZE_BUCKETS, BoundedLabels, metrics
+from page_cache import page_cache
+
+FETCH_MAX_BYTES = int(os.environ.get('FETCH_MAX_BYTES', 10 * 1024 * 1024))
+FETCH_MAX_PROFILE_HOSTS = int(os.environ.get('FETCH_MAX_PROFILE_HOSTS', 1000))
+# Pages without closing tags are only taken as cut off below this size
+FETCH_TRUNCATED_MAX_BYTES = int(os.environ.get('FETCH_TRUNCATED_MAX_BYTES', 8 * 1024))
+CHUNK_SIZE = 64 * 1024
+
+# Header profiles tried in order; the first one mimics a real browser
+HEADER_PROFILES = [
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    },
+    {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache',
+    },
+]
+
+# Markers of interstitial pages served instead of the real content
+CHALLENGE_MARKERS = [
+    b'cf-browser-verification', b'cf-challenge', b'<title>just a moment',
+    b'attention required! | cloudflare', b'checking your browser',
+    b'ddos protection by', b'_incapsula_resource', b'px-captcha',
+    b'please enable javascript and cookies',
+]
+
+# Only the start of a page is scanned for challenge markers
+SIGNAL_WINDOW = 32 * 1024
+
+
+class PageTooLarge(requests.exceptions.RequestException):
+    """Raised when a page body exceeds FETCH_MAX_BYTES"""
+
+
+_lock = threading.Lock()
+_preferred_profiles = OrderedDict()  # Least recently fetched domain first
+_counters = {'fetches': 0, 'retries': 0, 'challenges': 0, 'truncated': 0, 'too_large': 0, 'streamed': 0}
+
+
+FETCH_SECONDS = metrics.histogram('fetch_duration_seconds', 'Outbound page request latency, until the body is read', ['host'])
+FETCH_BODY_BYTES = metrics.histogram('fetch_body_bytes', 'Size of the page bodies received', ['host'], SIZE_BUCKETS)
+FETCH_RESPONSES = metrics.counter('fetch_responses_total', 'Outbound page requests by response status', ['host', 'status'])
+FETCH_ERRORS = metrics.counter('fetch_errors_total', 'Outbound page requests that raised, by exception type', ['host', 'exception'])
+host_label = BoundedLabels(METRICS_MAX_HOSTS)
+
+
+def _count(key):
+    with _lock:
+        _counters[key] += 1
+
+
+def _observe_fetch(host, started, response, size):
+    host = host_label(host)
+    FETCH_SECONDS.observe(perf_counter() - started, host=host)
+    FETCH_BODY_BYTES.observe(size, host=host)
+    FETCH_RESPONSES.inc(host=host, status=response.status_code)
+
+
+def check_length(response, max_bytes):
+    """Reject a response whose declared Content-Length exceeds max_bytes"""
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        _count('too_large')
+        raise PageTooLarge(f'Page is larger than {max_bytes} bytes', response=response)
+
+
+def iter_body(response, max_bytes):
+    """Yield the chunks of a streamed response body, aborting as soon as it exceeds max_bytes"""
+    size = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            _count('too_large')
+            raise PageTooLarge(f'Page is larger than {max_bytes} bytes', response=response)
+        yield chunk
+
+
+def read_body(response, max_bytes=None):
+    """Read a streamed response body, aborting as soon as it exceeds max_bytes"""
+    if max_bytes is None:
+        max_bytes = FETCH_MAX_BYTES
+    check_length(response, max_bytes)
+    return b''.join(iter_body(response, max_bytes))
+
+
+def looks_like_challenge(body):
+    head = body[:SIGNAL_WINDOW].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def short_of_length(response):
+    """Whether fewer bytes arrived than the response's Content-Length declared"""
+    content_length = response.headers.get('Content-Length')
+    received = getattr(response.raw, 'tell', None)
+    if not content_length or not content_length.isdigit() or received is None:
+        return False
+    # The raw stream counts the bytes as sent, before any decompression
+    return received() < int(content_length)
+
+
+def looks_truncated(body, response=None):
+    """
+    An HTML document whose closing tags never arrived, and that is also
+    short or shorter than its declared length. Many complete pages omit
+    their closing tags, so their absence alone is not enough.
+    """
+    if not body.strip():
+        return True
+    head = body[:SIGNAL_WINDOW].lower()
+    if b'<html' not in head and b'<body' not in head:
+        return False
+    tail = body[-4096:].lower()
+    if b'</html>' in tail or b'</body>' in tail:
+        return False
+    return len(body) < FETCH_TRUNCATED_MAX_BYTES or (response is not None and short_of_length(response))
+
+
+def _profile_order(host):
+    with _lock:
+        preferred = _preferred_profiles.get(host, 0)
+        if host in _preferred_profiles:
+            _preferred_profiles.move_to_end(host)
+    return [preferred] + [i for i in range(len(HEADER_PROFILES)) if i != preferred]
+
+
+def _remember_profile(host, index):
+    with _lock:
+        # Domains that take the first profile need no entry
+        if index == 0:
+            _preferred_profiles.pop(host, None)
+            return
+        _preferred_profiles[host] = index
+        _preferred_profiles.move_to_end(host)
+        while len(_preferred_profiles) > FETCH_MAX_PROFILE_HOSTS:
+            _preferred_profiles.popitem(last=False)
+
+
+def _get(session, url, headers):
+    host = (urlsplit(url).hostname or '').lower()
+    started = perf_counter()
+    try:
+        response = session.get(url, headers=headers, stream=True)
+        try:
+            body = read_body(response) if response.status_code != 304 else b''
+        finally:
+            response.close()
+    except Exception as e:
+        FETCH_ERRORS.inc(host=host_label(host), exception=type(e).__name__)
+        raise
+    _observe_fetch(host, started, response, len(body))
+    return response, body
+
+
+def fetch_page(session, url):
+    """
+    Fetch the body of a page, reusing the page cache when the stored copy
+    is still within its TTL or the server answers 304 Not Modified.
+    """
+    cached = page_cache.lookup(url) if page_cache else None
+    if cached is not None and page_cache.is_fresh(cached):
+        body = page_cache.read_body(cached)
+        if body is not None:
+            return body
+
+    host = (urlsplit(url).hostname or '').lower()
+    conditional_headers = page_cache.conditional_headers(cached) if page_cache else {}
+
+    for attempt, profile in enumerate(_profile_order(host)):
+        _count('fetches')
+        if attempt:
+            _count('retries')
+            # Retries must return a full body, so they are never conditional
+            conditional_headers = {}
+
+        response, body = _get(session, url, {**HEADER_PROFILES[profile], **conditional_headers})
+
+        if response.status_code == 304 and cached is not None:
+            body = page_cache.read_body(cached, revalidated=True)
+            if body is not None:
+                page_cache.refresh(cached)
+                _remember_profile(host, profile)
+                return body
+            # Stored body is gone, fetch the full page again
+            response, body = _get(session, url, HEADER_PROFILES[profile])
+
+        retry_reason = None
+        if looks_like_challenge(body):
+            retry_reason = 'challenges'
+        elif response.ok and looks_truncated(body, response):
+            retry_reason = 'truncated'
+        if retry_reason is None:
+            break
+        _count(retry_reason)
+
+    response.raise_for_status()
+    if retry_reason is not None:
+        # Every profile got a challenge or a cut-off page: use it, but neither
+        # remember the profile nor cache the body
+        return body
+
+    _remember_profile(host, profile)
+
+    if page_cache and 'no-store' not in response.headers.get('Cache-Control', ''):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        # Pages without validators can only be reused while their TTL lasts
+        if etag or last_modified or page_cache.ttl_for(url) > 0:
+            page_cache.store(url, body, etag=etag, last_modified=last_modified)
+
+    return body
+
+
+def sniff_encoding(head):
+    """
+    The encoding BeautifulSoup would pick for a body starting with head: its
+    byte order mark, its <meta charset>, a detected charset, then UTF-8 and
+    Windows-1252, whichever first decodes head.
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in EncodingDetector(head, is_html=True).encodings:
+        try:
+            # Incremental, so a character cut off at the end of head still decodes
+            codecs.getincrementaldecoder(encoding)().decode(head)
+        except (LookupError, UnicodeDecodeError):
+            continue
+        # An ASCII start says nothing about the rest, which is most likely UTF-8
+        return 'utf-8' if codecs.lookup(encoding).name == 'ascii' else encoding
+    return 'windows-1252'
+
+
+def body_encoding(response, head=b''):
+    """Charset declared in the Content-Type header, or the one sniffed from the start of the body"""
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        return response.encoding
+    return sniff_encoding(head)
+
+
+def open_stream(session, url, max_bytes=None):
+    """
+    Start fetching a page for incremental extraction and return
+    (encoding, chunks), where chunks yields the body as it arrives. Without
+    a charset in the Content-Type header, the encoding is sniffed from the
+    first chunk, as the buffered path does from the whole body. The page
+    cache and the challenge/truncation retries are bypassed, since a
+    streamed body is consumed before it could be checked.
+    """
+    if max_bytes is None:
+        max_bytes = FETCH_MAX_BYTES
+    host = (urlsplit(url).hostname or '').lower()
+    profile = _profile_order(host)[0]
+    _count('fetches')
+    _count('streamed')
+
+    started = perf_counter()
+    try:
+        response = session.get(url, headers=HEADER_PROFILES[profile], stream=True)
+    except Exception as e:
+        FETCH_ERRORS.inc(host=host_label(host), exception=type(e).__name__)
+        raise
+    try:
+        response.raise_for_status()
+        check_length(response, max_bytes)
+        body = iter_body(response, max_bytes)
+        head = next(body, b'')
+    except Exception:
+        _observe_fetch(host, started, response, 0)
+        response.close()
+        raise
+
+    def chunks():
+        # The request is observed once the body is consumed or abandoned
+        size = len(head)
+        try:
+            if head:
+                yield head
+            for chunk in body:
+                size += len(chunk)
+                yield chunk
+        finally:
+            response.close()
+            _observe_fetch(host, started, response, size)
+
+    return body_encoding(response, head), chunks()
+
+
+def fetch_stats():
+    with _lock:
+        return {'counters': dict(_counters), 'preferred_profiles': dict(_preferred_profiles)}
@@ -0,0 +1,177 @@
+"""
+Process-wide outbound HTTP client.
+
+All page fetches go through one set of urllib3 connection pools so that
+repeated requests to the same insurer sites reuse keep-alive connections
+instead of paying DNS, TCP and TLS setup on every extraction.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import connectionpool
+from urllib3.poolmanager import PoolManager
+
+# Timeouts in seconds, applied to every request unless overridden
+CONNECT_TIMEOUT = float(os.environ.get('FETCH_CONNECT_TIMEOUT', 10))
+READ_TIMEOUT = float(os.environ.get('FETCH_READ_TIMEOUT', 20))
+
+# Number of per-host pools kept alive and connections kept per host
+POOL_CONNECTIONS = int(os.environ.get('FETCH_POOL_CONNECTIONS', 50))
+POOL_MAXSIZE = int(os.environ.get('FETCH_POOL_MAXSIZE', 10))
+
+# When set, callers wait for a free connection instead of opening extra ones
+POOL_BLOCK = os.environ.get('FETCH_POOL_BLOCK', '0').lower() in ('1', 'true', 'yes')
+
+
+def parse_host_settings(value, cast=int):
+    """Parse "host=value,host=value" into a dict keyed by lowercase host"""
+    settings = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item or '=' not in item:
+            continue
+        host, setting = item.split('=', 1)
+        try:
+            settings[host.strip().lower()] = cast(setting)
+        except ValueError:
+            continue
+    return settings
+
+
+HOST_POOL_SIZES = parse_host_settings(os.environ.get('FETCH_HOST_POOL_SIZES', ''))
+
+
+class PoolStats:
+    """Thread-safe per-host counters for connection pool usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def record(self, host, key):
+        with self._lock:
+            counters = self._hosts.get(host)
+            if counters is None:
+                counters = self._hosts[host] = {'checkouts': 0, 'new_connections': 0, 'waits': 0}
+            counters[key] += 1
+
+    def snapshot(self):
+        """Return per-host and total counters, including pool hits"""
+        with self._lock:
+            hosts = {host: dict(counters) for host, counters in self._hosts.items()}
+
+        totals = {'checkouts': 0, 'hits': 0, 'new_connections': 0, 'waits': 0}
+        for counters in hosts.values():
+            # A checkout that did not need a new connection reused a pooled one
+            counters['hits'] = max(counters['checkouts'] - counters['new_connections'], 0)
+            for key in totals:
+                totals[key] += counters[key]
+
+        return {'hosts': hosts, 'totals': totals}
+
+
+pool_stats = PoolStats()
+
+
+class _CountingPoolMixin:
+    """Record checkouts, new connections and waits on a urllib3 pool"""
+
+    def _get_conn(self, timeout=None):
+        pool_stats.record(self.host, 'checkouts')
+        if self.block and self.pool is not None and self.pool.empty():
+            pool_stats.record(self.host, 'waits')
+        return super()._get_conn(timeout)
+
+    def _new_conn(self):
+        pool_stats.record(self.host, 'new_connections')
+        return super()._new_conn()
+
+
+# urllib3 puts the pool class name into error messages, so keep its names
+class HTTPConnectionPool(_CountingPoolMixin, connectionpool.HTTPConnectionPool):
+    pass
+
+
+class HTTPSConnectionPool(_CountingPoolMixin, connectionpool.HTTPSConnectionPool):
+    pass
+
+
+class _PoolManager(PoolManager):
+    """Pool manager with counting pools and per-host pool sizes"""
+
+    def __init__(self, *args, host_pool_sizes=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.host_pool_sizes = host_pool_sizes or {}
+        self.pool_classes_by_scheme = {
+            'http': HTTPConnectionPool,
+            'https': HTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        size = self.host_pool_sizes.get(host.lower())
+        if size:
+            request_context = dict(request_context or self.connection_pool_kw)
+            request_context['maxsize'] = size
+        return super()._new_pool(scheme, host, port, request_context=request_context)
+
+
+class _PooledAdapter(HTTPAdapter):
+    def __init__(self, host_pool_sizes=None, **kwargs):
+        self.host_pool_sizes = host_pool_sizes or {}
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager = _PoolManager(
+            num_pools=connections, maxsize=maxsize, block=block,
+            host_pool_sizes=self.host_pool_sizes, **pool_kwargs
+        )
+
+
+class _ClientSession(requests.Session):
+    """Session that borrows connections from the shared adapter"""
+
+    def __init__(self, adapter, timeout):
+        super().__init__()
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+    def close(self):
+        # The adapter is shared with every other session, so leave its pools open
+        pass
+
+
+class HttpClient:
+    """Long-lived client whose connection pools are shared across threads"""
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 pool_block=POOL_BLOCK, host_pool_sizes=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = _PooledAdapter(
+            host_pool_sizes=HOST_POOL_SIZES if host_pool_sizes is None else host_pool_sizes,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+
+    def session(self):
+        """
+        Return a new session for one extraction.
+        Cookies stay private to the session while TCP/TLS connections
+        are taken from the process-wide pools.
+        """
+        return _ClientSession(self.adapter, self.timeout)
+
+    def stats(self):
+        return pool_stats.snapshot()
+
+
+client = HttpClient()
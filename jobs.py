@@ -0,0 +1,360 @@
+"""
+Background jobs for long-running extractions.
+
+Submitting a job returns its ID at once; the work runs on a bounded thread
+pool and reports the stage it is in, so clients poll for the result
+instead of holding a request open past proxy timeouts. A job submitted
+again with the same key while an earlier one is still pending, or
+finished less than JOB_DEDUP_WINDOW seconds ago, returns the earlier job,
+so client retries do not multiply the work; later submissions run it
+again with fresh data.
+
+The state of each job is written to JOB_DIR whenever it changes, so a
+client polling another worker than the one running the job still sees it.
+Finished jobs are kept for JOB_RESULT_TTL seconds, and at most
+JOB_MAX_KEPT of them per worker, the oldest going first. A job whose
+state has not changed for JOB_RESULT_TTL seconds is dropped too.
+
+While a worker runs a job it touches the job's file every
+JOB_HEARTBEAT_INTERVAL seconds. An unfinished job whose file has not been
+touched for three intervals was left by a worker that stopped: other
+workers report it as failed, and submitting it again runs it anew.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from regex_registry import regexes
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 100))
+JOB_MAX_KEPT = int(os.environ.get('JOB_MAX_KEPT', 1000))
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 3600))
+JOB_DEDUP_WINDOW = float(os.environ.get('JOB_DEDUP_WINDOW', 30))
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 10))
+JOB_DIR = os.environ.get('JOB_DIR', os.path.join('cache', 'jobs'))
+
+JOB_ID_PATTERN = regexes.compile('job_id', r'[0-9a-f]{16}')
+
+
+class QueueFull(RuntimeError):
+    """Raised when JOB_MAX_PENDING jobs are already queued or running"""
+
+
+class Job:
+    """One submitted piece of work and the stage it has reached"""
+
+    def __init__(self, kind, stages, key=None, on_change=None):
+        self.job_id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.key = key
+        self.stages = list(stages)
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.on_change = on_change
+
+    @classmethod
+    def from_state(cls, state):
+        """A copy of a job, as another worker saved it"""
+        job = cls(state['type'], state['stages'])
+        job.job_id = state['job_id']
+        for name in ('status', 'stage', 'result', 'error', 'created', 'started', 'finished'):
+            setattr(job, name, state[name])
+        return job
+
+    def to_state(self):
+        return {
+            'job_id': self.job_id,
+            'type': self.kind,
+            'stages': self.stages,
+            'status': self.status,
+            'stage': self.stage,
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+    def set_stage(self, stage):
+        """Called by the work function as it moves on to the next stage"""
+        self.stage = stage
+        if self.on_change is not None:
+            self.on_change(self)
+
+    @property
+    def progress(self):
+        """Fraction of the stages completed"""
+        if self.status == 'done':
+            return 1.0
+        if self.stage not in self.stages:
+            return 0.0
+        return round(self.stages.index(self.stage) / len(self.stages), 3)
+
+    def to_dict(self):
+        job = {
+            'job_id': self.job_id,
+            'type': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+        if self.status == 'done':
+            job['result'] = self.result
+        elif self.status == 'failed':
+            job['error'] = self.error
+        return job
+
+
+def key_digest(key):
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:16]
+
+
+class JobManager:
+    """
+    Runs jobs on a thread pool and keeps their state on disk until they
+    expire, with the jobs this worker ran also in memory
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, ttl=JOB_RESULT_TTL,
+                 dedup_window=JOB_DEDUP_WINDOW, max_kept=JOB_MAX_KEPT, directory=JOB_DIR,
+                 heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.dedup_window = dedup_window
+        self.max_kept = max_kept
+        self.directory = directory
+        self.heartbeat_interval = heartbeat_interval
+        self._heartbeat_pid = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._finished = OrderedDict()  # In the order the jobs finished
+        self._by_key = {}
+        self._counters = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'done': 0,
+                          'failed': 0, 'expired': 0, 'evictions': 0, 'loads': 0,
+                          'abandoned': 0}
+
+    def _path(self, job_id):
+        return os.path.join(self.directory, f'{job_id}.json')
+
+    def _key_path(self, key):
+        return os.path.join(self.directory, f'key-{key_digest(key)}')
+
+    def submit(self, kind, stages, func, *args, key=None, describe_error=str):
+        """
+        Queue func(job, *args) and return the Job. func calls job.set_stage()
+        as it goes and returns the result; describe_error turns an exception
+        it raises into the job's error message.
+        """
+        # A job with this key that another worker submitted is only on disk
+        existing = self._load_by_key(key) if key is not None else None
+        with self._lock:
+            removed = self._expire()
+            if key is not None and key in self._by_key:
+                existing = self._by_key[key]
+            if existing is not None and self._is_retry_of(existing):
+                self._counters['deduplicated'] += 1
+                return existing
+            if len(self._pending) >= self.max_pending:
+                self._counters['rejected'] += 1
+                raise QueueFull(f'{len(self._pending)} jobs are already pending')
+            job = Job(kind, stages, key=key, on_change=self._save)
+            self._pending[job.job_id] = job
+            if key is not None:
+                self._by_key[key] = job
+            self._counters['submitted'] += 1
+            self._start_heartbeat()
+        self._remove_files(removed)
+
+        try:
+            self._save(job)
+            if key is not None:
+                self._write(self._key_path(key), job.job_id)
+        except OSError:
+            # The job never ran, so it gives its place back
+            with self._lock:
+                del self._pending[job.job_id]
+                if self._by_key.get(key) is job:
+                    del self._by_key[key]
+            raise
+        self._executor.submit(self._run, job, func, args, describe_error)
+        return job
+
+    def _start_heartbeat(self):
+        # Once per process: a forked worker does not inherit the thread
+        if self._heartbeat_pid == os.getpid():
+            return
+        self._heartbeat_pid = os.getpid()
+        threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+
+    def _heartbeat(self):
+        """Touch the files of the jobs this worker has pending, so others know they are alive"""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            with self._lock:
+                job_ids = list(self._pending)
+            for job_id in job_ids:
+                try:
+                    os.utime(self._path(job_id))
+                except OSError:
+                    pass
+
+    def _is_retry_of(self, job):
+        # Pending jobs are shared; finished ones only briefly, since their results age
+        if job.status == 'failed':
+            return False
+        return job.finished is None or time.time() - job.finished < self.dedup_window
+
+    def _run(self, job, func, args, describe_error):
+        try:
+            job.status = 'running'
+            job.started = time.time()
+            self._save(job)
+            try:
+                job.result = func(job, *args)
+                job.status = job.stage = 'done'
+            except Exception as e:
+                job.error = describe_error(e)
+                job.status = 'failed'
+            job.finished = time.time()
+            self._save(job)
+        except OSError as e:
+            # Other workers cannot follow a job whose state was not saved
+            job.error = f'Could not save the job state: {str(e)}'
+            job.status = 'failed'
+            job.finished = job.finished or time.time()
+        finally:
+            # The job's place in the queue is given back whatever happened
+            with self._lock:
+                self._pending.pop(job.job_id, None)
+                self._finished[job.job_id] = job
+                self._counters[job.status] += 1
+                removed = self._expire()
+            self._remove_files(removed)
+
+    def get(self, job_id):
+        """The job with this ID, or None if it is unknown or has expired"""
+        if not JOB_ID_PATTERN.fullmatch(job_id or ''):
+            return None
+        with self._lock:
+            removed = self._expire()
+            job = self._pending.get(job_id) or self._finished.get(job_id)
+        self._remove_files(removed)
+        if job is not None:
+            return job
+        return self._load(job_id)
+
+    def _load(self, job_id):
+        """A job another worker ran, from its state on disk"""
+        path = self._path(job_id)
+        try:
+            touched = os.stat(path).st_mtime
+            if time.time() - touched >= self.ttl:
+                self._remove_file(path)
+                return None
+            with open(path, encoding='utf-8') as f:
+                job = Job.from_state(json.load(f))
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._counters['loads'] += 1
+            # Jobs this worker runs are in memory; an unfinished one on disk
+            # without a recent heartbeat lost the worker that ran it
+            if job.finished is None and time.time() - touched >= 3 * self.heartbeat_interval:
+                job.status = 'failed'
+                job.error = 'The worker running this job stopped'
+                job.finished = touched
+                self._counters['abandoned'] += 1
+        return job
+
+    def _load_by_key(self, key):
+        try:
+            with open(self._key_path(key), encoding='utf-8') as f:
+                job_id = f.read()
+        except OSError:
+            return None
+        if not JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+        return self._load(job_id)
+
+    def _expire(self):
+        """
+        Forget the finished jobs past their TTL or beyond max_kept, oldest
+        first, and return them so their files can be removed outside the lock
+        """
+        removed = []
+        now = time.time()
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if now - job.finished < self.ttl:
+                # The jobs after it finished later
+                break
+            removed.append(self._forget(job))
+            self._counters['expired'] += 1
+        while len(self._finished) > self.max_kept:
+            removed.append(self._forget(next(iter(self._finished.values()))))
+            self._counters['evictions'] += 1
+        return removed
+
+    def _forget(self, job):
+        del self._finished[job.job_id]
+        if job.key is not None and self._by_key.get(job.key) is job:
+            del self._by_key[job.key]
+        return job
+
+    def _save(self, job):
+        self._write(self._path(job.job_id), json.dumps(job.to_state()))
+
+    def _write(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file first so other workers never read a partial state
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_files(self, jobs):
+        for job in jobs:
+            self._remove_file(self._path(job.job_id))
+            if job.key is None:
+                continue
+            # Unless the key has been submitted again since
+            key_path = self._key_path(job.key)
+            try:
+                with open(key_path, encoding='utf-8') as f:
+                    if f.read() == job.job_id:
+                        os.remove(key_path)
+            except OSError:
+                pass
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            # Another worker removed it first
+            pass
+
+    def stats(self):
+        with self._lock:
+            removed = self._expire()
+            stats = dict(self._counters, pending=len(self._pending), kept=len(self._finished),
+                         max_kept=self.max_kept, directory=self.directory)
+        self._remove_files(removed)
+        return stats
+
+
+job_manager = JobManager()
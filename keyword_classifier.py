@@ -0,0 +1,145 @@
+"""
+Single-pass keyword classification of text lines.
+
+All keyword lists used to filter extracted text are compiled into one
+trie-shaped regex. One left-to-right scan of a lowercased line with it
+reports every category whose keyword occurs anywhere in the line, with the
+same substring semantics as `keyword in line.lower()`. The regex rules of
+each category are combined into one alternation searched once per line.
+"""
+import re
+
+from regex_registry import regexes
+
+# Literal keywords per category, matched as substrings of the lowercased text
+KEYWORD_CATEGORIES = {
+    # Policy-related keywords that indicate relevant content
+    'policy': [
+        'policy', 'insurance', 'coverage', 'premium', 'claim', 'benefit', 'deductible',
+        'exclusion', 'inclusion', 'terms', 'conditions', 'eligibility', 'sum assured',
+        'policyholder', 'insured', 'beneficiary', 'nominee', 'renewal', 'expiry',
+        'effective date', 'policy period', 'coverage limit', 'claim procedure',
+        'risk', 'liability', 'protection', 'compensation', 'settlement', 'endorsement',
+        'rider', 'add-on', 'optional', 'mandatory', 'waiting period', 'cooling off',
+        'free look', 'grace period', 'lapse', 'surrender', 'maturity', 'death benefit',
+        'accidental death', 'disability', 'hospitalization', 'medical', 'health',
+        'life insurance', 'motor insurance', 'travel insurance', 'home insurance',
+        'fire insurance', 'marine insurance', 'crop insurance', 'liability insurance',
+    ],
+    # Navigation, marketing, technical, social and generic website content
+    'irrelevant': [
+        'home', 'about us', 'contact us', 'login', 'register', 'sign up', 'sign in',
+        'menu', 'navigation', 'breadcrumb', 'footer', 'header', 'sidebar',
+        'learn more', 'read more', 'click here', 'apply now', 'buy now', 'get quote',
+        'download', 'subscribe', 'newsletter', 'follow us', 'share', 'like',
+        'banner', 'advertisement', 'promo', 'offer', 'deal', 'discount',
+        'cookie', 'privacy policy', 'terms of service', 'sitemap', 'search',
+        'google tag manager', 'bootstrap', 'javascript', 'css', 'html',
+        'facebook', 'twitter', 'linkedin', 'instagram', 'youtube', 'whatsapp',
+        'welcome', 'thank you', 'visit our', 'check out', 'explore', 'discover',
+        'company profile', 'our team', 'careers', 'news', 'blog', 'press release',
+    ],
+    # Words of repetitive navigation text
+    'navigation': ['home', 'about', 'contact', 'services', 'products', 'support', 'help'],
+    # Scripts, styles and image assets
+    'tech_asset': [
+        'google tag manager', 'bootstrap css', 'js', 'css', 'javascript',
+        '.webp', '.png', '.jpg', '.jpeg', '.svg', '.gif', '.ico',
+        '@1x', '@2x', '@3x', '@1.5x', '@2.5x', '@3.5x',
+        'without@', 'with@', 'image@', 'img@',
+    ],
+    # Start tags left in the text
+    'markup': ['<span', '<div', '<p', '<h', '<a', '<img', '<script', '<style'],
+    # Page metadata and hidden-element markers
+    'page_meta': [
+        'html', 'meta', 'viewport', 'charset', 'http-equiv', 'content-type',
+        'hidden', 'hide', 'invisible', 'sr-only', 'screen reader',
+        'aria-hidden', 'display: none', 'visibility: hidden',
+    ],
+}
+
+# Regex rules per category, searched in the lowercased text
+PATTERN_CATEGORIES = {
+    'policy_pattern': [
+        r'₹\s*\d+',  # Currency amounts
+        r'\d+\s*(?:lakh|crore|thousand|million)',  # Amounts with units
+        r'policy\s+(?:no|number|id)',  # Policy numbers
+        r'coverage\s+(?:amount|limit|sum)',  # Coverage amounts
+        r'premium\s+(?:amount|rate|cost)',  # Premium information
+        r'claim\s+(?:process|procedure|settlement)',  # Claim information
+        r'valid\s+(?:from|till|until)',  # Validity periods
+        r'age\s+(?:limit|criteria|requirement)',  # Age requirements
+        r'medical\s+(?:test|examination|checkup)',  # Medical requirements
+    ],
+    'image_ref': [r'@\d+\.?\d*x'],  # Retina image suffixes such as @2x
+    'html_tag': [r'<[^>]+>'],
+}
+
+
+def trie_pattern(words):
+    """
+    Regex matching any of words, shaped as a trie so that at each position
+    the longest word starting there is matched.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy: longer words are tried before ending at this node
+        return '(?:' + body + ')?' if '' in node else body
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    """Reports which keyword and pattern categories occur in a piece of text"""
+
+    def __init__(self, keyword_categories=KEYWORD_CATEGORIES, pattern_categories=PATTERN_CATEGORIES,
+                 name='classifier'):
+        # name prefixes the registry names of the compiled patterns
+        categories_of = {}
+        for category, words in keyword_categories.items():
+            for word in words:
+                categories_of.setdefault(word, set()).add(category)
+
+        # Words starting at the same position as the longest match are its prefixes,
+        # so each keyword carries the categories of all keywords that prefix it
+        self._keyword_categories = {
+            word: frozenset().union(*(categories_of[word[:i]] for i in range(1, len(word) + 1)
+                                      if word[:i] in categories_of))
+            for word in categories_of
+        }
+        self._keyword_pattern = regexes.compile(f'{name}.keywords', trie_pattern(categories_of))
+
+        # One alternation per category: a single search() tells whether any rule matches
+        self._rule_patterns = [(category, regexes.compile(f'{name}.{category}', '|'.join(patterns)))
+                               for category, patterns in pattern_categories.items()]
+
+    def classify(self, text):
+        """Set of categories with a keyword or pattern anywhere in text, ignoring case"""
+        text_lower = text.lower()
+        categories = set()
+
+        # Restarting one character after each match start finds overlapping
+        # keywords too, while search() still skips quickly to the next candidate
+        search = self._keyword_pattern.search
+        match = search(text_lower)
+        while match is not None:
+            categories |= self._keyword_categories[match.group()]
+            match = search(text_lower, match.start() + 1)
+
+        for category, pattern in self._rule_patterns:
+            if pattern.search(text_lower):
+                categories.add(category)
+        return categories
+
+
+classifier = KeywordClassifier()
@@ -0,0 +1,264 @@
+"""
+Line diff over interned lines.
+
+Each distinct line is interned to a small integer first, so the diff
+compares integers instead of strings. After their common prefix and
+suffix are matched, the documents are diffed with Myers' O(ND) algorithm,
+which finds a shortest edit script, if that takes at most
+LINE_DIFF_MAX_COST edits. Longer edit scripts are split up as in a
+patience diff: lines that occur exactly once on both sides are matched
+along their longest common increasing run, and the gaps between these
+anchors are diffed the same way. Where no line is unique, usually in
+repeated boilerplate, the occurrences of the least repeated lines, paired
+in order, serve as the anchors.
+
+Unlike difflib.SequenceMatcher there is no junk heuristic, so the result
+does not change once a document passes 200 lines, and the time taken
+grows with the length of the documents and of their differences instead
+of with the product of their lengths.
+"""
+import os
+from bisect import bisect_left
+from collections import Counter
+
+from regex_registry import regexes
+
+LINE_DIFF_MAX_COST = int(os.environ.get('LINE_DIFF_MAX_COST', 1000))
+
+# Words, runs of whitespace and single other characters
+TOKEN_PATTERN = regexes.compile('diff_token', r'\w+|\s+|[^\w\s]')
+
+
+def intern_lines(*sequences):
+    """Return each sequence of lines as a list of integer IDs; equal lines get equal IDs"""
+    table = {}
+    return [[table.setdefault(line, len(table)) for line in lines] for lines in sequences]
+
+
+def intern_against(table, lines):
+    """
+    IDs of lines from the table that interned another sequence, so they can
+    be diffed against that sequence's IDs. Lines missing from the table get
+    new IDs above its own, and the table itself is not changed.
+    """
+    extra = {}
+    ids = []
+    for line in lines:
+        line_id = table.get(line)
+        if line_id is None:
+            line_id = extra.setdefault(line, len(table) + len(extra))
+        ids.append(line_id)
+    return ids
+
+
+def _anchors(a, alo, ahi, b, blo, bhi, repeated=False):
+    """
+    (i, j) of matching lines to keep, along their longest run increasing on
+    both sides. These are the lines that occur once in both ranges or, with
+    repeated set, the least repeated lines, their occurrences on each side
+    paired in order.
+    """
+    a_positions = {}
+    for i in range(alo, ahi):
+        a_positions.setdefault(a[i], []).append(i)
+    b_positions = {}
+    for j in range(blo, bhi):
+        if b[j] in a_positions:
+            b_positions.setdefault(b[j], []).append(j)
+
+    def occurrences(line):
+        return max(len(a_positions[line]), len(b_positions[line]))
+
+    fewest = 1
+    if repeated:
+        fewest = min(map(occurrences, b_positions), default=0)
+    pairs = sorted(pair for line in b_positions if occurrences(line) == fewest
+                   for pair in zip(a_positions[line], b_positions[line]))
+
+    # Longest increasing subsequence of the j's, by patience sorting
+    tails = []  # Smallest last j of a run of each length
+    tail_pairs = []  # Index in pairs of that last j
+    previous = [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        length = bisect_left(tails, j)
+        if length:
+            previous[k] = tail_pairs[length - 1]
+        if length == len(tails):
+            tails.append(j)
+            tail_pairs.append(k)
+        else:
+            tails[length] = j
+            tail_pairs[length] = k
+
+    anchors = []
+    k = tail_pairs[-1] if tail_pairs else None
+    while k is not None:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+
+def _myers_pairs(a, alo, ahi, b, blo, bhi, max_cost):
+    """Matched (i, j) of a shortest edit script, or None if it takes more than max_cost edits"""
+    a = a[alo:ahi]
+    b = b[blo:bhi]
+    n = len(a)
+    m = len(b)
+    limit = min(n + m, max_cost)
+    offset = limit + 1
+    v = [0] * (2 * limit + 3)
+    trace = []  # Furthest x on each diagonal -d..d, after d edits
+
+    for d in range(limit + 1):
+        # v[index] holds diagonal k = index - offset
+        for index in range(offset - d, offset + d + 1, 2):
+            if index == offset - d or (index != offset + d and v[index - 1] < v[index + 1]):
+                x = v[index + 1]
+            else:
+                x = v[index - 1] + 1
+            y = x - index + offset
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[index] = x
+            if x >= n and y >= m:
+                trace.append(v[offset - d:offset + d + 1])
+                return _backtrack(trace, index - offset, alo, blo)
+        trace.append(v[offset - d:offset + d + 1])
+    return None
+
+
+def _backtrack(trace, k, alo, blo):
+    pairs = []
+    for d in range(len(trace) - 1, -1, -1):
+        x = trace[d][k + d]
+        y = x - k
+        if d == 0:
+            start_x = 0
+        else:
+            before = trace[d - 1]
+            if k == -d or (k != d and before[k - 1 + d - 1] < before[k + 1 + d - 1]):
+                k += 1  # Came down from diagonal k + 1 by an insertion
+                start_x = before[k + d - 1]
+            else:
+                k -= 1  # Came across from diagonal k - 1 by a deletion
+                start_x = before[k + d - 1] + 1
+        # The snake from the end of the edit to (x, y) is all matches
+        for t in range(x - start_x):
+            pairs.append((alo + x - 1 - t, blo + y - 1 - t))
+    pairs.reverse()
+    return pairs
+
+
+def matching_pairs(a, b, max_cost=LINE_DIFF_MAX_COST):
+    """Sorted (i, j) of the lines a[i] == b[j] that the diff keeps"""
+    pairs = []
+    ranges = [(0, len(a), 0, len(b))]
+    while ranges:
+        alo, ahi, blo, bhi = ranges.pop()
+
+        # Common prefix and suffix
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            pairs.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            pairs.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        # Without any line in common the whole gap is replaced
+        common = sum((Counter(a[alo:ahi]) & Counter(b[blo:bhi])).values())
+        if not common:
+            continue
+        # A shortest edit script while it is cheap enough to find, since
+        # anchoring on unique lines misaligns a gap in which one of them
+        # moved past repeated lines. Lines without a counterpart must be
+        # edited, so gaps that certainly cost more are anchored at once.
+        if ahi - alo + bhi - blo - 2 * common <= max_cost:
+            myers_pairs = _myers_pairs(a, alo, ahi, b, blo, bhi, max_cost)
+            if myers_pairs is not None:
+                pairs.extend(myers_pairs)
+                continue
+        anchors = (_anchors(a, alo, ahi, b, blo, bhi)
+                   or _anchors(a, alo, ahi, b, blo, bhi, repeated=True))
+
+        for i, j in anchors:
+            pairs.append((i, j))
+            ranges.append((alo, i, blo, j))
+            alo, blo = i + 1, j + 1
+        if anchors:
+            ranges.append((alo, ahi, blo, bhi))
+
+    pairs.sort()
+    return pairs
+
+
+def get_opcodes(a, b, max_cost=LINE_DIFF_MAX_COST):
+    """Edit operations turning a into b, as difflib.SequenceMatcher.get_opcodes() returns them"""
+    # Runs of consecutive matches become (i, j, size) blocks
+    blocks = []
+    for i, j in matching_pairs(a, b, max_cost):
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1][2] += 1
+        else:
+            blocks.append([i, j, 1])
+    blocks.append([len(a), len(b), 0])
+
+    opcodes = []
+    i = j = 0
+    for block_i, block_j, size in blocks:
+        if i < block_i and j < block_j:
+            opcodes.append(('replace', i, block_i, j, block_j))
+        elif i < block_i:
+            opcodes.append(('delete', i, block_i, j, block_j))
+        elif j < block_j:
+            opcodes.append(('insert', i, block_i, j, block_j))
+        i, j = block_i + size, block_j + size
+        if size:
+            opcodes.append(('equal', block_i, i, block_j, j))
+    return opcodes
+
+
+def _add_span(spans, kind, text):
+    if spans and spans[-1][0] == kind:
+        spans[-1][1] += text
+    else:
+        spans.append([kind, text])
+
+
+def intraline_spans(old, new, min_similarity=0.5):
+    """
+    Token-level diff of two paired lines as (old_spans, new_spans), lists of
+    [kind, text] with kind 'equal', 'removed' or 'added'. Tokens compare
+    ignoring case, and any whitespace equals any other, as lines do. Lines
+    sharing less than min_similarity of their characters are marked changed
+    as a whole rather than word by word.
+    """
+    old_tokens = TOKEN_PATTERN.findall(old)
+    new_tokens = TOKEN_PATTERN.findall(new)
+    old_ids, new_ids = intern_lines([' ' if token.isspace() else token.lower() for token in old_tokens],
+                                    [' ' if token.isspace() else token.lower() for token in new_tokens])
+
+    old_spans = []
+    new_spans = []
+    equal_chars = 0
+    for tag, i1, i2, j1, j2 in get_opcodes(old_ids, new_ids):
+        old_text = ''.join(old_tokens[i1:i2])
+        new_text = ''.join(new_tokens[j1:j2])
+        if tag == 'equal':
+            equal_chars += len(old_text) + len(new_text)
+            _add_span(old_spans, 'equal', old_text)
+            _add_span(new_spans, 'equal', new_text)
+            continue
+        if old_text:
+            _add_span(old_spans, 'removed', old_text)
+        if new_text:
+            _add_span(new_spans, 'added', new_text)
+
+    if equal_chars < min_similarity * (len(old) + len(new)):
+        return [['removed', old]], [['added', new]]
+    return old_spans, new_spans
@@ -0,0 +1,65 @@
+"""
+Bounded in-memory LRU cache for memoizing expensive text pipelines.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+EXTRACT_CACHE_MAX_ENTRIES = int(os.environ.get('EXTRACT_CACHE_MAX_ENTRIES', 256))
+EXTRACT_CACHE_MAX_BYTES = int(os.environ.get('EXTRACT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+
+class MemoCache:
+    """
+    Thread-safe LRU cache bounded by entry count and by the total size
+    of the cached strings. A max_entries of 0 disables caching.
+    """
+
+    def __init__(self, max_entries=EXTRACT_CACHE_MAX_ENTRIES, max_bytes=EXTRACT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._entries[key] = value
+            self._total_bytes += size
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, old_value = self._entries.popitem(last=False)
+                self._total_bytes -= len(old_value)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._total_bytes
+            stats['max_entries'] = self.max_entries
+            stats['max_bytes'] = self.max_bytes
+        return stats
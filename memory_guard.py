@@ -0,0 +1,71 @@
+"""
+Limits that keep one page from exhausting a worker's memory.
+
+With EXTRACT_MEMORY_BOUNDED set, a page is refused before it is parsed
+when its body is larger than EXTRACT_MAX_BODY_BYTES or it has more than
+EXTRACT_MAX_NODES start tags. The parsed tree is also taken apart as soon
+as the pipeline has collected its candidate texts. Without that, its
+parent/child reference cycles keep it alive until the cyclic garbage
+collector runs.
+"""
+import os
+import threading
+from itertools import islice
+
+from bs4.element import Tag
+
+from regex_registry import regexes
+
+EXTRACT_MEMORY_BOUNDED = os.environ.get('EXTRACT_MEMORY_BOUNDED', '0').lower() in ('1', 'true', 'yes')
+EXTRACT_MAX_BODY_BYTES = int(os.environ.get('EXTRACT_MAX_BODY_BYTES', 5 * 1024 * 1024))
+EXTRACT_MAX_NODES = int(os.environ.get('EXTRACT_MAX_NODES', 100000))
+
+# Each start tag becomes one element of the tree
+START_TAG_PATTERN = regexes.compile('start_tag', rb'<[A-Za-z]')
+START_TAG_TEXT_PATTERN = regexes.compile('start_tag_text', r'<[A-Za-z]')
+
+
+class PageTooComplex(ValueError):
+    """Raised when a page is over the body size or element count limit"""
+
+
+_lock = threading.Lock()
+_counters = {'checked': 0, 'too_many_bytes': 0, 'too_many_nodes': 0, 'released_trees': 0}
+
+
+def _count(key):
+    with _lock:
+        _counters[key] += 1
+
+
+def check_page(content, max_bytes=EXTRACT_MAX_BODY_BYTES, max_nodes=EXTRACT_MAX_NODES):
+    """Raise PageTooComplex if parsing content would build a tree over the limits"""
+    _count('checked')
+    if max_bytes and len(content) > max_bytes:
+        _count('too_many_bytes')
+        raise PageTooComplex(f'Page is larger than {max_bytes} bytes')
+
+    if max_nodes:
+        pattern = START_TAG_PATTERN if isinstance(content, bytes) else START_TAG_TEXT_PATTERN
+        # Counting stops as soon as the limit is passed
+        nodes = sum(1 for _ in islice(pattern.finditer(content), max_nodes + 1))
+        if nodes > max_nodes:
+            _count('too_many_nodes')
+            raise PageTooComplex(f'Page has more than {max_nodes} elements')
+
+
+def release_tree(root):
+    """Break the reference cycles of a parsed tree so that it is freed right away"""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Tag):
+            stack.extend(node.contents)
+        node.__dict__.clear()
+    _count('released_trees')
+
+
+def guard_stats():
+    with _lock:
+        return dict(_counters, enabled=EXTRACT_MEMORY_BOUNDED,
+                    max_body_bytes=EXTRACT_MAX_BODY_BYTES, max_nodes=EXTRACT_MAX_NODES)
@@ -0,0 +1,201 @@
+"""
+Operational metrics in the Prometheus text exposition format.
+
+Modules register their counters, gauges and histograms with the metrics
+registry when they are imported, and render() writes them all out for
+the /metrics endpoint. Values are kept per process, so with several
+gunicorn workers each one is scraped as its own target (or the
+per-worker series are summed by the scraper).
+
+Labels taken from outside input, such as the host of a fetched URL, go
+through a BoundedLabels so that a crawl of many sites cannot create an
+unbounded number of series.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+METRICS_MAX_HOSTS = int(os.environ.get('METRICS_MAX_HOSTS', 100))
+
+# Histogram bucket upper bounds, in seconds and in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class BoundedLabels:
+    """Passes through the first limit distinct label values and maps later ones to 'other'"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._seen = set()
+
+    def __call__(self, value):
+        with self._lock:
+            if value in self._seen:
+                return value
+            if len(self._seen) < self.limit:
+                self._seen.add(value)
+                return value
+        return 'other'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name} takes the labels {self.labels}, not {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = {key: self._copy(value) for key, value in self._values.items()}
+        for key in sorted(values):
+            lines.extend(self._samples(list(zip(self.labels, key)), values[key]))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _samples(self, pairs, value):
+        return [f'{self.name}{format_labels(pairs)} {format_value(value)}']
+
+
+class Counter(_Metric):
+    """A count that only goes up"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, such as the requests in flight"""
+
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Counts of observed values per bucket, with their sum"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # A count per bucket, one for values above the last bound, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0]
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+    def _samples(self, pairs, counts):
+        return histogram_samples(self.name, pairs, self.buckets, counts[:-1], counts[-1])
+
+
+def histogram_samples(name, pairs, buckets, counts, total):
+    """Sample lines of one histogram series from its per-bucket (not cumulative) counts"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(buckets + (float('inf'),), counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{format_labels(pairs + [("le", format_value(bound))])} {cumulative}')
+    lines.append(f'{name}_sum{format_labels(pairs)} {format_value(total)}')
+    lines.append(f'{name}_count{format_labels(pairs)} {cumulative}')
+    return lines
+
+
+class MetricsRegistry:
+    """The metrics of this process, in registration order"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Metric {metric.name} is already registered')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collect):
+        """Call collect() on every render; it returns lines in the text format"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
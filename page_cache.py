@@ -0,0 +1,240 @@
+"""
+Persistent cache of fetched pages.
+
+Bodies are stored on disk together with their ETag/Last-Modified
+validators so that repeat fetches can be made conditional and a
+304 Not Modified answer reuses the stored body. Disk use is bounded
+by evicting the least recently used pages.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from http_client import parse_host_settings
+
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR', os.path.join('cache', 'pages'))
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+# Seconds a stored page is served without revalidation (0 = always revalidate)
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', 0))
+PAGE_CACHE_DOMAIN_TTLS = parse_host_settings(os.environ.get('PAGE_CACHE_DOMAIN_TTLS', ''), cast=float)
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+log = logging.getLogger('webscraper.page_cache')
+
+
+def normalize_url(url):
+    """Normalize a URL so that equivalent spellings share one cache entry"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    # Fragments never reach the server, so they are dropped
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class CachedPage:
+    """Metadata for one stored page; the body stays on disk until read"""
+
+    def __init__(self, url, size, stored_at, etag=None, last_modified=None):
+        self.url = url
+        self.size = size
+        self.stored_at = stored_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'size': self.size,
+            'stored_at': self.stored_at,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+        }
+
+
+class PageCache:
+    """On-disk LRU store of page bodies keyed by normalized URL"""
+
+    def __init__(self, directory=PAGE_CACHE_DIR, max_bytes=PAGE_CACHE_MAX_BYTES,
+                 default_ttl=PAGE_CACHE_TTL, domain_ttls=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.domain_ttls = PAGE_CACHE_DOMAIN_TTLS if domain_ttls is None else domain_ttls
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._counters = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'evictions': 0,
+                          'refresh_errors': 0}
+        self._load_index()
+
+    def _paths(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return base + '.body', base + '.json'
+
+    def _load_index(self):
+        """Rebuild the in-memory index from metadata files, oldest access first"""
+        if not os.path.isdir(self.directory):
+            return
+
+        loaded = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    meta = json.load(f)
+                entry = CachedPage(**meta)
+                body_path, _ = self._paths(entry.url)
+                # Body mtime is touched on every read and doubles as the LRU clock
+                loaded.append((os.path.getmtime(body_path), entry))
+            except (OSError, ValueError, TypeError):
+                continue
+
+        loaded.sort(key=lambda item: item[0])
+        for _, entry in loaded:
+            self._entries[entry.url] = entry
+            self._total_bytes += entry.size
+
+    def ttl_for(self, url):
+        """TTL for a URL, using the most specific domain override"""
+        host = (urlsplit(url).hostname or '').lower()
+        labels = host.split('.')
+        for i in range(len(labels)):
+            domain = '.'.join(labels[i:])
+            if domain in self.domain_ttls:
+                return self.domain_ttls[domain]
+        return self.default_ttl
+
+    def lookup(self, url):
+        """Return the stored entry for a URL, or None"""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.stored_at < self.ttl_for(entry.url)
+
+    def conditional_headers(self, entry):
+        """Validators to send so the server can answer 304 Not Modified"""
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def read_body(self, entry, revalidated=False):
+        """Read a stored body, or return None if it vanished from disk"""
+        body_path, _ = self._paths(entry.url)
+        try:
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            self._discard(entry.url)
+            return None
+        try:
+            os.utime(body_path)
+        except OSError:
+            # Only the page's place in the LRU order is lost
+            pass
+
+        with self._lock:
+            self._counters['revalidated' if revalidated else 'hits'] += 1
+        return body
+
+    def refresh(self, entry):
+        """Restart the TTL of an entry after a 304 response"""
+        entry.stored_at = time.time()
+        _, meta_path = self._paths(entry.url)
+        try:
+            self._write_file(meta_path, json.dumps(entry.to_dict()).encode('utf-8'))
+        except OSError as e:
+            # The body was already read; only the next fetch revalidates sooner
+            with self._lock:
+                self._counters['refresh_errors'] += 1
+            log.warning('Could not refresh cached page', extra={'fields': {'url': entry.url, 'error': str(e)}})
+
+    def store(self, url, body, etag=None, last_modified=None):
+        """Store a body and evict least recently used pages beyond the size limit"""
+        key = normalize_url(url)
+        if len(body) > self.max_bytes:
+            return
+
+        entry = CachedPage(key, len(body), time.time(), etag=etag, last_modified=last_modified)
+        body_path, meta_path = self._paths(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write_file(body_path, body)
+            self._write_file(meta_path, json.dumps(entry.to_dict()).encode('utf-8'))
+        except OSError:
+            return
+
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous.size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self._counters['stores'] += 1
+
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._total_bytes -= old_entry.size
+                self._counters['evictions'] += 1
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            self._remove_files(old_key)
+
+    def _discard(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry.size
+        self._remove_files(key)
+
+    def _remove_files(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _write_file(self, path, data):
+        # Write to a temporary file first so readers never see a partial page
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._total_bytes
+            stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+page_cache = PageCache() if PAGE_CACHE_ENABLED else None
@@ -0,0 +1,37 @@
+"""
+Selection of the HTML parser backend used by the extraction pipeline.
+
+PARSER_BACKEND names a BeautifulSoup tree builder. When it is not set,
+the C-backed lxml parser is used if it is installed and the standard
+library's pure-Python html.parser otherwise.
+"""
+import os
+
+from bs4.builder import builder_registry
+
+# Backends the pipeline can run on, fastest first
+KNOWN_BACKENDS = ['lxml', 'html5lib', 'html.parser']
+
+# Tried in order when PARSER_BACKEND is not set
+DEFAULT_BACKENDS = ['lxml', 'html.parser']
+
+
+def is_available(name):
+    return builder_registry.lookup(name) is not None
+
+
+def available_backends():
+    return [name for name in KNOWN_BACKENDS if is_available(name)]
+
+
+def resolve_backend(name=None):
+    """The configured backend, or the fastest installed default when name is empty"""
+    if not name:
+        return next(backend for backend in DEFAULT_BACKENDS if is_available(backend))
+    if name not in KNOWN_BACKENDS or not is_available(name):
+        raise ValueError(f'PARSER_BACKEND {name!r} is not available; '
+                         f'installed backends: {", ".join(available_backends())}')
+    return name
+
+
+PARSER_BACKEND = resolve_backend(os.environ.get('PARSER_BACKEND', '').strip())
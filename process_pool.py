@@ -0,0 +1,196 @@
+"""
+Process pool for the CPU-bound extraction work.
+
+Parsing and filtering a large page is pure-Python work that holds the GIL,
+so on a request thread one slow page stalls every other request of the
+web worker. With EXTRACT_POOL_WORKERS set, each call is run in one of that
+many worker processes instead. The calling thread checks out an idle
+process, sends it the task over a pipe and waits for the answer, so
+throughput scales with the number of cores.
+
+At most EXTRACT_POOL_QUEUE calls wait for an idle process; further calls
+are rejected with PoolBusy instead of piling up. A task that runs longer
+than EXTRACT_TASK_TIMEOUT seconds, for example on catastrophic regex
+backtracking, has its process killed and raises TaskTimeout. A process is
+replaced after EXTRACT_WORKER_MAX_TASKS tasks to cap memory growth.
+
+Workers are started lazily from request threads while the logging, job
+and crawl threads run, and a process forked at such a moment can inherit
+a lock another thread held, such as a logging or connection pool lock,
+and hang on it. They are therefore started by the forkserver (or spawned
+where there is none) rather than forked, unless EXTRACT_POOL_START_METHOD
+says otherwise.
+"""
+import multiprocessing
+import os
+import threading
+
+EXTRACT_POOL_WORKERS = int(os.environ.get('EXTRACT_POOL_WORKERS', 0))
+EXTRACT_POOL_QUEUE = int(os.environ.get('EXTRACT_POOL_QUEUE', 32))
+EXTRACT_TASK_TIMEOUT = float(os.environ.get('EXTRACT_TASK_TIMEOUT', 60))  # 0 waits forever
+EXTRACT_WORKER_MAX_TASKS = int(os.environ.get('EXTRACT_WORKER_MAX_TASKS', 200))
+EXTRACT_POOL_START_METHOD = os.environ.get('EXTRACT_POOL_START_METHOD') or (
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+class PoolBusy(RuntimeError):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class TaskTimeout(RuntimeError):
+    """Raised when a task exceeds the timeout and its worker is killed"""
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised when a worker process dies while running a task"""
+
+
+def _worker_main(conn):
+    """Run (func, args) tasks received on conn until the pool closes it"""
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = ('ok', func(*args))
+        except Exception as e:
+            result = ('error', e)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result or the exception could not be pickled
+            conn.send(('error', RuntimeError(f'{type(e).__name__}: {e}')))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        # Closing the pipe ends the worker's loop
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+
+class ExtractionPool:
+    """Runs functions in worker processes; with no workers they run in the calling thread"""
+
+    def __init__(self, workers=EXTRACT_POOL_WORKERS, max_queue=EXTRACT_POOL_QUEUE,
+                 timeout=EXTRACT_TASK_TIMEOUT, max_tasks=EXTRACT_WORKER_MAX_TASKS,
+                 start_method=EXTRACT_POOL_START_METHOD):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self._context = multiprocessing.get_context(start_method)
+        self._cond = threading.Condition()
+        self._idle = []
+        self._started = 0
+        self._waiting = 0
+        self._counters = {'tasks': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0,
+                          'recycled': 0, 'rejected': 0}
+
+    def call(self, func, *args):
+        """Return func(*args), computed in a worker process when the pool has workers"""
+        if self.workers <= 0:
+            return func(*args)
+
+        worker = self._checkout()
+        try:
+            worker.conn.send((func, args))
+        except (BrokenPipeError, OSError):
+            self._retire(worker, kill=True, counter='crashes')
+            raise WorkerCrashed('Extraction worker exited unexpectedly')
+        except Exception:
+            # The task could not be pickled; nothing reached the worker
+            self._checkin(worker)
+            raise
+
+        if not worker.conn.poll(self.timeout or None):
+            self._retire(worker, kill=True, counter='timeouts')
+            raise TaskTimeout(f'Extraction took longer than {self.timeout:g} seconds')
+        try:
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._retire(worker, kill=True, counter='crashes')
+            raise WorkerCrashed('Extraction worker exited unexpectedly')
+
+        worker.tasks += 1
+        if self.max_tasks and worker.tasks >= self.max_tasks:
+            self._retire(worker, counter='recycled')
+        else:
+            self._checkin(worker)
+
+        self._count('tasks')
+        if status == 'error':
+            self._count('errors')
+            raise value
+        return value
+
+    def _count(self, key):
+        with self._cond:
+            self._counters[key] += 1
+
+    def _checkout(self):
+        with self._cond:
+            if not self._idle and self._started >= self.workers and self._waiting >= self.max_queue:
+                self._counters['rejected'] += 1
+                raise PoolBusy('All extraction workers are busy')
+            self._waiting += 1
+            try:
+                while not self._idle and self._started >= self.workers:
+                    self._cond.wait()
+            finally:
+                self._waiting -= 1
+            if self._idle:
+                return self._idle.pop()
+            # Processes are started on demand, outside the lock
+            self._started += 1
+        try:
+            return _Worker(self._context)
+        except Exception:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    def _retire(self, worker, kill=False, counter=None):
+        worker.stop(kill=kill)
+        with self._cond:
+            self._started -= 1
+            if counter:
+                self._counters[counter] += 1
+            self._cond.notify()
+
+    def shutdown(self):
+        """Stop the idle workers; later calls start new ones on demand"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            worker.stop()
+
+    def stats(self):
+        with self._cond:
+            return dict(self._counters, workers=self.workers, started=self._started,
+                        idle=len(self._idle), busy=self._started - len(self._idle),
+                        waiting=self._waiting)
+
+
+extraction_pool = ExtractionPool()
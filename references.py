@@ -0,0 +1,228 @@
+"""
+Reference documents that texts are compared against again and again.
+
+Registering a document, such as an approved policy wording, stores its
+lines once, each as its original and its normalized form, on disk under
+REFERENCE_DIR. Its ID is derived from its text, so registering the same
+text again returns the same document. A worker loads a document the
+first time it is used and interns its normalized lines to integer IDs,
+keeping the ID array and the line to ID table in memory. A comparison
+against it then normalizes and interns only the other text, against the
+stored table, and diffs the two ID arrays.
+
+Loaded documents are kept in memory in LRU order, at most
+REFERENCE_MAX_LOADED of them. Documents stay on disk until they are
+deleted, or until more than REFERENCE_MAX_STORED of them are stored or
+they take more than REFERENCE_MAX_BYTES, when the least recently used go
+first; a file's modification time is its last use, for every worker. A
+worker that still has a removed document loaded drops it the next time it
+is asked for.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from regex_registry import regexes
+
+REFERENCE_DIR = os.environ.get('REFERENCE_DIR', os.path.join('cache', 'references'))
+REFERENCE_MAX_LOADED = int(os.environ.get('REFERENCE_MAX_LOADED', 32))
+REFERENCE_MAX_CHARS = int(os.environ.get('REFERENCE_MAX_CHARS', 10 * 1024 * 1024))
+REFERENCE_MAX_STORED = int(os.environ.get('REFERENCE_MAX_STORED', 1000))
+REFERENCE_MAX_BYTES = int(os.environ.get('REFERENCE_MAX_BYTES', 512 * 1024 * 1024))
+
+REFERENCE_ID_PATTERN = regexes.compile('reference_id', r'[0-9a-f]{16}')
+
+
+class ReferenceTooLarge(ValueError):
+    """Raised when a reference document has more than REFERENCE_MAX_CHARS characters"""
+
+
+def reference_id_for(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ReferenceDocument:
+    """A registered document's lines, with their interned IDs and the table that interned them"""
+
+    def __init__(self, reference_id, name, lines, created=None):
+        self.reference_id = reference_id
+        self.name = name
+        self.lines = lines
+        self.originals = [line['original'] for line in lines]
+        self.table = {}
+        self.ids = [self.table.setdefault(line['normalized'], len(self.table)) for line in lines]
+        self.created = created if created is not None else time.time()
+
+    def to_dict(self):
+        return {
+            'reference_id': self.reference_id,
+            'name': self.name,
+            'lines': len(self.lines),
+            'distinct_lines': len(self.table),
+            'created': self.created,
+        }
+
+
+class ReferenceStore:
+    """
+    Reference documents on disk, with the most recently used ones loaded in
+    memory. Bounded by count and by disk use.
+    """
+
+    def __init__(self, directory=REFERENCE_DIR, max_loaded=REFERENCE_MAX_LOADED, max_chars=REFERENCE_MAX_CHARS,
+                 max_stored=REFERENCE_MAX_STORED, max_bytes=REFERENCE_MAX_BYTES):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.max_chars = max_chars
+        self.max_stored = max_stored
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        self._counters = {'registered': 0, 'hits': 0, 'loads': 0, 'misses': 0,
+                          'evictions': 0, 'deleted': 0, 'disk_evictions': 0}
+
+    def _path(self, reference_id):
+        return os.path.join(self.directory, f'{reference_id}.json')
+
+    def add(self, text, lines, name=None):
+        """
+        Register text, already split into normalize_lines() form as lines,
+        and return its ReferenceDocument.
+        """
+        if len(text) > self.max_chars:
+            raise ReferenceTooLarge(f'Reference document is longer than {self.max_chars} characters')
+
+        reference_id = reference_id_for(text)
+        if os.path.exists(self._path(reference_id)):
+            existing = self.get(reference_id)
+            if existing is not None:
+                return existing
+
+        reference = ReferenceDocument(reference_id, name, lines)
+        state = {
+            'reference_id': reference_id,
+            'name': name,
+            'created': reference.created,
+            'lines': [[line['original'], line['normalized']] for line in lines],
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(reference_id)
+        # Write to a temporary file first so other workers never load a partial document
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._counters['registered'] += 1
+            self._keep(reference)
+        self._prune()
+        return reference
+
+    def get(self, reference_id):
+        """The document with this ID, loaded from disk if need be, or None if it is not registered"""
+        if not REFERENCE_ID_PATTERN.fullmatch(reference_id or ''):
+            return None
+        path = self._path(reference_id)
+        try:
+            # The file's modification time is the last use, for every worker
+            os.utime(path)
+            stored = True
+        except OSError:
+            stored = False
+        with self._lock:
+            reference = self._loaded.get(reference_id)
+            # A document another worker deleted or removed is not used any more
+            if reference is not None and stored:
+                self._loaded.move_to_end(reference_id)
+                self._counters['hits'] += 1
+                return reference
+            self._loaded.pop(reference_id, None)
+            if not stored:
+                self._counters['misses'] += 1
+                return None
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters['misses'] += 1
+            return None
+        lines = [{'original': original, 'normalized': normalized} for original, normalized in state['lines']]
+        reference = ReferenceDocument(reference_id, state.get('name'), lines, state.get('created'))
+
+        with self._lock:
+            self._counters['loads'] += 1
+            # Another thread may have loaded it meanwhile; keep the first copy
+            return self._keep(reference)
+
+    def _keep(self, reference):
+        reference = self._loaded.setdefault(reference.reference_id, reference)
+        self._loaded.move_to_end(reference.reference_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+            self._counters['evictions'] += 1
+        return reference
+
+    def _stored(self):
+        """(last used, size, path) of each stored document, least recently used first"""
+        stored = []
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return stored
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                status = entry.stat()
+            except OSError:
+                continue
+            stored.append((status.st_mtime, status.st_size, entry.path))
+        stored.sort()
+        return stored
+
+    def _prune(self):
+        # The least recently used documents beyond the limits go first
+        stored = self._stored()
+        total_bytes = sum(size for _, size, _ in stored)
+        while stored and (len(stored) > self.max_stored or total_bytes > self.max_bytes):
+            _, size, path = stored.pop(0)
+            total_bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                # Another worker removed it first
+                continue
+            with self._lock:
+                self._loaded.pop(os.path.basename(path)[:-len('.json')], None)
+                self._counters['disk_evictions'] += 1
+
+    def delete(self, reference_id):
+        """Forget a document; returns False if it was not registered"""
+        if not REFERENCE_ID_PATTERN.fullmatch(reference_id or ''):
+            return False
+        with self._lock:
+            self._loaded.pop(reference_id, None)
+        try:
+            os.remove(self._path(reference_id))
+        except OSError:
+            return False
+        with self._lock:
+            self._counters['deleted'] += 1
+        return True
+
+    def stats(self):
+        stored = self._stored()
+        with self._lock:
+            loaded_lines = sum(len(reference.lines) for reference in self._loaded.values())
+            return dict(self._counters, stored=len(stored), bytes=sum(size for _, size, _ in stored),
+                        loaded=len(self._loaded), loaded_lines=loaded_lines, max_loaded=self.max_loaded,
+                        max_stored=self.max_stored, max_bytes=self.max_bytes, directory=self.directory)
+
+
+reference_store = ReferenceStore()
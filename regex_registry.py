@@ -0,0 +1,133 @@
+"""
+Named, precompiled regular expressions with usage statistics.
+
+Every pattern of the extraction pipeline is registered here under a name
+and compiled once, when the module that defines it is imported, instead
+of going through the re module's bounded pattern cache on each call.
+
+With REGEX_STATS_ENABLED set, each registered pattern also counts its
+calls and the time spent in them. The wrapper costs about a microsecond
+per call, several times a typical match on a short line, so it is off by
+default and the registry hands out the plain compiled patterns.
+"""
+import os
+import re
+import threading
+import time
+
+REGEX_STATS_ENABLED = os.environ.get('REGEX_STATS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+
+class TrackedPattern:
+    """A compiled pattern that reports every call to its registry"""
+
+    __slots__ = ('name', 'compiled', '_registry')
+
+    def __init__(self, name, compiled, registry):
+        self.name = name
+        self.compiled = compiled
+        self._registry = registry
+
+    @property
+    def pattern(self):
+        return self.compiled.pattern
+
+    @property
+    def flags(self):
+        return self.compiled.flags
+
+    def _call(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._registry.record(self.name, time.perf_counter() - started)
+
+    def search(self, string, *args):
+        return self._call(self.compiled.search, string, *args)
+
+    def match(self, string, *args):
+        return self._call(self.compiled.match, string, *args)
+
+    def fullmatch(self, string, *args):
+        return self._call(self.compiled.fullmatch, string, *args)
+
+    def findall(self, string, *args):
+        return self._call(self.compiled.findall, string, *args)
+
+    def finditer(self, string, *args):
+        # Only the call is timed; matches are found while the iterator is consumed
+        return self._call(self.compiled.finditer, string, *args)
+
+    def split(self, string, maxsplit=0):
+        return self._call(self.compiled.split, string, maxsplit)
+
+    def sub(self, repl, string, count=0):
+        return self._call(self.compiled.sub, repl, string, count)
+
+
+class RegexRegistry:
+    """Thread-safe store of named patterns and their call counters"""
+
+    def __init__(self, enabled=REGEX_STATS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._patterns = {}
+        self._calls = {}
+        self._seconds = {}
+
+    def compile(self, name, source, flags=0):
+        """Compile and register a pattern; registering the same pattern twice returns the first one"""
+        with self._lock:
+            existing = self._patterns.get(name)
+            if existing is not None:
+                if existing.pattern != source or existing.flags != re.compile(source, flags).flags:
+                    raise ValueError(f'Regex {name!r} is already registered with a different pattern')
+                return existing
+            compiled = re.compile(source, flags)
+            if self.enabled:
+                compiled = TrackedPattern(name, compiled, self)
+            self._patterns[name] = compiled
+            self._calls[name] = 0
+            self._seconds[name] = 0.0
+            return compiled
+
+    def compile_all(self, name, sources, flags=0):
+        """Register a list of patterns as name[0], name[1], ..."""
+        return [self.compile(f'{name}[{i}]', source, flags) for i, source in enumerate(sources)]
+
+    def get(self, name):
+        return self._patterns[name]
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._calls[name] += 1
+            self._seconds[name] += seconds
+
+    def reset(self):
+        with self._lock:
+            for name in self._calls:
+                self._calls[name] = 0
+                self._seconds[name] = 0.0
+
+    def stats(self):
+        """Per-pattern counters, most expensive first; all zero unless stats are enabled"""
+        with self._lock:
+            rows = [{
+                'name': name,
+                'pattern': compiled.pattern if isinstance(compiled.pattern, str) else repr(compiled.pattern),
+                'calls': self._calls[name],
+                'total_ms': round(self._seconds[name] * 1000, 3),
+                'mean_us': round(self._seconds[name] / self._calls[name] * 1e6, 3) if self._calls[name] else 0.0,
+            } for name, compiled in self._patterns.items()]
+        rows.sort(key=lambda row: (-row['total_ms'], row['name']))
+        return {
+            'enabled': self.enabled,
+            'patterns': len(rows),
+            'calls': sum(row['calls'] for row in rows),
+            'total_ms': round(sum(row['total_ms'] for row in rows), 3),
+            'regexes': rows,
+        }
+
+
+regexes = RegexRegistry()
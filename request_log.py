@@ -0,0 +1,214 @@
+"""
+Structured logging that stays off the request path.
+
+Records are written as one JSON object per line. The handler attached to
+the app's logger only puts each record on a bounded queue, and a
+QueueListener thread formats and writes it, so a slow stderr never holds
+up a request. When the queue is full, records are dropped and counted
+instead of waited for.
+
+The listener thread is started by the first record a process logs, not at
+import: a server that imports the app and then forks its workers, such as
+gunicorn --preload, would otherwise leave every worker with a queue that
+no thread empties. A forked process gets a fresh queue and starts its own
+listener, and the records still queued are written out when it exits.
+
+Every request gets an ID, taken from its X-Request-ID header or newly
+made, which is added to the records logged on its thread. Payload sizes
+are always logged. Payload bodies are logged only for a sampled fraction
+of requests (LOG_PAYLOAD_SAMPLE_RATE), at LOG_PAYLOAD_LEVEL and cut to
+LOG_PAYLOAD_MAX_CHARS.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import reprlib
+import sys
+import threading
+import time
+import uuid
+
+from regex_registry import regexes
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0))
+LOG_PAYLOAD_LEVEL = os.environ.get('LOG_PAYLOAD_LEVEL', 'DEBUG').upper()
+LOG_PAYLOAD_MAX_CHARS = int(os.environ.get('LOG_PAYLOAD_MAX_CHARS', 500))
+
+# Request IDs taken from clients must be short and safe to log as is
+REQUEST_ID_PATTERN = regexes.compile('request_id', r'[A-Za-z0-9._-]{1,64}')
+
+logger = logging.getLogger('webscraper')
+
+_local = threading.local()
+_lock = threading.Lock()
+_counters = {'dropped': 0, 'payloads_logged': 0}
+_handler = None
+_output = None
+_listener = None
+_listener_lock = threading.Lock()
+
+# Bounded repr() of payloads that are not strings
+_payload_repr = reprlib.Repr()
+_payload_repr.maxstring = LOG_PAYLOAD_MAX_CHARS
+_payload_repr.maxother = LOG_PAYLOAD_MAX_CHARS
+_payload_repr.maxlist = _payload_repr.maxdict = 10
+_payload_repr.maxlevel = 3
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request ID and the record's fields"""
+
+    def format(self, record):
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the ID of the request handled on the logging thread to each record"""
+
+    def filter(self, record):
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = getattr(_local, 'request_id', None)
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without blocking, dropping them when the queue is full"""
+
+    def prepare(self, record):
+        # The message and traceback are rendered now, while their arguments
+        # are still current; the JSON is built on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if _listener is None:
+            _start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                _counters['dropped'] += 1
+
+
+def configure_logging(level=LOG_LEVEL, stream=None):
+    """Send the app's records through a background thread to stream (stderr by default)"""
+    global _handler, _output
+    if _handler is not None:
+        return
+
+    _output = logging.StreamHandler(stream or sys.stderr)
+    _output.setFormatter(JsonFormatter())
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _handler.addFilter(RequestIdFilter())
+
+    logger.addHandler(_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def _start_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = logging.handlers.QueueListener(_handler.queue, _output)
+            _listener.start()
+
+
+def stop_listener():
+    """Write out the records still queued and stop this process's listener thread"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _after_fork_in_child():
+    # The listener thread is not inherited, and it may have held the queue's
+    # lock at the fork, so the child starts over with its own queue
+    global _lock, _listener_lock, _listener
+    _lock = threading.Lock()
+    _listener_lock = threading.Lock()
+    _listener = None
+    if _handler is not None:
+        _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(stop_listener)
+
+
+def begin_request(request_id=None):
+    """Start a request on this thread and return its ID, the client's one if it is usable"""
+    if not request_id or not REQUEST_ID_PATTERN.fullmatch(request_id):
+        request_id = uuid.uuid4().hex
+    _local.request_id = request_id
+    _local.sampled = LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    return request_id
+
+
+def end_request():
+    _local.request_id = None
+    _local.sampled = False
+
+
+def payload_size(payload):
+    """Characters of a string, items of a collection, characters of the bounded repr() of anything else"""
+    if payload is None:
+        return 0
+    try:
+        return len(payload)
+    except TypeError:
+        return len(_payload_repr.repr(payload))
+
+
+def log_payloads(log, message, fields=None, **payloads):
+    """
+    Log message with fields and the size of each payload, and, for sampled
+    requests, a second record with the payloads cut to LOG_PAYLOAD_MAX_CHARS.
+    """
+    sizes = {f'{name}_size': payload_size(payload) for name, payload in payloads.items()}
+    log.info(message, extra={'fields': dict(fields or {}, **sizes)})
+
+    level = logging.getLevelName(LOG_PAYLOAD_LEVEL)
+    if not getattr(_local, 'sampled', False) or not log.isEnabledFor(level):
+        return
+    bodies = {}
+    for name, payload in payloads.items():
+        body = payload if isinstance(payload, str) else _payload_repr.repr(payload)
+        bodies[name] = body[:LOG_PAYLOAD_MAX_CHARS]
+    log.log(level, f'{message} (payload)', extra={'fields': bodies})
+    with _lock:
+        _counters['payloads_logged'] += 1
+
+
+def log_stats():
+    with _lock:
+        queued = _handler.queue.qsize() if _handler is not None else 0
+        return dict(_counters, queued=queued, level=logging.getLevelName(logger.level),
+                    payload_sample_rate=LOG_PAYLOAD_SAMPLE_RATE)
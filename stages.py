@@ -0,0 +1,190 @@
+"""
+Named stages of the extraction pipeline: their latency and the memory they use.
+
+A pipeline run is wrapped in track(), and the pipeline calls
+mark_stage(name) each time it moves on to the next stage. Other work, such
+as the fetch or one policy field extractor, is wrapped in timed(name).
+
+Every stage is timed with perf_counter and its duration is added to a
+fixed-bucket histogram of that stage. While a request is being handled
+(begin_request() to end_request()), the durations measured on its thread
+are also collected for its Server-Timing header. /metrics exports the
+histograms as extract_stage_duration_seconds.
+
+For a sampled fraction of runs (EXTRACT_MEMORY_SAMPLE_RATE), tracemalloc
+traces the run, and the peak traced memory of each stage and of the whole
+run is recorded. tracemalloc slows allocation down while it traces, so only
+one run is traced at a time. Allocations that other threads make during
+that run are counted as well.
+"""
+import os
+import random
+import threading
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+
+from metrics import histogram_samples, metrics
+
+EXTRACT_MEMORY_SAMPLE_RATE = float(os.environ.get('EXTRACT_MEMORY_SAMPLE_RATE', 0))
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+STAGE_TIMING_BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageTracker:
+    """Thread-safe latency histograms and sampled peak memory per pipeline stage"""
+
+    def __init__(self, sample_rate=EXTRACT_MEMORY_SAMPLE_RATE, buckets_ms=STAGE_TIMING_BUCKETS_MS):
+        self.sample_rate = sample_rate
+        self.buckets_ms = tuple(buckets_ms)
+        self._local = threading.local()
+        self._trace_lock = threading.Lock()  # Held by the one run being traced
+        self._lock = threading.Lock()
+        self._runs = {}
+        self._stages = {}
+        self._timings = {}
+
+    def begin_request(self):
+        """Start collecting the stage durations measured on this thread"""
+        self._local.request = []
+
+    def end_request(self):
+        """Stop collecting and return the seconds spent in each stage, in the order they ran"""
+        timings = getattr(self._local, 'request', None)
+        self._local.request = None
+
+        # A stage that ran more than once reports its total duration
+        totals = {}
+        for name, seconds in timings or ():
+            totals[name] = totals.get(name, 0) + seconds
+        return totals
+
+    @contextmanager
+    def timed(self, name):
+        """Time the block as the stage name"""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self._observe(name, perf_counter() - started)
+
+    @contextmanager
+    def track(self, name):
+        """Run the block as one pipeline run, timing its stages and tracing it if it is sampled"""
+        if getattr(self._local, 'run', None) is not None:
+            yield
+            return
+
+        traced = self._sampled()
+        if traced:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        run = self._local.run = {'stage': None, 'started': 0, 'peak': 0, 'traced': traced}
+        try:
+            yield
+        finally:
+            self._end_stage(run)
+            self._local.run = None
+            if traced:
+                self._record(self._runs, name, run['peak'])
+                if started_tracing:
+                    tracemalloc.stop()
+                self._trace_lock.release()
+
+    def _sampled(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        return self._trace_lock.acquire(blocking=False)
+
+    def mark_stage(self, name):
+        """End the current stage of the run on this thread, if any, and start name"""
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            self._end_stage(run)
+            run['stage'] = name
+            run['started'] = perf_counter()
+
+    def _end_stage(self, run):
+        if run['stage'] is not None:
+            self._observe(run['stage'], perf_counter() - run['started'])
+        if run['traced']:
+            peak = tracemalloc.get_traced_memory()[1]
+            run['peak'] = max(run['peak'], peak)
+            if run['stage'] is not None:
+                self._record(self._stages, run['stage'], peak)
+            tracemalloc.reset_peak()
+
+    def _observe(self, name, seconds):
+        timings = getattr(self._local, 'request', None)
+        if timings is not None:
+            timings.append((name, seconds))
+
+        bucket = bisect_left(self.buckets_ms, seconds * 1000)
+        with self._lock:
+            histogram = self._timings.get(name)
+            if histogram is None:
+                # A count per bucket, one for durations above the last bound, then the total seconds
+                histogram = self._timings[name] = [0] * (len(self.buckets_ms) + 1) + [0.0]
+            histogram[bucket] += 1
+            histogram[-1] += seconds
+
+    def _record(self, table, name, peak):
+        with self._lock:
+            samples, max_peak, total = table.get(name, (0, 0, 0))
+            table[name] = (samples + 1, max(max_peak, peak), total + peak)
+
+    def timing_snapshot(self):
+        """Cumulative latency histogram of every stage, in the Prometheus bucket layout"""
+        with self._lock:
+            timings = {name: list(histogram) for name, histogram in self._timings.items()}
+
+        stages = {}
+        for name, histogram in timings.items():
+            counts, total = histogram[:-1], histogram[-1]
+            buckets, cumulative = {}, 0
+            for bound, count in zip(self.buckets_ms + ('+Inf',), counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            stages[name] = {'count': cumulative, 'total_ms': round(total * 1000, 3),
+                            'mean_ms': round(total * 1000 / cumulative, 3) if cumulative else 0,
+                            'buckets_ms': buckets}
+        return {'stages': stages}
+
+    def prometheus_samples(self):
+        """The latency histograms as extract_stage_duration_seconds, in the Prometheus text format"""
+        with self._lock:
+            timings = {name: list(histogram) for name, histogram in self._timings.items()}
+
+        name = 'extract_stage_duration_seconds'
+        buckets = tuple(bound / 1000 for bound in self.buckets_ms)
+        lines = [f'# HELP {name} Latency of each extraction stage, fetch and policy field extractor',
+                 f'# TYPE {name} histogram']
+        for stage in sorted(timings):
+            histogram = timings[stage]
+            lines.extend(histogram_samples(name, [('stage', stage)], buckets, histogram[:-1], histogram[-1]))
+        return lines
+
+    def snapshot(self):
+        def rows(table):
+            return {name: {'samples': samples, 'peak_max_bytes': max_peak,
+                           'peak_mean_bytes': total // samples}
+                    for name, (samples, max_peak, total) in table.items()}
+
+        with self._lock:
+            return {'sample_rate': self.sample_rate, 'runs': rows(self._runs),
+                    'stages': rows(self._stages)}
+
+
+def server_timing(totals):
+    """Server-Timing header value for the seconds spent in each stage"""
+    return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in totals.items())
+
+
+stage_tracker = StageTracker()
+mark_stage = stage_tracker.mark_stage
+timed = stage_tracker.timed
+metrics.add_collector(stage_tracker.prometheus_samples)
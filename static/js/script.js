@@ -147,45 +147,13 @@ compareBtn.addEventListener('click', async () => {
     compareBtn.innerHTML = '<span class="loading"></span>Comparing...';
 
     try {
-        console.log('=== SENDING COMPARISON REQUEST ===');
         console.log('Website content length:', websiteContent.length);
         console.log('File content length:', fileContent.length);
         
-        const requestData = { 
-            text1: websiteContent, 
-            text2: fileContent 
-        };
-        
-        console.log('Request data:', requestData);
-        
-        const response = await fetch('/compare_texts', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(requestData)
-        });
-
-        console.log('Response status:', response.status);
-        console.log('Response headers:', response.headers);
-        
-        if (!response.ok) {
-            console.error('HTTP Error:', response.status, response.statusText);
-            const errorText = await response.text();
-            console.error('Error response:', errorText);
-            showError(diffContent, `Server error: ${response.status} - ${response.statusText}`);
-            return;
-        }
-
-        const data = await response.json();
-        console.log('Response data:', data);
-        
-        if (data.error) {
-            console.error('Server error:', data.error);
-            showError(diffContent, data.error);
-        } else {
-            displayDifferences(data);
-        }
+        // The server keeps the diff; its hunks are fetched a page at a time
+        const comparison = await createComparison(websiteContent, fileContent);
+        console.log('Comparison summary:', comparison);
+        await displayDifferences(comparison);
     } catch (error) {
         console.error('Error comparing texts:', error);
         console.error('Error details:', error.message, error.stack);
@@ -224,7 +192,7 @@ function showSuccess(element, message) {
     }, 3000);
 }
 
-function displayDifferences(data) {
+async function displayDifferences(comparison) {
     // Show results with smooth slide down animation
     results.style.display = 'block';
     results.style.opacity = '0';
@@ -245,7 +213,9 @@ function displayDifferences(data) {
         });
     }, 200);
     
-    if (data.identical) {
+    if (comparison.identical) {
+        // Identical texts have no hunks, so they are shown from the texts already loaded here
+        const rows = { left: renderEqualLines(websiteContent), right: renderEqualLines(fileContent) };
         // Even for identical texts, show side-by-side comparison like Diffchecker
         diffContent.innerHTML = `
             <div class="diff-container">
@@ -261,13 +231,13 @@ function displayDifferences(data) {
                 <div class="diff-content-wrapper">
                     <div class="diff-left">
                         <div class="diff-text-content" id="diffWebsiteContent">
-                            ${alignMatchingWords(websiteContent, fileContent, []).left}
+                            ${rows.left}
                         </div>
                     </div>
                     
                     <div class="diff-right">
                         <div class="diff-text-content" id="diffFileContent">
-                            ${alignMatchingWords(websiteContent, fileContent, []).right}
+                            ${rows.right}
                         </div>
                     </div>
                 </div>
@@ -276,27 +246,6 @@ function displayDifferences(data) {
         return;
     }
     
-    // Debug: Log differences to console
-    console.log('Full data received:', data);
-    console.log('Differences found:', data.simple_diffs);
-    console.log('Total differences:', data.total_differences);
-    
-    // Check if simple_diffs exists and is an array
-    if (!data.simple_diffs || !Array.isArray(data.simple_diffs)) {
-        console.error('simple_diffs is not an array:', data.simple_diffs);
-        showError(diffContent, 'Error: Invalid data format received from server');
-        return;
-    }
-    
-    console.log('Removed items:', data.simple_diffs.filter(d => d.type === 'removed'));
-    console.log('Added items:', data.simple_diffs.filter(d => d.type === 'added'));
-    
-    // Force highlight first few differences for testing
-    if (data.simple_diffs.length > 0) {
-        console.log('First removed item:', data.simple_diffs.find(d => d.type === 'removed'));
-        console.log('First added item:', data.simple_diffs.find(d => d.type === 'added'));
-    }
-    
     // Create layout like Diffchecker with proper highlighting and view options
     let html = `
         <div class="diff-container">
@@ -313,8 +262,8 @@ function displayDifferences(data) {
             <div class="word-legend">
                 <div class="legend-items">
                     <div class="legend-item">
-                        <span class="legend-color matched-word">✓ Word</span>
-                        <span class="legend-text">Single words that match exactly</span>
+                        <span class="legend-color exact-match-line">✓ Line</span>
+                        <span class="legend-text">Lines that match exactly</span>
                     </div>
                     <div class="legend-item">
                         <span class="legend-color word-highlight-removed">❌ Removed</span>
@@ -333,21 +282,19 @@ function displayDifferences(data) {
             
             <div class="diff-content-wrapper">
                 <div class="diff-left">
-                    <div class="diff-text-content" id="diffWebsiteContent">
-                        ${alignMatchingWords(websiteContent, fileContent, data.simple_diffs).left}
-                    </div>
+                    <div class="diff-text-content" id="diffWebsiteContent"></div>
                 </div>
                 
                 <div class="diff-right">
-                    <div class="diff-text-content" id="diffFileContent">
-                        ${alignMatchingWords(websiteContent, fileContent, data.simple_diffs).right}
-                    </div>
+                    <div class="diff-text-content" id="diffFileContent"></div>
                 </div>
             </div>
+            ${moreHunksButton()}
         </div>
     `;
     
     diffContent.innerHTML = html;
+    await showHunks(diffContent, comparison);
     
     // Ensure independent scrolling by removing any potential synchronization
     setTimeout(() => {
@@ -388,12 +335,6 @@ function formatExtractedContent(content, type) {
     }).join('');
 }
 
-// Helper function to generate line numbers
-function generateLineNumbers(content) {
-    const lines = content.split('\n');
-    return lines.map((_, index) => `<div class="line-number">${index + 1}</div>`).join('');
-}
-
 // Helper function to generate content with inline line numbers
 function generateContentWithInlineLineNumbers(content1, content2, differences, data = null) {
     const lines1 = content1.split('\n');
@@ -489,39 +430,6 @@ function generateContentWithInlineLineNumbers(content1, content2, differences, d
     return { left: result1, right: result2 };
 }
 
-// Helper function to format diff content with highlighting
-function formatDiffContent(content, differences, type) {
-    const lines = content.split('\n');
-    let formattedLines = [];
-    
-    lines.forEach((line, index) => {
-        let lineClass = 'diff-line';
-        let lineContent = line || '&nbsp;'; // Handle empty lines
-        
-        // Check if this line has differences
-        const hasDiff = differences.some(diff => {
-            if (type === 'website' && diff.website) {
-                return line.toLowerCase().trim() === diff.website.toLowerCase().trim();
-            } else if (type === 'file' && diff.file) {
-                return line.toLowerCase().trim() === diff.file.toLowerCase().trim();
-            }
-            return false;
-        });
-        
-        if (hasDiff) {
-            if (type === 'website') {
-                lineClass += ' diff-removed';
-            } else {
-                lineClass += ' diff-added';
-            }
-        }
-        
-        formattedLines.push(`<div class="${lineClass}">${escapeHtml(lineContent)}</div>`);
-    });
-    
-    return formattedLines.join('');
-}
-
 // Helper function to format website content with line numbers (non-scrollable)
 function formatWebsiteContentWithLineNumbers(content) {
     const lines = content.split('\n');
@@ -611,165 +519,6 @@ function escapeRegExp(string) {
     return string.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
 }
 
-// Enhanced function to format independent content for diff view with better highlighting
-function formatIndependentContent(content1, content2, differences, data = null) {
-    // Validate inputs
-    if (!content1 || !content2) {
-        console.error('Invalid content provided to formatIndependentContent');
-        return { left: '', right: '' };
-    }
-    
-    if (!differences || !Array.isArray(differences)) {
-        console.error('Invalid differences provided to formatIndependentContent:', differences);
-        return { left: '', right: '' };
-    }
-    
-    const lines1 = content1.split('\n');
-    const lines2 = content2.split('\n');
-    
-    let result1 = '';
-    let result2 = '';
-    
-    // Create a map of differences for faster lookup
-    const removedDiffs = new Map();
-    const addedDiffs = new Map();
-    
-    differences.forEach(diff => {
-        if (diff.type === 'removed' && diff.website) {
-            const key = diff.website.toLowerCase().trim();
-            removedDiffs.set(key, diff.website);
-        } else if (diff.type === 'added' && diff.file) {
-            const key = diff.file.toLowerCase().trim();
-            addedDiffs.set(key, diff.file);
-        }
-    });
-    
-    // Format left side (website content) - all lines independently
-    lines1.forEach((line, index) => {
-        let lineClass1 = 'website-line';
-        let lineContent1 = line || '';
-        
-        // Check if this line has differences with improved matching
-        let hasDiff1 = false;
-        let matchedDiff1 = null;
-        
-        if (lineContent1.trim()) {
-            const lineKey = lineContent1.toLowerCase().trim();
-            
-            // Check for exact match first
-            if (removedDiffs.has(lineKey)) {
-                hasDiff1 = true;
-                matchedDiff1 = removedDiffs.get(lineKey);
-            } else {
-                // Check for partial matches
-                for (const [key, value] of removedDiffs) {
-                    if (lineKey.includes(key) || key.includes(lineKey)) {
-                        hasDiff1 = true;
-                        matchedDiff1 = value;
-                        break;
-                    }
-                }
-            }
-        }
-        
-        if (hasDiff1) {
-            lineClass1 += ' diff-highlight-removed';
-            // Only add word-level highlighting if the line is significantly different
-            if (matchedDiff1 && lineContent1.toLowerCase().trim() !== matchedDiff1.toLowerCase().trim()) {
-                lineContent1 = highlightWordsInLine(lineContent1, matchedDiff1, 'removed');
-            }
-        }
-        
-        result1 += `<div class="${lineClass1}">${escapeHtml(lineContent1)}</div>`;
-    });
-    
-    // Format right side (file content) - all lines independently
-    lines2.forEach((line, index) => {
-        let lineClass2 = 'website-line';
-        let lineContent2 = line || '';
-        
-        // Check if this line has differences with improved matching
-        let hasDiff2 = false;
-        let matchedDiff2 = null;
-        
-        if (lineContent2.trim()) {
-            const lineKey = lineContent2.toLowerCase().trim();
-            
-            // Check for exact match first
-            if (addedDiffs.has(lineKey)) {
-                hasDiff2 = true;
-                matchedDiff2 = addedDiffs.get(lineKey);
-            } else {
-                // Check for partial matches
-                for (const [key, value] of addedDiffs) {
-                    if (lineKey.includes(key) || key.includes(lineKey)) {
-                        hasDiff2 = true;
-                        matchedDiff2 = value;
-                        break;
-                    }
-                }
-            }
-        }
-        
-        if (hasDiff2) {
-            lineClass2 += ' diff-highlight-added';
-            // Only add word-level highlighting if the line is significantly different
-            if (matchedDiff2 && lineContent2.toLowerCase().trim() !== matchedDiff2.toLowerCase().trim()) {
-                lineContent2 = highlightWordsInLine(lineContent2, matchedDiff2, 'added');
-            }
-        }
-        
-        result2 += `<div class="${lineClass2}">${escapeHtml(lineContent2)}</div>`;
-    });
-    
-    return { left: result1, right: result2 };
-}
-
-// Enhanced function to highlight words within a line - improved to highlight meaningful phrases
-function highlightWordsInLine(lineContent, diffContent, type) {
-    if (!lineContent || !diffContent) return escapeHtml(lineContent);
-    
-    // Instead of highlighting individual words, highlight the entire line or meaningful phrases
-    // This prevents the cluttered individual word highlighting
-    
-    // Check if the line content is significantly different from diff content
-    const lineWords = lineContent.toLowerCase().split(/\s+/).filter(w => w.length > 2);
-    const diffWords = diffContent.toLowerCase().split(/\s+/).filter(w => w.length > 2);
-    
-    // Calculate similarity
-    const commonWords = lineWords.filter(word => diffWords.includes(word));
-    const similarity = commonWords.length / Math.max(lineWords.length, diffWords.length);
-    
-    // If similarity is low (less than 50%), highlight the entire line
-    if (similarity < 0.5) {
-        const highlightClass = type === 'removed' ? 'word-highlight-removed' : 'word-highlight-added';
-        return `<span class="${highlightClass}">${escapeHtml(lineContent)}</span>`;
-    }
-    
-    // If similarity is high, try to highlight only the different parts
-    if (similarity >= 0.5) {
-        // Find words that are different
-        const differentWords = lineWords.filter(word => !diffWords.includes(word));
-        
-        if (differentWords.length > 0) {
-            let highlightedContent = escapeHtml(lineContent);
-            const highlightClass = type === 'removed' ? 'word-highlight-removed' : 'word-highlight-added';
-            
-            // Highlight only the different words
-            differentWords.forEach(word => {
-                const escapedWord = escapeRegExp(word);
-                const regex = new RegExp(`\\b${escapedWord}\\b`, 'gi');
-                highlightedContent = highlightedContent.replace(regex, `<span class="${highlightClass}">$&</span>`);
-            });
-            
-            return highlightedContent;
-        }
-    }
-    
-    // If no significant differences, return escaped original content
-    return escapeHtml(lineContent);
-}
-
 // Helper function to escape HTML
 function escapeHtml(text) {
     const div = document.createElement('div');
@@ -777,210 +526,128 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
-// Function to align matching words side by side - Enhanced for line-by-line alignment
-function alignMatchingWords(content1, content2, differences) {
-    const lines1 = content1.split('\n');
-    const lines2 = content2.split('\n');
-    
-    let alignedResult1 = '';
-    let alignedResult2 = '';
-    
-    // Create maps for faster lookup of differences
-    const removedDiffs = new Map();
-    const addedDiffs = new Map();
-    
-    if (differences && Array.isArray(differences)) {
-        differences.forEach(diff => {
-            if (diff.type === 'removed' && diff.website) {
-                const key = diff.website.toLowerCase().trim();
-                removedDiffs.set(key, diff.website);
-            } else if (diff.type === 'added' && diff.file) {
-                const key = diff.file.toLowerCase().trim();
-                addedDiffs.set(key, diff.file);
-            }
-        });
-    }
-    
-    // Find all matching phrases and words first (used for global highlighting)
-    const matchingData = findMatchingPhrases(lines1, lines2);
-    
-    // Process each line with enhanced alignment
-    const maxLines = Math.max(lines1.length, lines2.length);
-    
-    for (let i = 0; i < maxLines; i++) {
-        const line1 = lines1[i] || '';
-        const line2 = lines2[i] || '';
-        
-        // Check for exact line matches first
-        if (line1.trim() && line2.trim() && line1.toLowerCase().trim() === line2.toLowerCase().trim()) {
-            // Exact line match - highlight the entire line
-            alignedResult1 += `<div class="exact-match-line">${escapeHtml(line1)}</div>`;
-            alignedResult2 += `<div class="exact-match-line">${escapeHtml(line2)}</div>`;
-        } else if (line1.trim() && line2.trim()) {
-            // Partial match - align words within lines
-            const aligned = alignWordsInLines(line1, line2, removedDiffs, addedDiffs, matchingData);
-            alignedResult1 += `<div class="aligned-line">${aligned.left}</div>`;
-            alignedResult2 += `<div class="aligned-line">${aligned.right}</div>`;
-        } else {
-            // Handle lines that don't have matches
-            const lineClass1 = line1.trim() ? 'website-line diff-highlight-removed' : 'website-line empty-line';
-            const lineClass2 = line2.trim() ? 'website-line diff-highlight-added' : 'website-line empty-line';
-            
-            alignedResult1 += `<div class="${lineClass1}">${escapeHtml(line1)}</div>`;
-            alignedResult2 += `<div class="${lineClass2}">${escapeHtml(line2)}</div>`;
-        }
+// Store a comparison of two texts on the server and return its summary
+async function createComparison(text1, text2) {
+    const response = await fetch('/comparisons', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ text1: text1, text2: text2 })
+    });
+    const data = await response.json();
+    if (!response.ok || data.error) {
+        throw new Error(data.error || `Server error: ${response.status} - ${response.statusText}`);
     }
-    
-    return { left: alignedResult1, right: alignedResult2 };
+    return data;
 }
 
-// Function to find matching phrases between two sets of lines - Improved
-function findMatchingPhrases(lines1, lines2) {
-    const matchingPhrases = new Set();
-    const matchingWords = new Set();
-    
-    // Find common words and phrases
-    lines1.forEach(line1 => {
-        if (!line1.trim()) return;
-        
-        const words1 = line1.toLowerCase().split(/\s+/).filter(w => w.length > 1);
+// Helper function for the button that loads the next page of hunks
+function moreHunksButton() {
+    return '<div style="text-align: center; margin-top: 20px;"><button class="copy-btn more-hunks-btn" style="display: none;">Show more differences</button></div>';
+}
+
+// Fill the two panels in container with the first page of a comparison's hunks;
+// the button below them fetches the next page from the cursor the last one returned
+async function showHunks(container, comparison) {
+    const [left, right] = container.querySelectorAll('.diff-text-content');
+    const moreButton = container.querySelector('.more-hunks-btn');
+    const position = { website: 0, file: 0 };
+    let cursor = 0;
+    
+    async function loadPage() {
+        const response = await fetch(`${comparison.hunks_url}?cursor=${cursor}`);
+        const page = await response.json();
+        if (!response.ok || page.error) {
+            throw new Error(page.error || `Server error: ${response.status} - ${response.statusText}`);
+        }
         
-        lines2.forEach(line2 => {
-            if (!line2.trim()) return;
-            
-            const words2 = line2.toLowerCase().split(/\s+/).filter(w => w.length > 1);
-            
-            // Find matching single words first
-            words1.forEach(word1 => {
-                if (words2.includes(word1)) {
-                    matchingWords.add(word1);
-                }
-            });
-            
-            // Find matching phrases of 2 or more words
-            for (let i = 0; i < words1.length - 1; i++) {
-                for (let j = 0; j < words2.length - 1; j++) {
-                    // Check for 2-word phrases
-                    if (words1[i] === words2[j] && words1[i + 1] === words2[j + 1]) {
-                        const phrase = `${words1[i]} ${words1[i + 1]}`;
-                        matchingPhrases.add(phrase);
-                        
-                        // Check for longer phrases (up to 4 words)
-                        let k = 2;
-                        while (i + k < words1.length && j + k < words2.length && 
-                               k < 4 && words1[i + k] === words2[j + k]) {
-                            const longerPhrase = words1.slice(i, i + k + 1).join(' ');
-                            matchingPhrases.add(longerPhrase);
-                            k++;
-                        }
-                    }
-                }
-            }
-        });
+        const rows = renderRows(page.hunks.flatMap(hunk => hunk.rows), position);
+        left.insertAdjacentHTML('beforeend', rows.left);
+        right.insertAdjacentHTML('beforeend', rows.right);
+        cursor = page.next_cursor;
+        moreButton.style.display = cursor === null ? 'none' : '';
+    }
+    
+    moreButton.addEventListener('click', async () => {
+        moreButton.disabled = true;
+        try {
+            await loadPage();
+        } catch (error) {
+            console.error('Error loading differences:', error);
+            showError(container, `Failed to load more differences: ${error.message}`);
+        } finally {
+            moreButton.disabled = false;
+        }
     });
     
-    return { phrases: matchingPhrases, words: matchingWords };
+    await loadPage();
 }
 
-// Function to align words within two lines - Enhanced with better matching
-function alignWordsInLines(line1, line2, removedDiffs, addedDiffs, matchingData = { phrases: new Set(), words: new Set() }) {
-    const words1 = line1.split(/\s+/).filter(w => w.trim());
-    const words2 = line2.split(/\s+/).filter(w => w.trim());
-    
-    let alignedWords1 = [];
-    let alignedWords2 = [];
-    
-    // Find matching words and phrases, align them
-    let i = 0, j = 0;
-    
-    while (i < words1.length || j < words2.length) {
-        const word1 = words1[i] || '';
-        const word2 = words2[j] || '';
-        
-        // Check for phrase matches first (2+ words)
-        let phraseMatch = null;
-        let phraseLength = 0;
-        
-        if (word1 && word2) {
-            // Check for matching phrases starting from current position
-            for (let len = Math.min(words1.length - i, words2.length - j, 4); len >= 2; len--) {
-                const phrase1 = words1.slice(i, i + len).join(' ').toLowerCase();
-                const phrase2 = words2.slice(j, j + len).join(' ').toLowerCase();
-                
-                if (phrase1 === phrase2 && matchingData.phrases.has(phrase1)) {
-                    phraseMatch = phrase1;
-                    phraseLength = len;
-                    break;
-                }
-            }
+// Render the side-by-side rows of a comparison; each side of a row is a list of [kind, text] spans.
+// Rows only cover the changes and the lines around them, so skipped lines are marked with a gap.
+// position holds the last line numbers rendered, so that rows can be rendered a page at a time.
+function renderRows(rows, position = { website: 0, file: 0 }) {
+    let left = '';
+    let right = '';
+    
+    (rows || []).forEach(row => {
+        const follows = (row.website_line === null || row.website_line === position.website + 1) &&
+            (row.file_line === null || row.file_line === position.file + 1);
+        if (!follows) {
+            left += '<div class="website-line empty-line">⋯</div>';
+            right += '<div class="website-line empty-line">⋯</div>';
         }
-        
-        if (phraseMatch) {
-            // Phrase match found - highlight the entire phrase
-            const phrase1 = words1.slice(i, i + phraseLength).join(' ');
-            const phrase2 = words2.slice(j, j + phraseLength).join(' ');
-            
-            alignedWords1.push(`<span class="matched-phrase" title="✅ Phrase Match: ${phraseMatch}">${escapeHtml(phrase1)}</span>`);
-            alignedWords2.push(`<span class="matched-phrase" title="✅ Phrase Match: ${phraseMatch}">${escapeHtml(phrase2)}</span>`);
-            
-            i += phraseLength;
-            j += phraseLength;
-        } else if (word1.toLowerCase() === word2.toLowerCase() && word1 && word2) {
-            // Single word match
-            alignedWords1.push(`<span class="matched-word" title="✅ Word Match">${escapeHtml(word1)}</span>`);
-            alignedWords2.push(`<span class="matched-word" title="✅ Word Match">${escapeHtml(word2)}</span>`);
-            i++;
-            j++;
+        position.website = row.website_line || position.website;
+        position.file = row.file_line || position.file;
+        
+        const websiteNumber = `<span class="inline-line-number">${row.website_line || ''}</span>`;
+        const fileNumber = `<span class="inline-line-number">${row.file_line || ''}</span>`;
+        if (row.type === 'equal') {
+            left += `<div class="exact-match-line">${websiteNumber}${renderSpans(row.website)}</div>`;
+            right += `<div class="exact-match-line">${fileNumber}${renderSpans(row.file)}</div>`;
+        } else if (row.type === 'changed') {
+            // Only the words that differ are highlighted
+            left += `<div class="aligned-line">${websiteNumber}<span>${renderSpans(row.website)}</span></div>`;
+            right += `<div class="aligned-line">${fileNumber}<span>${renderSpans(row.file)}</span></div>`;
         } else {
-            // Words don't match - check which one to add
-            if (i < words1.length && (!word2 || word1.toLowerCase() < word2.toLowerCase())) {
-                // Add word from line1
-                const isGlobalMatch1 = matchingData.words && matchingData.words.has(word1.toLowerCase());
-                const isRemoved = isWordInDifferences(word1, removedDiffs);
-                const wordClass = isGlobalMatch1 ? 'matched-word' : (isRemoved ? 'word-highlight-removed' : 'word-normal');
-                const title = isGlobalMatch1 ? '✅ Word Match' : (isRemoved ? '❌ Removed from file' : '📝 Only in website');
-                alignedWords1.push(`<span class="${wordClass}" title="${title}">${escapeHtml(word1)}</span>`);
-                alignedWords2.push(`<span class="empty-word" title="No match"></span>`);
-                i++;
-            } else if (j < words2.length) {
-                // Add word from line2
-                const isGlobalMatch2 = matchingData.words && matchingData.words.has(word2.toLowerCase());
-                const isAdded = isWordInDifferences(word2, addedDiffs);
-                const wordClass = isGlobalMatch2 ? 'matched-word' : (isAdded ? 'word-highlight-added' : 'word-normal');
-                const title = isGlobalMatch2 ? '✅ Word Match' : (isAdded ? '➕ Added to file' : '📄 Only in file');
-                alignedWords1.push(`<span class="empty-word" title="No match"></span>`);
-                alignedWords2.push(`<span class="${wordClass}" title="${title}">${escapeHtml(word2)}</span>`);
-                j++;
-            } else {
-                break;
-            }
+            // A whole line on one side only
+            left += row.website
+                ? `<div class="website-line diff-highlight-removed">${websiteNumber}${escapeHtml(spansText(row.website))}</div>`
+                : '<div class="website-line empty-line"></div>';
+            right += row.file
+                ? `<div class="website-line diff-highlight-added">${fileNumber}${escapeHtml(spansText(row.file))}</div>`
+                : '<div class="website-line empty-line"></div>';
         }
-    }
+    });
     
-    // Join without extra spaces to avoid hidden gaps between inline spans
-    return {
-        left: alignedWords1.join(''),
-        right: alignedWords2.join('')
-    };
+    return { left: left, right: right };
 }
 
-// Helper function to check if a word is in differences
-function isWordInDifferences(word, diffMap) {
-    const wordLower = word.toLowerCase().trim();
-    
-    // Check exact match
-    if (diffMap.has(wordLower)) {
-        return true;
-    }
-    
-    // Check if word is part of any difference
-    for (const [key, value] of diffMap) {
-        if (value.toLowerCase().includes(wordLower) || wordLower.includes(key)) {
-            return true;
+// Helper function to render the compared (non-blank) lines of a text as matching lines
+function renderEqualLines(text) {
+    return text.split('\n')
+        .map(line => line.trim())
+        .filter(line => line)
+        .map((line, index) => `<div class="exact-match-line"><span class="inline-line-number">${index + 1}</span>${escapeHtml(line)}</div>`)
+        .join('');
+}
+
+// Helper function to turn spans into HTML with the removed and added words highlighted
+function renderSpans(spans) {
+    return (spans || []).map(([kind, text]) => {
+        if (kind === 'removed') {
+            return `<span class="word-highlight-removed">${escapeHtml(text)}</span>`;
+        } else if (kind === 'added') {
+            return `<span class="word-highlight-added">${escapeHtml(text)}</span>`;
         }
-    }
-    
-    return false;
+        return escapeHtml(text);
+    }).join('');
+}
+
+// Helper function to get the plain text of spans
+function spansText(spans) {
+    return spans.map(span => span[1]).join('');
 }
 
 
@@ -1005,27 +672,11 @@ async function compareEditedTexts() {
     compareBtn.innerHTML = '<span class="loading"></span>Comparing...';
     
     try {
-        const response = await fetch('/compare_texts', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ 
-                text1: editedWebsiteContent, 
-                text2: editedFileContent 
-            })
-        });
-
-        const data = await response.json();
-        
-        if (response.ok) {
-            displayEditedComparison(data, editedWebsiteContent, editedFileContent);
-        } else {
-            alert('Error comparing texts: ' + data.error);
-        }
+        const comparison = await createComparison(editedWebsiteContent, editedFileContent);
+        await displayEditedComparison(comparison, editedWebsiteContent, editedFileContent);
     } catch (error) {
         console.error('Error comparing texts:', error);
-        alert('Failed to compare texts. Please try again.');
+        alert('Failed to compare texts: ' + error.message);
     } finally {
         compareBtn.disabled = false;
         compareBtn.innerHTML = '🔄 Compare Edited Texts';
@@ -1033,11 +684,11 @@ async function compareEditedTexts() {
 }
 
 // Function to display comparison results for edited texts
-function displayEditedComparison(data, editedWebsiteContent, editedFileContent) {
+async function displayEditedComparison(comparison, editedWebsiteContent, editedFileContent) {
     const comparisonResults = document.getElementById('comparisonResults');
     comparisonResults.style.display = 'block';
     
-    if (data.identical) {
+    if (comparison.identical) {
         comparisonResults.innerHTML = `
             <h4 style="color: #2d3748; margin: 40px 0 20px 0; font-size: 1.3rem; display: flex; align-items: center; gap: 10px;">
                 🔍 Comparison Results
@@ -1059,19 +710,19 @@ function displayEditedComparison(data, editedWebsiteContent, editedFileContent)
         
         <div style="text-align: center; margin-bottom: 30px;">
             <div style="font-size: 2.5rem; margin-bottom: 15px;">📊</div>
-            <div style="color: #dc3545; font-weight: bold; font-size: 1.3rem; margin-bottom: 10px;">Found ${data.total_differences} difference(s)</div>
+            <div style="color: #dc3545; font-weight: bold; font-size: 1.3rem; margin-bottom: 10px;">Found ${comparison.total_differences} difference(s)</div>
             <div style="color: #6c757d;">Side-by-side comparison highlighting the differences:</div>
         </div>
         
         <div class="diff-container">
             <div class="diff-header">
                 <div class="diff-header-left">
-                    <span class="diff-label removed">${data.simple_diffs.filter(d => d.type === 'removed').length} removals</span>
+                    <span class="diff-label removed">${comparison.counts.changed + comparison.counts.removed} removals</span>
                     <span class="diff-lines">${editedWebsiteContent.split('\n').length} lines</span>
                     <button class="copy-btn" onclick="copyEditedToClipboard('website')">Copy</button>
                 </div>
                 <div class="diff-header-right">
-                    <span class="diff-label added">${data.simple_diffs.filter(d => d.type === 'added').length} additions</span>
+                    <span class="diff-label added">${comparison.counts.changed + comparison.counts.added} additions</span>
                     <span class="diff-lines">${editedFileContent.split('\n').length} lines</span>
                     <button class="copy-btn" onclick="copyEditedToClipboard('file')">Copy</button>
                 </div>
@@ -1079,27 +730,19 @@ function displayEditedComparison(data, editedWebsiteContent, editedFileContent)
             
             <div class="diff-content-wrapper">
                 <div class="diff-left">
-                    <div class="diff-line-numbers">
-                        ${generateLineNumbers(editedWebsiteContent)}
-                    </div>
-                    <div class="diff-text-content" id="diffWebsiteContent">
-                        ${formatDiffContent(editedWebsiteContent, data.simple_diffs, 'website')}
-                    </div>
+                    <div class="diff-text-content"></div>
                 </div>
                 
                 <div class="diff-right">
-                    <div class="diff-line-numbers">
-                        ${generateLineNumbers(editedFileContent)}
-                    </div>
-                    <div class="diff-text-content" id="diffFileContent">
-                        ${formatDiffContent(editedFileContent, data.simple_diffs, 'file')}
-                    </div>
+                    <div class="diff-text-content"></div>
                 </div>
             </div>
+            ${moreHunksButton()}
         </div>
     `;
     
     comparisonResults.innerHTML = html;
+    await showHunks(comparisonResults, comparison);
     
     // Scroll to comparison results
     setTimeout(() => {
@@ -0,0 +1,65 @@
+"""
+Choice of the longest of several candidate texts without building them all.
+
+Each strategy gives a cheap upper bound on the length of its text and a
+function that builds the text. Strategies are built in order of their
+bounds, and the search stops as soon as no remaining bound can beat the
+longest text built so far, so usually only the winner is built. Each
+build is timed as the stage strategy.<name>.
+"""
+import threading
+
+from stages import timed
+
+
+class StrategyStats:
+    """Thread-safe counters of which strategies won and how many were built"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wins = {}
+        self._counters = {'selections': 0, 'built': 0, 'skipped': 0}
+
+    def record(self, winner, built, skipped):
+        with self._lock:
+            self._wins[winner] = self._wins.get(winner, 0) + 1
+            self._counters['selections'] += 1
+            self._counters['built'] += built
+            self._counters['skipped'] += skipped
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters, wins=dict(self._wins))
+
+
+strategy_stats = StrategyStats()
+
+
+def pick_longest(strategies, stats=strategy_stats):
+    """
+    Return (name, text) of the strategy with the longest text; on equal
+    lengths the earlier strategy wins. strategies is a list of
+    (name, upper_bound, build) tuples where build() returns the text and
+    upper_bound is never less than its length.
+    """
+    order = sorted(range(len(strategies)), key=lambda i: (-strategies[i][1], i))
+    best_index = None
+    best_text = None
+    built = 0
+
+    for i in order:
+        name, upper_bound, build = strategies[i]
+        if best_text is not None:
+            # Bounds only decrease from here on, and an equal length loses to an earlier strategy
+            if upper_bound < len(best_text) or (upper_bound == len(best_text) and i > best_index):
+                break
+        with timed(f'strategy.{name}'):
+            text = build()
+        built += 1
+        if best_text is None or len(text) > len(best_text) or (len(text) == len(best_text) and i < best_index):
+            best_index = i
+            best_text = text
+
+    if stats is not None:
+        stats.record(strategies[best_index][0], built, len(strategies) - built)
+    return strategies[best_index][0], best_text
@@ -0,0 +1,121 @@
+"""
+Incremental text extraction from a page body while it downloads.
+
+StreamingExtractor is fed body chunks in arrival order and tokenizes them
+with the standard library's HTMLParser. An element that clean_tree() would
+remove is skipped together with its subtree as soon as its start tag is
+seen, and the text of the rest comes out line by line at block-element
+boundaries. Only the names of the open elements, the current line and the
+parser's unparsed remainder are held in memory, never the whole document.
+"""
+import codecs
+from html.parser import HTMLParser
+
+from dom_cleaner import is_droppable
+
+# Elements whose start and end tags break the text into lines
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'caption', 'dd',
+    'details', 'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'form',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'main', 'ol', 'p', 'pre',
+    'section', 'summary', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul',
+])
+
+# Elements that never have content or an end tag
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+])
+
+# Start tags that close an open element whose end tag pages often omit
+IMPLIED_ENDS = {'body': 'head'}
+
+
+def incremental_decoder(encoding):
+    try:
+        decoder = codecs.getincrementaldecoder(encoding or 'utf-8')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')
+    return decoder(errors='replace')
+
+
+class StreamingExtractor(HTMLParser):
+    """Turns body chunks into text lines, leaving out droppable subtrees"""
+
+    def __init__(self, encoding='utf-8'):
+        super().__init__(convert_charrefs=True)
+        self._decoder = incremental_decoder(encoding)
+        self._open = []  # Names of the open elements, outermost first
+        self._skip_depth = None  # Number of open elements outside the skipped one
+        self._parts = []
+        self._lines = []
+
+    def push(self, chunk):
+        """Feed the next body chunk and return the lines it completed"""
+        self.feed(self._decoder.decode(chunk))
+        return self._take_lines()
+
+    def finish(self):
+        """Flush the end of the body and return the remaining lines"""
+        self.feed(self._decoder.decode(b'', final=True))
+        self.close()
+        self._break_line()
+        return self._take_lines()
+
+    def _take_lines(self):
+        lines, self._lines = self._lines, []
+        return lines
+
+    def _break_line(self):
+        if self._parts:
+            line = ' '.join(''.join(self._parts).split())
+            if line:
+                self._lines.append(line)
+            self._parts = []
+
+    def _close_element(self, name):
+        # An end tag closes the innermost open element of that name, if any
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i] == name:
+                del self._open[i:]
+                break
+        if self._skip_depth is not None and len(self._open) <= self._skip_depth:
+            self._skip_depth = None
+
+    def handle_starttag(self, tag, attrs):
+        implied = IMPLIED_ENDS.get(tag)
+        if implied is not None and implied in self._open:
+            self._close_element(implied)
+
+        if self._skip_depth is not None:
+            if tag not in VOID_TAGS:
+                self._open.append(tag)
+            return
+
+        if tag in BLOCK_TAGS:
+            self._break_line()
+        if tag in VOID_TAGS:
+            return
+
+        # Valueless attributes read as empty strings, as in a parsed tree
+        attrs = {name: '' if value is None else value for name, value in attrs}
+        if is_droppable(tag, attrs):
+            self._skip_depth = len(self._open)
+        self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        if self._skip_depth is None and tag in BLOCK_TAGS:
+            self._break_line()
+        self._close_element(tag)
+
+    def handle_data(self, data):
+        if self._skip_depth is None:
+            self._parts.append(data)
+
+
+def iter_lines(chunks, encoding='utf-8'):
+    """Yield the text lines of a body given as chunks, each as soon as it is complete"""
+    extractor = StreamingExtractor(encoding)
+    for chunk in chunks:
+        yield from extractor.push(chunk)
+    yield from extractor.finish()
@@ -0,0 +1,82 @@
+import pytest
+
+import app
+from comparisons import ComparisonStore
+from references import ReferenceStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Stored comparisons and references go to the test's own directory
+    monkeypatch.setattr(app, 'comparison_store', ComparisonStore(directory=str(tmp_path / 'comparisons')))
+    monkeypatch.setattr(app, 'reference_store', ReferenceStore(directory=str(tmp_path / 'references')))
+    return app.app.test_client()
+
+
+def test_compare_texts_sends_changes_with_context_only(client):
+    website = [f'Clause {k} of the policy wording' for k in range(1000)]
+    file = list(website)
+    file[500] = 'Clause 500 of the amended policy wording'
+
+    data = client.post('/compare_texts', json={'text1': '\n'.join(website), 'text2': '\n'.join(file)}).get_json()
+
+    assert data['total_differences'] == 2
+    assert [row['website_line'] for row in data['rows']] == list(range(498, 505))
+    assert [row['type'] for row in data['rows']] == ['equal'] * 3 + ['changed'] + ['equal'] * 3
+    changed = data['rows'][3]
+    assert changed['file'] == [['equal', 'Clause 500 of the '], ['added', 'amended '],
+                               ['equal', 'policy wording']]
+
+
+def test_compare_texts_identical_has_no_rows(client):
+    data = client.post('/compare_texts', json={'text1': 'A\nB', 'text2': ' a \n\nb'}).get_json()
+    assert data['identical'] is True
+    assert data['rows'] == []
+
+
+def test_reference_text_must_be_a_string(client):
+    response = client.post('/references', json={'text': ['Clause 1']})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('url', ['/compare_texts', '/comparisons'])
+@pytest.mark.parametrize('payload', [{'text1': ['a'], 'text2': 'b'}, {'text1': 'a', 'text2': 5},
+                                     {'text1': 'a', 'reference_id': 5}])
+def test_comparisons_reject_fields_of_the_wrong_type(client, url, payload):
+    response = client.post(url, json=payload)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_comparison_hunks_are_paged_by_cursor(client):
+    website = [f'Clause {k} of the policy wording' for k in range(1000)]
+    file = [f'Clause {k} of the amended wording' if k % 100 == 0 else line for k, line in enumerate(website)]
+
+    response = client.post('/comparisons', json={'text1': '\n'.join(website), 'text2': '\n'.join(file)})
+    assert response.status_code == 201
+    summary = response.get_json()
+    assert summary['hunks'] == 10 and summary['counts']['changed'] == 10
+
+    starts, cursor = [], 0
+    while cursor is not None:
+        page = client.get(f"{summary['hunks_url']}?cursor={cursor}&limit=3").get_json()
+        starts += [hunk['website_start'] for hunk in page['hunks']]
+        cursor = page['next_cursor']
+    assert starts == [1] + [k - 3 for k in range(101, 1000, 100)]
+    assert client.get(f"{summary['hunks_url']}?cursor=x").status_code == 400
+    assert client.get('/comparisons/0123456789abcdef/hunks').status_code == 404
+
+
+@pytest.mark.parametrize('payload', [{'url': ['x']}, {'type': 'extract_policy', 'text': 5}, {'type': []}])
+def test_jobs_reject_fields_of_the_wrong_type(client, payload):
+    response = client.post('/jobs', json=payload)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('payload', [{'url': ['x']}, {'sitemap': 5}, {'crawl_id': {}}])
+def test_crawl_rejects_fields_of_the_wrong_type(client, payload):
+    response = client.post('/crawl', json=payload)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
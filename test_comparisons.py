@@ -0,0 +1,104 @@
+import os
+import random
+import time
+
+import pytest
+
+from comparisons import (Comparison, ComparisonStore, ComparisonTooLarge, aligned_rows, group_hunks,
+                         split_opcodes)
+from line_diff import get_opcodes
+
+
+def random_opcodes(rng):
+    a = [rng.randrange(20) for _ in range(rng.randint(1, 300))]
+    b = [line if rng.random() < 0.8 else rng.randrange(30) for line in a if rng.random() < 0.95]
+    return a, b, get_opcodes(a, b)
+
+
+def row_key(row):
+    return row['type'], row['website_line'], row['file_line']
+
+
+def test_split_opcodes_keeps_the_rows():
+    opcodes = [('replace', 0, 300, 0, 100), ('equal', 300, 301, 100, 101), ('insert', 301, 301, 101, 350)]
+    pieces = list(split_opcodes(opcodes, max_lines=120))
+    assert all(max(i2 - i1, j2 - j1) <= 120 for _, i1, i2, j1, j2 in pieces)
+    assert pieces[:3] == [('replace', 0, 120, 0, 100), ('delete', 120, 240, 100, 100),
+                          ('delete', 240, 300, 100, 100)]
+
+    lines = [str(k) for k in range(400)]
+    assert [row_key(row) for row in aligned_rows(lines, lines, pieces)] == \
+        [row_key(row) for row in aligned_rows(lines, lines, opcodes)]
+
+
+def test_group_hunks_covers_every_change_with_context():
+    rng = random.Random(0)
+    for _ in range(300):
+        a, b, opcodes = random_opcodes(rng)
+        context = rng.choice([0, 1, 3])
+        max_lines = rng.choice([1, 5, 200])
+        hunks = group_hunks(split_opcodes(opcodes, max_lines), context, max_lines)
+
+        lines_a, lines_b = [str(line) for line in a], [str(line) for line in b]
+        full = [row_key(row) for row in aligned_rows(lines_a, lines_b, opcodes)]
+        rows = [row_key(row) for hunk in hunks for row in aligned_rows(lines_a, lines_b, hunk)]
+        # Each row at most once, in order, and every changed row included
+        positions = [full.index(row) for row in rows]
+        assert positions == sorted(set(positions))
+        changes = [k for k, row in enumerate(full) if row[0] != 'equal']
+        assert [row for row in rows if row[0] != 'equal'] == [full[k] for k in changes]
+        # With the equal lines within context of each change
+        near = {k for change in changes for k in range(max(0, change - context), change + context + 1)}
+        assert near & set(range(len(full))) <= set(positions)
+        assert all(len(aligned_rows(lines_a, lines_b, hunk)) <= max_lines + 2 * context for hunk in hunks)
+
+
+def test_identical_texts_have_no_hunks():
+    assert group_hunks([('equal', 0, 10, 0, 10)]) == []
+
+
+def comparison(lines=3):
+    website = [f'line {k}' for k in range(lines)]
+    file = website[:-1] + ['changed line']
+    return Comparison(website, file, get_opcodes(website, file))
+
+
+def test_store_is_shared_through_disk(tmp_path):
+    first = ComparisonStore(directory=str(tmp_path))
+    second = ComparisonStore(directory=str(tmp_path))
+    stored = first.add(comparison())
+
+    loaded = second.get(stored.comparison_id)
+    assert loaded.summary() == stored.summary()
+    assert loaded.page() == stored.page()
+    assert second.get('0123456789abcdef') is None
+    assert second.get('../../etc/passwd') is None
+
+
+def test_store_evicts_least_recently_read(tmp_path):
+    store = ComparisonStore(directory=str(tmp_path), max_stored=2)
+    first, second = store.add(comparison()), store.add(comparison())
+    # Reading the first one makes the second the least recently read
+    os.utime(os.path.join(str(tmp_path), f'{second.comparison_id}.json'), (1, time.time() - 10))
+    assert store.get(first.comparison_id) is first
+    third = store.add(comparison())
+
+    assert store.get(second.comparison_id) is None
+    assert store.get(first.comparison_id) is first
+    assert store.get(third.comparison_id) is third
+    assert store.stats()['evictions'] == 1
+
+
+def test_store_expires_unread_comparisons(tmp_path):
+    store = ComparisonStore(directory=str(tmp_path), ttl=60)
+    stored = store.add(comparison())
+    os.utime(os.path.join(str(tmp_path), f'{stored.comparison_id}.json'), (1, time.time() - 61))
+
+    assert store.get(stored.comparison_id) is None
+    assert store.stats()['expired'] == 1
+
+
+def test_store_refuses_oversized_comparisons(tmp_path):
+    store = ComparisonStore(directory=str(tmp_path), max_bytes=100)
+    with pytest.raises(ComparisonTooLarge):
+        store.add(comparison(lines=50))
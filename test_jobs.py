@@ -0,0 +1,82 @@
+import os
+import time
+
+from jobs import Job, JobManager
+
+
+def wait(manager, job):
+    for _ in range(100):
+        if manager.get(job.job_id).finished is not None:
+            return manager.get(job.job_id)
+        time.sleep(0.01)
+    raise AssertionError('the job did not finish')
+
+
+def test_job_is_seen_by_other_workers(tmp_path):
+    first = JobManager(directory=str(tmp_path))
+    second = JobManager(directory=str(tmp_path))
+    job = first.submit('double', ['doubling'], lambda job, value: value * 2, 21, key='a')
+
+    assert wait(second, job).to_dict() == wait(first, job).to_dict()
+    assert second.get(job.job_id).result == 42
+    assert second.get('0123456789abcdef') is None
+    assert second.get('../../etc/passwd') is None
+
+
+def test_retries_get_the_pending_or_just_finished_job(tmp_path):
+    first = JobManager(directory=str(tmp_path), dedup_window=60)
+    second = JobManager(directory=str(tmp_path), dedup_window=0)
+    job = first.submit('sleep', [], lambda job: time.sleep(0.2), key='a')
+
+    assert first.submit('sleep', [], lambda job: None, key='a') is job
+    assert second.submit('sleep', [], lambda job: None, key='a').job_id == job.job_id
+    wait(first, job)
+    assert first.submit('sleep', [], lambda job: None, key='a') is job
+    # Past the window the work is done again
+    assert second.submit('sleep', [], lambda job: None, key='a').job_id != job.job_id
+
+
+def test_finished_jobs_are_capped_and_expire(tmp_path):
+    manager = JobManager(directory=str(tmp_path), max_kept=2)
+    jobs = [wait(manager, manager.submit('noop', [], lambda job: None)) for _ in range(3)]
+
+    assert manager.get(jobs[0].job_id) is None
+    assert manager.get(jobs[2].job_id) is jobs[2]
+    assert manager.stats()['evictions'] == 1
+
+    manager.ttl = 0
+    assert manager.get(jobs[2].job_id) is None
+    assert manager.stats()['kept'] == 0
+    assert not list(tmp_path.iterdir())
+
+
+def test_jobs_whose_state_cannot_be_saved_give_their_place_back(tmp_path):
+    manager = JobManager(directory=str(tmp_path), max_pending=1)
+    saves = []
+
+    def save(job):
+        # The first save, on submission, works; the next ones hit a full disk
+        saves.append(job.status)
+        if len(saves) > 1:
+            raise OSError('No space left on device')
+
+    manager._save = save
+    job = wait(manager, manager.submit('noop', [], lambda job: None))
+    assert job.status == 'failed'
+    assert 'No space left on device' in job.error
+    assert manager.stats()['pending'] == 0
+
+
+def test_pending_jobs_left_by_a_stopped_worker_run_again(tmp_path):
+    stopped = JobManager(directory=str(tmp_path))
+    job = Job('noop', [], key='a')
+    stopped._save(job)
+    stopped._write(stopped._key_path('a'), job.job_id)
+
+    manager = JobManager(directory=str(tmp_path), heartbeat_interval=10)
+    # Within the heartbeat window the job still counts as running elsewhere
+    assert manager.submit('noop', [], lambda job: None, key='a').job_id == job.job_id
+
+    os.utime(os.path.join(str(tmp_path), f'{job.job_id}.json'), (1, time.time() - 31))
+    assert manager.get(job.job_id).status == 'failed'
+    assert manager.submit('noop', [], lambda job: None, key='a').job_id != job.job_id
@@ -0,0 +1,92 @@
+import difflib
+import random
+
+from line_diff import get_opcodes, intern_against, intern_lines, intraline_spans
+
+
+def apply_opcodes(a, b, opcodes):
+    """b rebuilt from a and the opcodes, checking that they cover both sides in order"""
+    out = []
+    i = j = 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == 'equal':
+            assert a[i1:i2] == b[j1:j2]
+        out.extend(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return out
+
+
+def changed_lines(opcodes):
+    return sum(i2 - i1 + j2 - j1 for tag, i1, i2, j1, j2 in opcodes if tag != 'equal')
+
+
+def test_identical_and_empty():
+    assert get_opcodes([1, 2, 3], [1, 2, 3]) == [('equal', 0, 3, 0, 3)]
+    assert get_opcodes([], [1]) == [('insert', 0, 0, 0, 1)]
+    assert get_opcodes([1], []) == [('delete', 0, 1, 0, 0)]
+    assert get_opcodes([1, 2], [3, 4]) == [('replace', 0, 2, 0, 2)]
+
+
+def test_unique_line_moved_past_repeated_lines():
+    a = ['Intro'] + ['Covered', 'Not covered'] * 25 + ['Contact us for claims']
+    b = ['Intro', 'Contact us for claims'] + ['Covered', 'Not covered'] * 25
+    opcodes = get_opcodes(*intern_lines(a, b))
+    assert apply_opcodes(a, b, opcodes) == b
+    assert changed_lines(opcodes) == 2
+
+
+def test_never_more_changed_lines_than_difflib():
+    rng = random.Random(0)
+    for _ in range(2000):
+        vocabulary = rng.randint(1, 10)
+        a = [rng.randint(0, vocabulary) for _ in range(rng.randint(0, 60))]
+        b = list(a)
+        for _ in range(rng.randint(0, 12)):
+            edit = rng.random()
+            if edit < 0.3 and b:
+                del b[rng.randrange(len(b))]
+            elif edit < 0.6:
+                b.insert(rng.randint(0, len(b)), rng.randint(0, vocabulary + 3))
+            elif edit < 0.8 and b:
+                b[rng.randrange(len(b))] = rng.randint(0, vocabulary)
+            elif b:
+                # Move a line elsewhere
+                b.insert(rng.randint(0, len(b) - 1), b.pop(rng.randrange(len(b))))
+
+        opcodes = get_opcodes(a, b)
+        assert apply_opcodes(a, b, opcodes) == b
+        expected = difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+        assert changed_lines(opcodes) <= changed_lines(expected), (a, b)
+
+
+def test_large_edit_scripts_fall_back_to_anchors():
+    rng = random.Random(1)
+    a = [rng.randrange(5000) for _ in range(3000)]
+    b = [line if rng.random() < 0.7 else rng.randrange(5000) for line in a]
+    opcodes = get_opcodes(a, b, max_cost=50)
+    assert apply_opcodes(a, b, opcodes) == b
+
+
+def test_intern_against_leaves_table_alone():
+    table = {'a': 0, 'b': 1}
+    assert intern_against(table, ['b', 'c', 'a', 'c', 'd']) == [1, 2, 0, 2, 3]
+    assert table == {'a': 0, 'b': 1}
+
+
+def test_intraline_spans_mark_changed_words():
+    old, new = intraline_spans('The premium is  due monthly', 'The premium is due yearly')
+    assert old == [['equal', 'The premium is  due '], ['removed', 'monthly']]
+    assert new == [['equal', 'The premium is due '], ['added', 'yearly']]
+
+
+def test_intraline_spans_ignore_case():
+    old, new = intraline_spans('Sum Assured', 'sum assured')
+    assert old == [['equal', 'Sum Assured']]
+    assert new == [['equal', 'sum assured']]
+
+
+def test_intraline_spans_replace_dissimilar_lines_whole():
+    assert intraline_spans('Contact us', 'Exclusions apply to pre-existing conditions') == (
+        [['removed', 'Contact us']], [['added', 'Exclusions apply to pre-existing conditions']])
@@ -0,0 +1,34 @@
+import os
+import time
+
+from references import ReferenceStore
+
+
+def lines(text):
+    return [{'original': line, 'normalized': line.lower()} for line in text.splitlines()]
+
+
+def add(store, text):
+    return store.add(text, lines(text))
+
+
+def test_store_removes_least_recently_used_documents(tmp_path):
+    store = ReferenceStore(directory=str(tmp_path), max_stored=2)
+    first, second = add(store, 'Clause 1'), add(store, 'Clause 2')
+    # Using the first one makes the second the least recently used
+    os.utime(os.path.join(str(tmp_path), f'{second.reference_id}.json'), (1, time.time() - 10))
+    assert store.get(first.reference_id) is first
+    third = add(store, 'Clause 3')
+
+    assert store.get(second.reference_id) is None
+    assert store.get(first.reference_id) is first
+    assert store.get(third.reference_id) is third
+    assert store.stats()['disk_evictions'] == 1
+    assert store.stats()['stored'] == 2
+
+
+def test_store_is_bounded_by_disk_use(tmp_path):
+    store = ReferenceStore(directory=str(tmp_path), max_bytes=500)
+    for k in range(20):
+        add(store, f'Clause {k} of the approved policy wording')
+    assert 0 < store.stats()['bytes'] <= 500
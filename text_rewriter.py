@@ -0,0 +1,204 @@
+"""
+Text-node rewriting of a cleaned page.
+
+Image file names are scrubbed, protected email placeholders are replaced
+with the first real address on the page and metrics such as "1 M+" are
+rewritten, all during one walk over the tree. Sibling strings with no
+markup between them are rewritten as one run, which is how they would
+read back if the page were serialized and parsed again.
+"""
+import re
+
+from bs4.builder import HTMLParserTreeBuilder
+from bs4.element import CData, NavigableString, Tag
+
+from regex_registry import regexes
+
+# Image names removed before looking for email addresses
+AGGRESSIVE_PATTERNS = regexes.compile_all('aggressive_image', [
+    r'Without@\d+\.?\d*x\.webp',
+    r'with@\d+\.?\d*x\.webp',
+    r'[A-Za-z0-9_-]*@\d+\.?\d*x\.webp',  # Any @x.webp pattern
+], re.IGNORECASE)
+
+# Attributes whose @Nx.webp image names remove the whole start tag
+IMAGE_TAG_ATTR_PATTERN = regexes.compile('image_tag_attr', r'src$|alt$|data-', re.IGNORECASE)
+IMAGE_TAG_VALUE_PATTERN = regexes.compile('image_tag_value', r'@\d+\.?\d*x\.webp', re.IGNORECASE)
+
+EMAIL_PATTERN = regexes.compile('email', r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# Placeholders left by email obfuscation, replaced with the first real address
+EMAIL_PLACEHOLDER_PATTERNS = regexes.compile_all('email_placeholder', [
+    r'\[email\s+protected\]',
+    r'email\s+protected',
+    r'\[email\]',
+    r'\[at\]',
+    r'\[dot\]',
+    r'Contact\s+US',
+], re.IGNORECASE)
+
+# Image file names and unwanted content
+UNWANTED_PATTERNS = regexes.compile_all('unwanted_content', [
+    r'[A-Za-z0-9_-]*@\d+\.?\d*x\.webp',  # Remove @1.5x.webp, @2x.webp etc
+    r'[A-Za-z0-9_-]*\.webp',  # Remove .webp files
+    r'[A-Za-z0-9_-]*\.png',   # Remove .png files
+    r'[A-Za-z0-9_-]*\.jpg',   # Remove .jpg files
+    r'[A-Za-z0-9_-]*\.jpeg',  # Remove .jpeg files
+    r'[A-Za-z0-9_-]*\.svg',   # Remove .svg files
+    r'[A-Za-z0-9_-]*\.gif',   # Remove .gif files
+    r'[A-Za-z0-9_-]*\.ico',   # Remove .ico files
+    r'without@\d+\.?\d*x\.webp',  # Specific pattern for "without@1.5x.webp"
+    r'with@\d+\.?\d*x\.webp',     # Specific pattern for "with@1.5x.webp"
+    r'Without@\d+\.?\d*x\.webp',  # Capital W version
+    r'With@\d+\.?\d*x\.webp',     # Capital W version
+    r'[Ww]ithout@[0-9.]+x\.webp',  # More flexible pattern
+    r'[Ww]ith@[0-9.]+x\.webp',     # More flexible pattern
+], re.IGNORECASE)
+
+# Every unwanted pattern ends in one of these extensions
+IMAGE_EXTENSION_PATTERN = regexes.compile('image_extension', r'\.(?:webp|png|jpg|jpeg|svg|gif|ico)', re.IGNORECASE)
+
+SPECIFIC_REMOVALS = []
+for _removal in ['Without@1.5x.webp', 'with@1.5x.webp', 'Without@2x.webp',
+                 'with@2x.webp', 'Without@3x.webp', 'with@3x.webp']:
+    SPECIFIC_REMOVALS.extend([_removal, _removal.lower(), _removal.upper()])
+
+# Number and metric rewrites
+METRIC_PATTERNS = [
+    (regexes.compile('metric[0]', r'1\s*M\+', re.IGNORECASE), '100 M+'),  # 1 M+ -> 100 M+
+    (regexes.compile('metric[1]', r'1\s*M\s*\+', re.IGNORECASE), '100 M+'),  # 1 M + -> 100 M+
+    (regexes.compile('metric[2]', r'1\s*Million\+', re.IGNORECASE), '100 M+'),  # 1 Million+ -> 100 M+
+    (regexes.compile('metric[3]', r'1\s*Million\s*\+', re.IGNORECASE), '100 M+'),  # 1 Million + -> 100 M+
+]
+
+# Elements whose strings the parser keeps apart from the page text
+STRING_CONTAINERS = HTMLParserTreeBuilder.DEFAULT_STRING_CONTAINERS
+
+
+def scrub_images(text):
+    if '@' in text:
+        for pattern in AGGRESSIVE_PATTERNS:
+            text = pattern.sub('', text)
+    return text
+
+
+def start_tag_removed(tag):
+    """Whether the image-name scrubbing would remove this element's start tag"""
+    for name, value in tag.attrs.items():
+        if not IMAGE_TAG_ATTR_PATTERN.search(name):
+            continue
+        if not isinstance(value, str):
+            value = ' '.join(value)
+        if IMAGE_TAG_VALUE_PATTERN.search(value):
+            return True
+    return False
+
+
+def find_email(values):
+    """First email address in a sequence of strings, after image names are scrubbed"""
+    for value in values:
+        if not isinstance(value, str):
+            value = ' '.join(value)
+        match = EMAIL_PATTERN.search(scrub_images(value))
+        if match:
+            return match.group(0)
+    return None
+
+
+def rewrite_run(text, email):
+    """Apply the placeholder, unwanted-content and metric rewrites to one scrubbed run"""
+    # Each group of patterns needs a character that most runs lack, so
+    # checking for it first skips nearly all of the regex calls
+    if email:
+        lowered = text.lower()
+        if '[' in text or 'protected' in lowered or 'contact' in lowered:
+            for pattern in EMAIL_PLACEHOLDER_PATTERNS:
+                text = pattern.sub(email, text)
+    if IMAGE_EXTENSION_PATTERN.search(text):
+        for pattern in UNWANTED_PATTERNS:
+            text = pattern.sub('', text)
+    if '@' in text:
+        for removal in SPECIFIC_REMOVALS:
+            text = text.replace(removal, '')
+    if '1' in text:
+        for pattern, replacement in METRIC_PATTERNS:
+            text = pattern.sub(replacement, text)
+    return text
+
+
+def collect_runs(root):
+    """
+    Walk the tree once and return (runs, email): the scrubbed text runs in
+    document order and the first email address found in text or attributes.
+    """
+    runs = []
+    run = []
+    email = None
+    # Names of the elements whose start tags survive the scrubbing, as a
+    # parser reading the scrubbed markup would have them open
+    open_names = []
+
+    def close_run(is_text=None):
+        nonlocal email
+        if run:
+            text = scrub_images(''.join(run))
+            if email is None:
+                match = EMAIL_PATTERN.search(text)
+                email = match.group(0) if match else None
+            if is_text is None:
+                # Strings inside template, rt, rp, script or style are not page text
+                is_text = not any(name in STRING_CONTAINERS for name in open_names)
+            if is_text:
+                runs.append(text)
+            run.clear()
+
+    def close_element(tag):
+        close_run()
+        # An end tag closes the innermost open element of that name, if any
+        for i in range(len(open_names) - 1, -1, -1):
+            if open_names[i] == tag.name:
+                del open_names[i:]
+                break
+
+    stack = [(iter(root.contents), None)]
+    while stack:
+        children, tag = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if tag is not None:
+                close_element(tag)
+            continue
+
+        if isinstance(child, Tag):
+            if start_tag_removed(child):
+                # An empty element is written without an end tag, so nothing of it remains
+                stack.append((iter(child.contents), None if child.is_empty_element else child))
+                continue
+            close_run()
+            open_names.append(child.name)
+            if email is None:
+                email = find_email(child.attrs.values())
+            stack.append((iter(child.contents), child))
+        elif type(child) is NavigableString or type(child) in STRING_CONTAINERS.values():
+            run.append(child)
+        else:
+            # Comments, CDATA sections and declarations stand alone in the markup;
+            # of these only CDATA is page text
+            close_run()
+            run.append(child)
+            close_run(is_text=type(child) is CData)
+
+    close_run()
+    return runs, email
+
+
+def rewrite_text(root):
+    """Text of the tree with images scrubbed, email placeholders filled and metrics rewritten"""
+    runs, email = collect_runs(root)
+    parts = []
+    for text in runs:
+        text = rewrite_run(text, email).strip()
+        if text:
+            parts.append(text)
+    return ' '.join(parts)